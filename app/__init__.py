@@ -8,14 +8,21 @@ from fastapi import FastAPI, APIRouter, Request, status
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
 from fastapi_cache import FastAPICache
-from fastapi_cache.backends.redis import RedisBackend
-from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.exc import SQLAlchemyError, TimeoutError as PoolTimeoutError
 
 
 from app import logger
-from app.jwt import ALGORITHM, SECRET_KEY
-from app.utils.save_error_log import save_sql_error_log
-
+from app.core import admission_controller, connection_manager
+from app.api.auth.auth_service import principal_cache
+from app.api.inventory.snapshot_service import inventory_snapshotter
+from app.api.purchases.aggregate_reconciler import purchase_aggregate_reconciler
+from app.api.valuation.valuation_service import inventory_valuator
+from app.lib.authentication.token_revocation import revocation_list
+from app.lib.dimension_cache import dimension_cache
+from app.jwt import ALGORITHM, SECRET_KEY, password_hasher
+from app.utils.save_error_log import error_log_writer, save_sql_error_log
+
+from .utils.cache_backend import TaggedRedisBackend
 from .utils.key_builder import key_builder
 from .api import main_router
 from .middlewares import middleware
@@ -33,10 +40,29 @@ async def lifespan(_: FastAPI) -> AsyncIterator[None]:
     )
     redis = aioredis.Redis(connection_pool=pool)
     FastAPICache.init(
-        RedisBackend(redis), prefix="fastapi-cache", key_builder=key_builder
+        TaggedRedisBackend(redis), prefix="fastapi-cache", key_builder=key_builder
     )
+    await connection_manager.init()
+    await error_log_writer.start()
+    await principal_cache.start()
+    await revocation_list.start()
+    await dimension_cache.start()
+    await inventory_snapshotter.start()
+    await purchase_aggregate_reconciler.start()
+    await inventory_valuator.start()
 
-    yield
+    try:
+        yield
+    finally:
+        await inventory_valuator.stop()
+        await purchase_aggregate_reconciler.stop()
+        await inventory_snapshotter.stop()
+        await dimension_cache.stop()
+        await revocation_list.stop()
+        await principal_cache.stop()
+        await error_log_writer.stop()
+        await connection_manager.close()
+        password_hasher.shutdown()
 
 
 app = FastAPI(
@@ -48,6 +74,18 @@ app = FastAPI(
 )
 
 
+@app.exception_handler(PoolTimeoutError)
+async def db_pool_timeout(_: Request, exc: PoolTimeoutError):
+    # The pool is exhausted: answer fast and do not open another session to
+    # write an error log, that would only add load to the database.
+    logger.logger.warning(exc)
+    return JSONResponse(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        content="Service is busy, please retry",
+        headers={"Retry-After": str(admission_controller.retry_after)},
+    )
+
+
 @app.exception_handler(SQLAlchemyError)
 async def db_api_error(request: Request, exc: SQLAlchemyError):
     try:
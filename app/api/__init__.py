@@ -1,9 +1,27 @@
 from fastapi import APIRouter
 from .auth import auth_router
+from .categories import categories_router
+from .dispatch import dispatch_orders_router
+from .inventory import inventory_router
+from .monitoring import monitoring_router
+from .products import products_router
+from .purchases import purchases_router
+from .rates import rates_router
+from .shrinkage import inventory_shrinkage_router
+from .valuation import inventory_valuation_router
 
 main_router = APIRouter(prefix="/api/v1")
 
 main_router.include_router(auth_router)
+main_router.include_router(categories_router)
+main_router.include_router(dispatch_orders_router)
+main_router.include_router(inventory_router)
+main_router.include_router(monitoring_router)
+main_router.include_router(products_router)
+main_router.include_router(purchases_router)
+main_router.include_router(rates_router)
+main_router.include_router(inventory_shrinkage_router)
+main_router.include_router(inventory_valuation_router)
 
 
 __all__ = [
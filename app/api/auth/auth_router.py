@@ -59,12 +59,13 @@ async def session(
 
 @authentication_router.get("/logout")
 async def logout(
-    sess: DBSessionDep,
     refresh_token: str = Depends(oauth2_scheme),
 ):
     """
     Logout a user
     """
 
-    service = AuthService(sess)
-    return service.logout(refresh_token=refresh_token)
+    service = AuthService()
+    if not refresh_token:
+        raise HTTPException(status_code=401, detail="No refresh token")
+    return await service.logout(refresh_token=refresh_token)
@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from sqlalchemy import select
+from sqlalchemy import select, update
 from sqlalchemy.ext.asyncio import AsyncSession
 from fastapi import status, HTTPException
 
@@ -9,11 +9,15 @@ from app.jwt import (
     create_access_token,
     create_refresh_token,
     decode_refresh_token,
-    verify_password,
+    password_hasher,
 )
 from app.models import Profile
 from app.models import User, AuthUser, Credential, UserGroup, Rol, ProfileRol
 from app.core import session
+from app.api.auth.principal_cache import PrincipalCache
+from app.lib.authentication.password_hasher import PasswordHasherBusy
+from app.lib.authentication.token_revocation import revocation_list
+from app.logger import logger
 from app.constans import const_status
 from sqlalchemy import func
 
@@ -48,14 +52,13 @@ class TokenResponse(BaseModel):
 
 
 class UserLogin(BaseModel):
-    full_name: str
+    full_name: str | None = None
     username: str
-    password: str
     status_id: int
     group_id: int
     auth_user_id: int
     user_id: int
-    group: str
+    group: str | None = None
     profile_id: int
     roles: list[RolSchema]
 
@@ -79,7 +82,24 @@ class AuthService:
                 headers={"WWW-Authenticate": "Bearer"},
             ) from ex
 
-        if user is None or not verify_password(password, user.password):
+        valid, new_hash = False, None
+        # The hash is read on every login, principals are cached without it.
+        password_hash = (
+            await load_password_hash(user.auth_user_id) if user is not None else None
+        )
+        if password_hash is not None:
+            try:
+                valid, new_hash = await password_hasher.verify_and_update(
+                    password, password_hash
+                )
+            except PasswordHasherBusy as ex:
+                raise HTTPException(
+                    status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                    detail="Too many login attempts in progress, please retry",
+                    headers={"Retry-After": "1"},
+                ) from ex
+
+        if user is None or not valid:
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail="Incorrect username or password",
@@ -93,6 +113,9 @@ class AuthService:
                 headers={"WWW-Authenticate": "Bearer"},
             )
 
+        if new_hash is not None:
+            await rehash_password(user, password_hash, new_hash)
+
         access_token, refresh_token = set_crendentials(user)
 
         return TokenResponse(
@@ -112,6 +135,10 @@ class AuthService:
         if not decoded_token:
             raise HTTPException(status_code=401, detail="Invalid refresh token")
 
+        # Tokens issued before jti existed cannot be revoked, they expire.
+        if decoded_token.jti and await revocation_list.is_revoked(decoded_token.jti):
+            raise HTTPException(status_code=401, detail="Invalid refresh token")
+
         user = await get_user_by_id(decoded_token.sub)
 
         if not user:
@@ -170,43 +197,38 @@ class AuthService:
     async def logout(self, refresh_token: str):
         """
         Invalidate the refresh token (logout).
-        This is a placeholder as JWTs are stateless; implement token blacklisting if needed.
+        Its jti stays revoked until the token expires.
         """
-        # If using a token blacklist, add the refresh_token to the blacklist here.
-        # For now, just return a success message.
-        return {"message": "Successfully logged out"}
+        decoded_token = await decode_refresh_token(refresh_token)
 
+        if decoded_token and decoded_token.jti and decoded_token.exp:
+            await revocation_list.revoke(decoded_token.jti, decoded_token.exp)
 
-async def get_user_or_none(username) -> UserLogin | None:
+        return {"message": "Successfully logged out"}
 
-    sess = await session()
-
-    if sess is None:
-        raise Exception("paso un error")  # pylint: disable=broad-exception-raised
 
+def _principal_stmt(*whereclause):
     get_user_stmt = (
         select(
             AuthUser.group_id,
             AuthUser.profile_id,
             AuthUser.status_id,
             (User.firstname + " " + User.lastname).label("full_name"),
-            Credential.password,
             AuthUser.username,
             AuthUser.id.label("auth_user_id"),
             User.id.label("user_id"),
         )
         .join(User, User.id == AuthUser.user_id)
-        .join(Credential, Credential.auth_user_id == AuthUser.user_id)
-        .where(AuthUser.username == username, AuthUser.status_id == 1)
+        .join(Credential, Credential.auth_user_id == AuthUser.id)
+        .where(*whereclause, AuthUser.status_id == 1)
     ).subquery()
 
-    user_stmt_with_rol = (
+    return (
         select(
             get_user_stmt.c.group_id,
             get_user_stmt.c.profile_id,
             get_user_stmt.c.status_id,
             get_user_stmt.c.full_name,
-            get_user_stmt.c.password,
             get_user_stmt.c.username,
             get_user_stmt.c.auth_user_id,
             get_user_stmt.c.user_id,
@@ -230,81 +252,79 @@ async def get_user_or_none(username) -> UserLogin | None:
             get_user_stmt.c.profile_id,
             get_user_stmt.c.status_id,
             get_user_stmt.c.full_name,
-            get_user_stmt.c.password,
             get_user_stmt.c.username,
             get_user_stmt.c.auth_user_id,
             get_user_stmt.c.user_id,
         )
     )
-    result = (await sess.execute(user_stmt_with_rol)).one_or_none()
-    await sess.close()
 
-    return result
 
-
-async def get_user_by_id(id: str) -> UserLogin | None:
+async def _load_principal(*whereclause) -> UserLogin | None:
 
     sess = await session()
 
     if sess is None:
         raise Exception("paso un error")  # pylint: disable=broad-exception-raised
 
-    get_user_stmt = (
-        select(
-            AuthUser.group_id,
-            AuthUser.profile_id,
-            AuthUser.status_id,
-            (User.firstname + " " + User.lastname).label("full_name"),
-            Credential.password,
-            AuthUser.username,
-            AuthUser.id.label("auth_user_id"),
-            User.id.label("user_id"),
-        )
-        .join(User, User.id == AuthUser.user_id)
-        .join(Credential, Credential.auth_user_id == AuthUser.user_id)
-        .where(AuthUser.id == int(id), AuthUser.status_id == 1)
-    ).subquery()
+    result = (await sess.execute(_principal_stmt(*whereclause))).one_or_none()
+    await sess.close()
 
-    user_stmt_with_rol = (
-        select(
-            get_user_stmt.c.group_id,
-            get_user_stmt.c.profile_id,
-            get_user_stmt.c.status_id,
-            get_user_stmt.c.full_name,
-            get_user_stmt.c.password,
-            get_user_stmt.c.username,
-            get_user_stmt.c.auth_user_id,
-            get_user_stmt.c.user_id,
-            func.json_agg(
-                func.json_build_object(
-                    "id",
-                    Rol.id,
-                    "name",
-                    Rol.name,
-                    "path_name",
-                    Rol.path_name,
-                    "icon",
-                    Rol.icon,
-                )
-            ).label("roles"),
-        )
-        .join(ProfileRol, get_user_stmt.c.profile_id == ProfileRol.profile_id)
-        .join(Rol, ProfileRol.rol_id == Rol.id)
-        .group_by(
-            get_user_stmt.c.group_id,
-            get_user_stmt.c.profile_id,
-            get_user_stmt.c.status_id,
-            get_user_stmt.c.full_name,
-            get_user_stmt.c.password,
-            get_user_stmt.c.username,
-            get_user_stmt.c.auth_user_id,
-            get_user_stmt.c.user_id,
+    if result is None:
+        return None
+
+    return UserLogin.model_validate(dict(result._mapping))
+
+
+async def load_user_by_username(username: str) -> UserLogin | None:
+    return await _load_principal(AuthUser.username == username)
+
+
+async def load_user_by_id(id: str) -> UserLogin | None:
+    return await _load_principal(AuthUser.id == int(id))
+
+
+principal_cache = PrincipalCache(
+    UserLogin,
+    load_by_id=load_user_by_id,
+    load_by_username=load_user_by_username,
+)
+principal_cache.listen_session_events()
+
+
+async def get_user_or_none(username) -> UserLogin | None:
+    return await principal_cache.get_by_username(username)
+
+
+async def get_user_by_id(id: str) -> UserLogin | None:
+    return await principal_cache.get_by_id(id)
+
+
+async def load_password_hash(auth_user_id: int) -> str | None:
+
+    sess = await session()
+    async with sess:
+        return await sess.scalar(
+            select(Credential.password).where(Credential.auth_user_id == auth_user_id)
         )
-    )
 
-    result = (await sess.execute(user_stmt_with_rol)).one_or_none()
-    await sess.close()
-    return result
+
+async def rehash_password(user: UserLogin, old_hash: str, new_hash: str):
+    """Store a hash computed with the current bcrypt settings"""
+
+    try:
+        sess = await session()
+        async with sess:
+            await sess.execute(
+                update(Credential)
+                .where(
+                    Credential.auth_user_id == user.auth_user_id,
+                    Credential.password == old_hash,
+                )
+                .values(password=new_hash)
+            )
+            await sess.commit()
+    except Exception as ex:  # pylint: disable=broad-exception-caught
+        logger.error(ex)
 
 
 def set_crendentials(user: UserLogin):
@@ -319,6 +339,6 @@ def set_crendentials(user: UserLogin):
     refresh_subject = RefreshTokenData(sub=str(user.auth_user_id))
 
     access_token = create_access_token(subject.model_dump())
-    refresh_token = create_refresh_token(refresh_subject.model_dump())
+    refresh_token = create_refresh_token(refresh_subject.model_dump(exclude_none=True))
 
     return access_token, refresh_token
@@ -0,0 +1,198 @@
+import os
+import json
+import asyncio
+from typing import Awaitable, Callable, Generic, TypeVar
+
+from pydantic import BaseModel
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from app.logger import logger
+from app.models import AuthUser, Credential, Profile, ProfileRol, Rol, User
+from app.utils.ttl_cache import TTLCache
+from app.external_services._redis import RedisService
+
+PRINCIPAL_CACHE_SIZE = int(os.getenv("PRINCIPAL_CACHE_SIZE") or 1024)
+PRINCIPAL_CACHE_TTL = float(os.getenv("PRINCIPAL_CACHE_TTL") or 30)
+PRINCIPAL_CACHE_REDIS_TTL = int(os.getenv("PRINCIPAL_CACHE_REDIS_TTL") or 300)
+INVALIDATION_CHANNEL = "principal:invalidate"
+
+P = TypeVar("P", bound=BaseModel)
+
+
+def _principal_tags(principal) -> set[str]:
+    return {
+        "all",
+        f"id:{principal.auth_user_id}",
+        f"user:{principal.user_id}",
+        f"profile:{principal.profile_id}",
+    }
+
+
+def _redis_tag(tag: str) -> str:
+    return f"principal:{tag}"
+
+
+class PrincipalCache(Generic[P]):
+    """Two-tier cache of the principals used by login and refresh.
+
+    Principals are looked up by auth_user id or by username, first in a
+    per-worker LRU with a short TTL and then in Redis, before falling back to
+    the database loaders. Principals carry no password hash, login reads it
+    from the database every time. Each Redis entry is indexed under the
+    ``principal:id:<auth_user_id>``, ``principal:user:<user_id>``,
+    ``principal:profile:<profile_id>`` and ``principal:all`` tags so
+    ``invalidate`` deletes exactly the affected keys and tells the other
+    workers, through pub/sub, to drop them from their LRU.
+    """
+
+    def __init__(
+        self,
+        model: type[P],
+        load_by_id: Callable[[str], Awaitable[P | None]],
+        load_by_username: Callable[[str], Awaitable[P | None]],
+    ):
+        self.model = model
+        self.load_by_id = load_by_id
+        self.load_by_username = load_by_username
+        self.local = TTLCache(PRINCIPAL_CACHE_SIZE, PRINCIPAL_CACHE_TTL)
+        self.redis = RedisService()
+        self._listener: asyncio.Task | None = None
+        self._tasks: set[asyncio.Task] = set()
+
+    @staticmethod
+    def _key(kind: str, value) -> str:
+        return f"principal:{kind}:{value}"
+
+    async def get_by_id(self, auth_user_id) -> P | None:
+        return await self._get("id", str(auth_user_id), self.load_by_id)
+
+    async def get_by_username(self, username: str) -> P | None:
+        return await self._get("username", username, self.load_by_username)
+
+    async def _get(self, kind: str, value: str, loader) -> P | None:
+        key = self._key(kind, value)
+
+        principal = self.local.get(key)
+        if principal is not None:
+            return principal
+
+        try:
+            cached = await self.redis.get_(key)
+        except Exception as ex:  # pylint: disable=broad-exception-caught
+            logger.error(ex)
+            cached = None
+
+        if cached is not None:
+            principal = self.model.model_validate(cached)
+        else:
+            principal = await loader(value)
+            if principal is None:
+                return None
+            await self._store_redis(principal)
+
+        self._store_local(principal)
+        return principal
+
+    def _store_local(self, principal: P):
+        self.local.set(self._key("id", principal.auth_user_id), principal)
+        self.local.set(self._key("username", principal.username), principal)
+
+    async def _store_redis(self, principal: P):
+        value = principal.model_dump(mode="json")
+
+        try:
+            await self.redis.mset_(
+                {
+                    self._key("id", principal.auth_user_id): value,
+                    self._key("username", principal.username): value,
+                },
+                PRINCIPAL_CACHE_REDIS_TTL,
+                tags=map(_redis_tag, _principal_tags(principal)),
+            )
+        except Exception as ex:  # pylint: disable=broad-exception-caught
+            logger.error(ex)
+
+    def _drop_local(self, tags: set[str]):
+        for key, principal in list(self.local.items()):
+            if tags & _principal_tags(principal):
+                self.local.pop(key)
+
+    async def invalidate(self, *tags: str):
+        """Drop every principal matching any of ``tags`` from both tiers."""
+        tag_set = set(tags)
+        self._drop_local(tag_set)
+
+        try:
+            await self.redis.invalidate_tags(*map(_redis_tag, tag_set))
+            client = await self.redis.get_client()
+            await client.publish(INVALIDATION_CHANNEL, json.dumps(sorted(tag_set)))
+        except Exception as ex:  # pylint: disable=broad-exception-caught
+            logger.error(ex)
+
+    async def _listen(self):
+        while True:
+            try:
+                client = await self.redis.get_client()
+                async with client.pubsub() as pubsub:
+                    await pubsub.subscribe(INVALIDATION_CHANNEL)
+                    async for message in pubsub.listen():
+                        if message["type"] == "message":
+                            self._drop_local(set(json.loads(message["data"])))
+            except asyncio.CancelledError:
+                raise
+            except Exception as ex:  # pylint: disable=broad-exception-caught
+                logger.error(ex)
+                await asyncio.sleep(5)
+
+    async def start(self):
+        self._listener = asyncio.create_task(self._listen())
+
+    async def stop(self):
+        if self._listener is not None:
+            self._listener.cancel()
+            try:
+                await self._listener
+            except asyncio.CancelledError:
+                pass
+            self._listener = None
+
+    def _collect_tags(self, session: Session, _flush_context):
+        tags: set[str] = session.info.setdefault("principal_tags", set())
+
+        for obj in (*session.new, *session.dirty, *session.deleted):
+            if isinstance(obj, AuthUser):
+                tags.add(f"id:{obj.id}")
+            elif isinstance(obj, Credential):
+                tags.add(f"id:{obj.auth_user_id}")
+            elif isinstance(obj, User):
+                tags.add(f"user:{obj.id}")
+            elif isinstance(obj, ProfileRol):
+                tags.add(f"profile:{obj.profile_id}")
+            elif isinstance(obj, Profile):
+                tags.add(f"profile:{obj.id}")
+            elif isinstance(obj, Rol):
+                tags.add("all")
+
+    def _invalidate_committed(self, session: Session):
+        tags = session.info.pop("principal_tags", None)
+        if not tags:
+            return
+
+        task = asyncio.get_running_loop().create_task(self.invalidate(*tags))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    @staticmethod
+    def _discard_tags(session: Session, _previous_transaction):
+        session.info.pop("principal_tags", None)
+
+    def listen_session_events(self):
+        """Invalidate principals whose rows are changed through an ORM flush.
+
+        Core ``update()``/``delete()`` statements bypass the flush, code that
+        uses them must call ``invalidate`` itself after committing.
+        """
+        event.listen(Session, "after_flush", self._collect_tags)
+        event.listen(Session, "after_commit", self._invalidate_committed)
+        event.listen(Session, "after_soft_rollback", self._discard_tags)
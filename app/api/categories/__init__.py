@@ -0,0 +1,10 @@
+from fastapi import APIRouter
+from .categories_router import category_router
+
+
+categories_router = APIRouter()
+categories_router.include_router(category_router)
+
+__all__ = [
+    "categories_router",
+]
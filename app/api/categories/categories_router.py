@@ -0,0 +1,50 @@
+from fastapi import APIRouter
+from app.dependencies import CurrentUser, DBSessionDep
+from app.api.categories.category_service import (
+    CategoryNode,
+    CategoryProduct,
+    CategoryService,
+    CategoryStock,
+)
+
+category_router = APIRouter(prefix="/categories", tags=["Categories"])
+
+
+@category_router.get("/tree", response_model=list[CategoryNode])
+async def category_tree(_: CurrentUser):
+    """
+    Category hierarchy from the per-worker cache
+    """
+
+    return await CategoryService.nodes()
+
+
+@category_router.get("/{category_id}/products", response_model=list[CategoryProduct])
+async def category_products(
+    _: CurrentUser,
+    sess: DBSessionDep,
+    category_id: int,
+    limit: int = 100,
+    offset: int = 0,
+):
+    """
+    Products of a category and all of its subcategories
+    """
+
+    service = CategoryService(sess)
+    return await service.products(category_id, limit=limit, offset=offset)
+
+
+@category_router.get("/{category_id}/stock", response_model=list[CategoryStock])
+async def category_stock(
+    _: CurrentUser,
+    sess: DBSessionDep,
+    category_id: int,
+    warehouse_id: int | None = None,
+):
+    """
+    Stock per warehouse of the products of a category and its subcategories
+    """
+
+    service = CategoryService(sess)
+    return await service.stock(category_id, warehouse_id=warehouse_id)
@@ -0,0 +1,177 @@
+from decimal import Decimal
+from typing import Mapping
+
+from pydantic import BaseModel
+from sqlalchemy import Select, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from fastapi import status, HTTPException
+
+from app.models import CategoryClosure, Inventory, Product
+from app.lib.dimension_cache import DimensionTable, dimension_cache
+
+
+class CategoryNode(BaseModel):
+    id: int
+    code: str | None
+    name: str | None
+    children: list["CategoryNode"] = []
+
+
+class CategoryProduct(BaseModel):
+    id: int
+    code: str
+    name: str
+    category_id: int
+    quality_id: int
+
+
+class CategoryStock(BaseModel):
+    warehouse_id: int
+    products: int
+    stock_quantity: Decimal
+
+
+class CategoryTree:
+    """Immutable index of the category hierarchy.
+
+    Built from the parent of every category, it keeps the children and the
+    path from the root of each node to render the tree. Subtree filters in
+    SQL go through ``category_closure`` instead, see ``subtree_ids``.
+    """
+
+    def __init__(self, parents: Mapping[int, int | None]):
+        self.parents = dict(parents)
+        children: dict[int | None, list[int]] = {}
+        for id_, parent in sorted(self.parents.items()):
+            children.setdefault(parent if parent in self.parents else None, []).append(id_)
+        self.children = {id_: tuple(ids) for id_, ids in children.items()}
+
+        # Parents before children, nodes caught in a cycle are left out.
+        self.paths: dict[int, tuple[int, ...]] = {}
+        stack = [(id_, ()) for id_ in reversed(self.children.get(None, ()))]
+        while stack:
+            id_, path = stack.pop()
+            self.paths[id_] = path = (*path, id_)
+            stack.extend((child, path) for child in reversed(self.children.get(id_, ())))
+
+    @classmethod
+    def from_table(cls, table: DimensionTable) -> "CategoryTree":
+        return cls({row.id: row.category_id for row in table.rows.values()})
+
+    def __contains__(self, id_: int) -> bool:
+        return id_ in self.paths
+
+    def ancestors(self, id_: int) -> tuple[int, ...]:
+        """Path from the root down to the parent of ``id_``."""
+        return self.paths.get(id_, ())[:-1]
+
+    def roots(self) -> tuple[int, ...]:
+        return self.children.get(None, ())
+
+
+class _TreeCache:
+    """The tree of the category table currently held by the dimension cache."""
+
+    def __init__(self):
+        self.table: DimensionTable | None = None
+        self.tree = CategoryTree({})
+
+    def get(self) -> CategoryTree:
+        table = dimension_cache.table("category")
+        if table is not self.table:
+            self.tree = CategoryTree.from_table(table)
+            self.table = table
+        return self.tree
+
+
+_tree_cache = _TreeCache()
+
+
+async def category_tree() -> CategoryTree:
+    await dimension_cache.ensure_loaded()
+    return _tree_cache.get()
+
+
+def subtree_ids(category_id: int) -> Select:
+    """``category_id`` and every category below it, one index range scan."""
+    return select(CategoryClosure.descendant_id).where(
+        CategoryClosure.ancestor_id == category_id
+    )
+
+
+class CategoryService:
+
+    def __init__(self, sess: AsyncSession):
+        self.sess = sess
+
+    async def _subtree(self, category_id: int) -> Select:
+        # Every category is its own descendant at depth 0.
+        found = await self.sess.scalar(
+            select(CategoryClosure.depth).where(
+                CategoryClosure.ancestor_id == category_id,
+                CategoryClosure.descendant_id == category_id,
+            )
+        )
+        if found is None:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND, detail="Category not found"
+            )
+        return subtree_ids(category_id)
+
+    @staticmethod
+    async def nodes() -> list[CategoryNode]:
+        tree = await category_tree()
+
+        def node(id_: int) -> CategoryNode:
+            row = dimension_cache.get("category", id_)
+            return CategoryNode(
+                id=id_,
+                code=row.code,
+                name=row.name,
+                children=[node(child) for child in tree.children.get(id_, ())],
+            )
+
+        return [node(id_) for id_ in tree.roots()]
+
+    async def products(
+        self, category_id: int, limit: int = 100, offset: int = 0
+    ) -> list[CategoryProduct]:
+        """Products of a category and all of its subcategories."""
+        ids = await self._subtree(category_id)
+        result = await self.sess.execute(
+            select(
+                Product.id,
+                Product.code,
+                Product.name,
+                Product.category_id,
+                Product.quality_id,
+            )
+            .where(Product.category_id.in_(ids))
+            .order_by(Product.id)
+            .limit(limit)
+            .offset(offset)
+        )
+
+        return [CategoryProduct.model_validate(row._mapping) for row in result]
+
+    async def stock(
+        self, category_id: int, warehouse_id: int | None = None
+    ) -> list[CategoryStock]:
+        """Stock per warehouse of the products of a category subtree."""
+        ids = await self._subtree(category_id)
+        stmt = (
+            select(
+                Inventory.warehouse_id,
+                func.count(Inventory.product_id).label("products"),
+                func.sum(Inventory.stock_quantity).label("stock_quantity"),
+            )
+            .join(Product, Product.id == Inventory.product_id)
+            .where(Product.category_id.in_(ids))
+            .group_by(Inventory.warehouse_id)
+            .order_by(Inventory.warehouse_id)
+        )
+        if warehouse_id is not None:
+            stmt = stmt.where(Inventory.warehouse_id == warehouse_id)
+
+        result = await self.sess.execute(stmt)
+        return [CategoryStock.model_validate(row._mapping) for row in result]
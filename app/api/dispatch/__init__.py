@@ -0,0 +1,10 @@
+from fastapi import APIRouter
+from .dispatch_router import dispatch_router
+
+
+dispatch_orders_router = APIRouter()
+dispatch_orders_router.include_router(dispatch_router)
+
+__all__ = [
+    "dispatch_orders_router",
+]
@@ -0,0 +1,88 @@
+from datetime import date
+from fastapi import APIRouter, Query
+from app.dependencies import CurrentUser, DBSessionDep
+from app.api.dispatch.dispatch_service import (
+    DispatchOrderIn,
+    DispatchOrderOut,
+    DispatchResult,
+    DispatchService,
+)
+from app.api.dispatch.reservation_service import Availability, ReservationService
+from app.api.dispatch.route_planner import (
+    DispatchPlan,
+    RouteAssignmentIn,
+    RoutePlanner,
+)
+
+dispatch_router = APIRouter(prefix="/dispatch", tags=["Dispatch"])
+
+
+@dispatch_router.post("/orders", response_model=DispatchOrderOut)
+async def create_order(
+    current_user: CurrentUser, sess: DBSessionDep, order: DispatchOrderIn
+):
+    """
+    Create a dispatch order reserving the stock of all its lines, or none
+    of them when any is short
+    """
+
+    service = DispatchService(sess)
+    return await service.create_order(order, current_user.user_id)
+
+
+@dispatch_router.post("/orders/{order_id}/release", response_model=DispatchResult)
+async def release_order(_: CurrentUser, sess: DBSessionDep, order_id: int):
+    """
+    Release the stock reserved by a dispatch order
+    """
+
+    service = DispatchService(sess)
+    return await service.release(order_id)
+
+
+@dispatch_router.post("/orders/{order_id}/dispatch", response_model=DispatchResult)
+async def dispatch_order(_: CurrentUser, sess: DBSessionDep, order_id: int):
+    """
+    Post the reserved stock of a dispatch order as SALIDA movements
+    """
+
+    service = DispatchService(sess)
+    return await service.dispatch(order_id)
+
+
+@dispatch_router.get("/availability", response_model=list[Availability])
+async def availability(
+    _: CurrentUser,
+    sess: DBSessionDep,
+    warehouse_id: int | None = None,
+    product_id: list[int] | None = Query(None),
+):
+    """
+    Stock, reserved and available quantities per warehouse and product
+    """
+
+    service = ReservationService(sess)
+    return await service.availability(warehouse_id, product_id)
+
+
+@dispatch_router.get("/plan", response_model=DispatchPlan)
+async def plan_day(_: CurrentUser, sess: DBSessionDep, day: date):
+    """
+    Pick lists per route and warehouse and route loads of the orders pending
+    on a day
+    """
+
+    planner = RoutePlanner(sess)
+    return await planner.plan(day)
+
+
+@dispatch_router.post("/routes/{route_id}/orders")
+async def assign_orders(
+    _: CurrentUser, sess: DBSessionDep, route_id: int, assignment: RouteAssignmentIn
+):
+    """
+    Assign a batch of dispatch orders to a route
+    """
+
+    planner = RoutePlanner(sess)
+    return {"assigned": await planner.assign(route_id, assignment.order_ids)}
@@ -0,0 +1,159 @@
+from decimal import Decimal
+
+from pydantic import BaseModel, Field
+from sqlalchemy import insert, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from fastapi import status, HTTPException
+
+from app.models import DispatchOrder, DispatchOrderDetail
+from app.api.inventory.inventory_service import (
+    InventoryService,
+    MovementIn,
+    PostingResult,
+)
+from app.api.dispatch.reservation_service import (
+    ClosedReservation,
+    ReservationLine,
+    ReservationService,
+)
+
+
+class DispatchLineIn(BaseModel):
+    warehouse_id: int
+    product_id: int
+    quantity: Decimal = Field(gt=0, max_digits=10, decimal_places=2)
+
+
+class DispatchOrderIn(BaseModel):
+    order_number: str = Field(max_length=50)
+    notes: str | None = None
+    lines: list[DispatchLineIn] = Field(min_length=1)
+
+
+class DispatchOrderOut(BaseModel):
+    id: int
+    order_number: str
+    reservations: list[ReservationLine]
+
+
+class DispatchResult(BaseModel):
+    order_id: int
+    reservations: list[ClosedReservation]
+    posting: PostingResult | None = None
+
+
+class DispatchService:
+
+    def __init__(self, sess: AsyncSession):
+        self.sess = sess
+        self.reservations = ReservationService(sess)
+
+    async def create_order(self, order: DispatchOrderIn, user_id: int) -> DispatchOrderOut:
+        """Create an order and reserve its lines in one transaction.
+
+        The order is not kept when any line is short of available stock.
+        """
+        row = DispatchOrder(
+            order_number=order.order_number,
+            notes=order.notes,
+            created_by_user_id=user_id,
+        )
+        self.sess.add(row)
+        try:
+            await self.sess.flush()
+            order_id = row.id
+            await self.sess.execute(
+                insert(DispatchOrderDetail),
+                [
+                    {"dispatch_order_id": order_id, **line.model_dump()}
+                    for line in order.lines
+                ],
+            )
+            lines = await self.reservations.reserve(order_id)
+        except IntegrityError as ex:
+            await self.sess.rollback()
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail="Duplicated order number or unknown product or warehouse",
+            ) from ex
+        except Exception:
+            await self.sess.rollback()
+            raise
+
+        short = [line for line in lines if not line.reserved]
+        if short:
+            await self.sess.rollback()
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail={
+                    "message": "Insufficient available stock",
+                    "lines": [line.model_dump(mode="json") for line in short],
+                },
+            )
+
+        await self.sess.commit()
+        return DispatchOrderOut(
+            id=order_id, order_number=order.order_number, reservations=lines
+        )
+
+    async def _order_number(self, order_id: int) -> str:
+        order_number = await self.sess.scalar(
+            select(DispatchOrder.order_number).where(DispatchOrder.id == order_id)
+        )
+        if order_number is None:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Dispatch order not found",
+            )
+        return order_number
+
+    async def _close(self, order_id: int, status_: str) -> list[ClosedReservation]:
+        closed = await self.reservations.close(order_id, status_)
+        if not closed:
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail="The order has no active reservations",
+            )
+        return closed
+
+    async def release(self, order_id: int) -> DispatchResult:
+        """Give the stock reserved by an order back to the available stock."""
+        await self._order_number(order_id)
+        try:
+            closed = await self._close(order_id, "LIBERADA")
+            await self.sess.commit()
+        except Exception:
+            await self.sess.rollback()
+            raise
+
+        return DispatchResult(order_id=order_id, reservations=closed)
+
+    async def dispatch(self, order_id: int) -> DispatchResult:
+        """Consume the reservations of an order as SALIDA movements.
+
+        The reservations are closed and the movements posted in the same
+        transaction, so the available stock does not change on the way.
+        """
+        order_number = await self._order_number(order_id)
+        try:
+            closed = await self._close(order_id, "CONSUMIDA")
+        except Exception:
+            await self.sess.rollback()
+            raise
+
+        posting = await InventoryService(self.sess).post_movements(
+            [
+                MovementIn(
+                    warehouse_id=line.warehouse_id,
+                    product_id=line.product_id,
+                    movement_type="SALIDA",
+                    quantity=line.quantity,
+                    unit_measure_id=line.unit_measure_id,
+                    source_document=order_number,
+                )
+                for line in closed
+            ]
+        )
+
+        return DispatchResult(order_id=order_id, reservations=closed, posting=posting)
@@ -0,0 +1,146 @@
+"""Latency of the daily dispatch plan as the number of orders grows.
+
+Run with ``python -m app.api.dispatch.plan_benchmark [orders ...]`` against
+the configured database. The dispatch tables are recreated in a scratch
+schema that is dropped at the end; the products and units of measure are
+read from the public schema. For each size the orders of one day are
+generated with their active reservations, spread over the routes with a
+re-assignment for one order in ten, and the plan is timed.
+"""
+import sys
+import time
+import asyncio
+import statistics
+from datetime import datetime
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core import connection_manager
+from app.api.dispatch.route_planner import RoutePlanner
+
+SCHEMA = "dispatch_plan_benchmark"
+SIZES = (1_000, 5_000, 20_000)
+LINES = 5
+ROUTES = 20
+WAREHOUSES = 3
+RUNS = 10
+DAY = datetime(2000, 1, 3)
+TABLES = (
+    "dispatch_routes",
+    "dispatch_orders",
+    "dispatch_route_assignments",
+    "stock_reservations",
+)
+
+
+async def _setup(sess: AsyncSession) -> list[int]:
+    await sess.execute(text(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE"))
+    await sess.execute(text(f"CREATE SCHEMA {SCHEMA}"))
+    for table in TABLES:
+        await sess.execute(
+            text(f"CREATE TABLE {SCHEMA}.{table} (LIKE public.{table} INCLUDING ALL)")
+        )
+        await sess.execute(text(f"CREATE SEQUENCE {SCHEMA}.{table}_id_seq"))
+        await sess.execute(
+            text(
+                f"ALTER TABLE {SCHEMA}.{table} ALTER COLUMN id "
+                f"SET DEFAULT nextval('{SCHEMA}.{table}_id_seq')"
+            )
+        )
+    await sess.execute(text(f"SET search_path TO {SCHEMA}, public"))
+    await sess.execute(
+        text("""
+            INSERT INTO dispatch_routes (id, name)
+            SELECT r, 'Ruta ' || r FROM generate_series(1, :routes) r
+        """),
+        {"routes": ROUTES},
+    )
+    products = list(await sess.scalars(text("SELECT id FROM products ORDER BY id")))
+    if len(products) < LINES:
+        raise SystemExit(f"At least {LINES} products are needed")
+    await sess.commit()
+
+    return products
+
+
+async def _grow(sess: AsyncSession, rows: int, size: int, products: list[int]):
+    params = {"low": rows + 1, "high": size, "day": DAY, "products": products}
+    await sess.execute(
+        text("""
+            INSERT INTO dispatch_orders (id, order_number, dispatch_date, created_by_user_id)
+            SELECT i, 'B' || i, CAST(:day AS timestamp), 0 FROM generate_series(:low, :high) i
+        """),
+        params,
+    )
+    await sess.execute(
+        text("""
+            INSERT INTO stock_reservations (dispatch_order_id, warehouse_id, product_id, quantity)
+            SELECT i, 1 + i % :warehouses,
+                   (CAST(:products AS integer[]))[
+                       1 + (i * 7 + l) % cardinality(CAST(:products AS integer[]))
+                   ],
+                   1 + (i + l) % 9
+            FROM generate_series(:low, :high) i, generate_series(1, :lines) l
+        """),
+        {**params, "warehouses": WAREHOUSES, "lines": LINES},
+    )
+    await sess.execute(
+        text("""
+            INSERT INTO dispatch_route_assignments (dispatch_order_id, route_id, assigned_at)
+            SELECT i, 1 + i % :routes, CAST(:day AS timestamp) FROM generate_series(:low, :high) i
+            UNION ALL
+            SELECT i, 1 + (i + 1) % :routes, CAST(:day AS timestamp) + interval '1 hour'
+            FROM generate_series(:low, :high) i
+            WHERE i % 10 = 0
+        """),
+        {**params, "routes": ROUTES},
+    )
+    await sess.execute(
+        text("ANALYZE dispatch_orders, stock_reservations, dispatch_route_assignments")
+    )
+    await sess.commit()
+
+
+async def run(sizes: tuple[int, ...] = SIZES):
+    engine = connection_manager.get_engine()
+
+    async with engine.connect() as connection:
+        sess = AsyncSession(bind=connection)
+        products = await _setup(sess)
+        planner = RoutePlanner(sess)
+
+        try:
+            rows = 0
+            for size in sorted(sizes):
+                await _grow(sess, rows, size, products)
+                rows = size
+
+                timings = []
+                for _ in range(RUNS):
+                    started = time.perf_counter()
+                    plan = await planner.plan(DAY.date())
+                    timings.append((time.perf_counter() - started) * 1000)
+                    await sess.rollback()
+
+                lines = sum(
+                    len(pick_list.lines)
+                    for route in plan.routes
+                    for pick_list in route.pick_lists
+                )
+                print(
+                    f"{size:>8} orders  {len(plan.routes)} routes  {lines} pick lines  "
+                    f"median {statistics.median(timings):.1f}ms  max {max(timings):.1f}ms  "
+                    f"{'OK' if plan.orders == size else 'FAILED'}"
+                )
+        finally:
+            await sess.rollback()
+            await sess.execute(text(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE"))
+            await sess.commit()
+            await sess.close()
+
+    await connection_manager.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(run(tuple(int(arg) for arg in sys.argv[1:]) or SIZES))
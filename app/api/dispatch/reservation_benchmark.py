@@ -0,0 +1,223 @@
+"""Contention of stock reservations under concurrent dispatch orders.
+
+Run with ``python -m app.api.dispatch.reservation_benchmark [workers] [orders]``
+against the configured database. The inventory and dispatch tables are
+recreated in a scratch schema that is dropped at the end, stocked with a few
+hot products shared by every worker and many cold ones. Each worker creates
+its orders back to back, half of them including a hot product, and releases
+every other order it got so the hot stock keeps changing hands. Latencies are
+reported separately for orders with and without hot products: orders that
+only touch cold products should not queue behind the hot ones. At the end the
+reserved quantities are checked against the active reservations.
+"""
+import sys
+import time
+import random
+import asyncio
+import statistics
+from decimal import Decimal
+
+from fastapi import HTTPException
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core import connection_manager
+from app.api.dispatch.dispatch_service import (
+    DispatchLineIn,
+    DispatchOrderIn,
+    DispatchService,
+)
+
+SCHEMA = "reservation_benchmark"
+WORKERS = 32
+ORDERS = 100
+LINES = 5
+HOT_PRODUCTS = 3
+COLD_PRODUCTS = 200
+WAREHOUSE = 1
+# Hot stock for roughly a third of the hot orders at once.
+HOT_STOCK = Decimal(WORKERS * ORDERS // 6)
+COLD_STOCK = Decimal(1_000_000)
+TABLES = ("inventory", "dispatch_orders", "dispatch_order_details", "stock_reservations")
+
+
+async def _setup(sess: AsyncSession) -> tuple[list[int], list[int]]:
+    await sess.execute(text(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE"))
+    await sess.execute(text(f"CREATE SCHEMA {SCHEMA}"))
+    for table in TABLES:
+        await sess.execute(
+            text(f"CREATE TABLE {SCHEMA}.{table} (LIKE public.{table} INCLUDING ALL)")
+        )
+        # LIKE copies the id defaults, which would draw from the public sequences.
+        await sess.execute(text(f"CREATE SEQUENCE {SCHEMA}.{table}_id_seq"))
+        await sess.execute(
+            text(
+                f"ALTER TABLE {SCHEMA}.{table} ALTER COLUMN id "
+                f"SET DEFAULT nextval('{SCHEMA}.{table}_id_seq')"
+            )
+        )
+
+    # Releasing reads the unit of measure of the products.
+    products = list(
+        await sess.scalars(
+            text("SELECT id FROM public.products ORDER BY id LIMIT :n"),
+            {"n": HOT_PRODUCTS + COLD_PRODUCTS},
+        )
+    )
+    if len(products) < HOT_PRODUCTS + LINES:
+        raise SystemExit(f"At least {HOT_PRODUCTS + LINES} products are needed")
+    hot, cold = products[:HOT_PRODUCTS], products[HOT_PRODUCTS:]
+
+    await sess.execute(
+        text(f"""
+            INSERT INTO {SCHEMA}.inventory (warehouse_id, product_id, stock_quantity)
+            SELECT :warehouse, p, CASE WHEN p = ANY(:hot) THEN :hot_stock ELSE :cold_stock END
+            FROM unnest(CAST(:products AS integer[])) p
+        """),
+        {
+            "warehouse": WAREHOUSE,
+            "hot": hot,
+            "products": products,
+            "hot_stock": HOT_STOCK,
+            "cold_stock": COLD_STOCK,
+        },
+    )
+    await sess.commit()
+
+    return hot, cold
+
+
+async def _worker(
+    number: int, hot: list[int], cold: list[int], orders: int
+) -> list[tuple[bool, bool, float]]:
+    """(hot order, reserved, seconds) of every order of the worker."""
+    rng = random.Random(number)
+    timings = []
+
+    engine = connection_manager.get_engine()
+    async with engine.connect() as connection:
+        sess = AsyncSession(bind=connection)
+        await sess.execute(text(f"SET search_path TO {SCHEMA}, public"))
+        await sess.commit()
+        service = DispatchService(sess)
+
+        try:
+            kept = 0
+            for order in range(orders):
+                is_hot = order % 2 == 0
+                products = rng.sample(cold, LINES - 1 if is_hot else LINES)
+                if is_hot:
+                    products.append(rng.choice(hot))
+                rng.shuffle(products)
+
+                started = time.perf_counter()
+                try:
+                    created = await service.create_order(
+                        DispatchOrderIn(
+                            order_number=f"W{number}-{order}",
+                            lines=[
+                                DispatchLineIn(
+                                    warehouse_id=WAREHOUSE,
+                                    product_id=product,
+                                    quantity=Decimal(rng.randint(1, 3)),
+                                )
+                                for product in products
+                            ],
+                        ),
+                        user_id=0,
+                    )
+                    reserved = True
+                except HTTPException as ex:
+                    if ex.status_code != 409:
+                        raise
+                    reserved = False
+                timings.append((is_hot, reserved, time.perf_counter() - started))
+
+                if reserved:
+                    kept += 1
+                    if kept % 2 == 0:
+                        await service.release(created.id)
+        finally:
+            await sess.rollback()
+            await sess.execute(text("RESET search_path"))
+            await sess.commit()
+            await sess.close()
+
+    return timings
+
+
+def _summary(label: str, timings: list[tuple[bool, bool, float]]) -> str:
+    if not timings:
+        return f"{label}: none"
+    seconds = sorted(timing[2] * 1000 for timing in timings)
+    reserved = sum(1 for timing in timings if timing[1])
+    p95 = seconds[min(len(seconds) - 1, int(len(seconds) * 0.95))]
+    return (
+        f"{label}: {len(seconds)} orders, {reserved} reserved  "
+        f"p50 {statistics.median(seconds):.2f}ms  p95 {p95:.2f}ms  "
+        f"max {seconds[-1]:.2f}ms"
+    )
+
+
+async def run(workers: int = WORKERS, orders: int = ORDERS):
+    engine = connection_manager.get_engine()
+    ok = False
+
+    async with engine.connect() as connection:
+        sess = AsyncSession(bind=connection)
+        hot, cold = await _setup(sess)
+
+        try:
+            started = time.perf_counter()
+            results = await asyncio.gather(
+                *(_worker(number, hot, cold, orders) for number in range(workers))
+            )
+            elapsed = time.perf_counter() - started
+            timings = [timing for result in results for timing in result]
+
+            check = (
+                await sess.execute(
+                    text(f"""
+                        SELECT count(*) FILTER (
+                                   WHERE i.reserved_quantity <> COALESCE(r.quantity, 0)
+                               ) AS mismatched,
+                               count(*) FILTER (
+                                   WHERE i.reserved_quantity > i.stock_quantity
+                               ) AS oversold
+                        FROM {SCHEMA}.inventory i
+                        LEFT JOIN (
+                            SELECT warehouse_id, product_id, SUM(quantity) AS quantity
+                            FROM {SCHEMA}.stock_reservations
+                            WHERE status = 'ACTIVA'
+                            GROUP BY warehouse_id, product_id
+                        ) r ON r.warehouse_id = i.warehouse_id AND r.product_id = i.product_id
+                    """)
+                )
+            ).one()
+            await sess.commit()
+
+            ok = check.mismatched == 0 and check.oversold == 0
+            print(
+                f"{len(timings)} orders by {workers} workers in {elapsed:.3f}s "
+                f"({len(timings) / elapsed:.0f} orders/s)"
+            )
+            print(_summary("  with hot products", [t for t in timings if t[0]]))
+            print(_summary("  cold products only", [t for t in timings if not t[0]]))
+            print(
+                f"  balances not matching reservations: {check.mismatched}  "
+                f"oversold: {check.oversold}  {'OK' if ok else 'FAILED'}"
+            )
+        finally:
+            await sess.rollback()
+            await sess.execute(text(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE"))
+            await sess.commit()
+            await sess.close()
+
+    await connection_manager.close()
+
+    if not ok:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    asyncio.run(run(*(int(arg) for arg in sys.argv[1:3])))
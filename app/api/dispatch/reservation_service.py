@@ -0,0 +1,153 @@
+from decimal import Decimal
+from typing import Literal
+
+from pydantic import BaseModel
+from sqlalchemy import select, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models import Inventory
+
+ReservationStatus = Literal["ACTIVA", "LIBERADA", "CONSUMIDA"]
+
+# Reserve every line of a dispatch order in one statement. The balances are
+# locked in (warehouse_id, product_id) order, the order used by the posting
+# service, so two orders only wait on each other for the products they share
+# and never deadlock. Each balance is incremented only if it still has the
+# quantity available once locked; the reservations are inserted only if all
+# of them were, otherwise the caller rolls back the increments.
+RESERVE_ORDER = text("""
+    WITH requested AS (
+        SELECT warehouse_id, product_id, SUM(quantity) AS quantity
+        FROM dispatch_order_details
+        WHERE dispatch_order_id = :order_id
+        GROUP BY warehouse_id, product_id
+    ), locked AS (
+        -- Read at the locked version, not the statement snapshot.
+        SELECT i.id, r.warehouse_id, r.product_id, r.quantity,
+               i.stock_quantity - i.reserved_quantity AS available
+        FROM inventory i
+        JOIN requested r
+          ON r.warehouse_id = i.warehouse_id AND r.product_id = i.product_id
+        ORDER BY i.warehouse_id, i.product_id
+        FOR UPDATE OF i
+    ), reserved AS (
+        UPDATE inventory i
+        SET reserved_quantity = i.reserved_quantity + l.quantity,
+            last_update = now()
+        FROM locked l
+        WHERE i.id = l.id
+          AND i.stock_quantity - i.reserved_quantity >= l.quantity
+        RETURNING i.warehouse_id, i.product_id, l.quantity
+    ), created AS (
+        INSERT INTO stock_reservations (dispatch_order_id, warehouse_id, product_id, quantity)
+        SELECT :order_id, warehouse_id, product_id, quantity
+        FROM reserved
+        WHERE (SELECT count(*) FROM reserved) = (SELECT count(*) FROM requested)
+        RETURNING warehouse_id, product_id
+    )
+    SELECT r.warehouse_id, r.product_id, r.quantity,
+           COALESCE(l.available, 0) AS available,
+           EXISTS (
+               SELECT 1 FROM created c
+               WHERE c.warehouse_id = r.warehouse_id AND c.product_id = r.product_id
+           ) AS reserved
+    FROM requested r
+    LEFT JOIN locked l
+      ON l.warehouse_id = r.warehouse_id AND l.product_id = r.product_id
+    ORDER BY r.warehouse_id, r.product_id
+""")
+
+# Close the active reservations of an order and give their quantity back,
+# locking the balances in the same order as RESERVE_ORDER.
+CLOSE_RESERVATIONS = text("""
+    WITH closed AS (
+        UPDATE stock_reservations
+        SET status = :status, closed_at = now()
+        WHERE dispatch_order_id = :order_id AND status = 'ACTIVA'
+        RETURNING warehouse_id, product_id, quantity
+    ), locked AS (
+        SELECT i.id, c.quantity
+        FROM inventory i
+        JOIN closed c
+          ON c.warehouse_id = i.warehouse_id AND c.product_id = i.product_id
+        ORDER BY i.warehouse_id, i.product_id
+        FOR UPDATE OF i
+    )
+    UPDATE inventory i
+    SET reserved_quantity = i.reserved_quantity - l.quantity,
+        last_update = now()
+    FROM locked l, products p
+    WHERE i.id = l.id AND p.id = i.product_id
+    RETURNING i.warehouse_id, i.product_id, l.quantity, p.unit_measure_id
+""")
+
+
+class ReservationLine(BaseModel):
+    warehouse_id: int
+    product_id: int
+    quantity: Decimal
+    available: Decimal
+    reserved: bool
+
+
+class ClosedReservation(BaseModel):
+    warehouse_id: int
+    product_id: int
+    quantity: Decimal
+    unit_measure_id: int
+
+
+class Availability(BaseModel):
+    warehouse_id: int
+    product_id: int
+    stock_quantity: Decimal
+    reserved_quantity: Decimal
+    available_quantity: Decimal
+
+
+class ReservationService:
+    """Statements over ``stock_reservations``, the caller commits."""
+
+    def __init__(self, sess: AsyncSession):
+        self.sess = sess
+
+    async def reserve(self, order_id: int) -> list[ReservationLine]:
+        """Reserve the lines of an order, all of them or none.
+
+        When a line is short nothing is reserved, but the balances that did
+        fit were already incremented: the transaction must be rolled back.
+        """
+        result = await self.sess.execute(RESERVE_ORDER, {"order_id": order_id})
+        return [ReservationLine.model_validate(row._mapping) for row in result]
+
+    async def close(
+        self, order_id: int, status: ReservationStatus
+    ) -> list[ClosedReservation]:
+        """Release or consume the active reservations of an order."""
+        result = await self.sess.execute(
+            CLOSE_RESERVATIONS, {"order_id": order_id, "status": status}
+        )
+        return sorted(
+            (ClosedReservation.model_validate(row._mapping) for row in result),
+            key=lambda line: (line.warehouse_id, line.product_id),
+        )
+
+    async def availability(
+        self, warehouse_id: int | None = None, product_ids: list[int] | None = None
+    ) -> list[Availability]:
+        stmt = select(
+            Inventory.warehouse_id,
+            Inventory.product_id,
+            Inventory.stock_quantity,
+            Inventory.reserved_quantity,
+            (Inventory.stock_quantity - Inventory.reserved_quantity).label(
+                "available_quantity"
+            ),
+        ).order_by(Inventory.warehouse_id, Inventory.product_id)
+        if warehouse_id is not None:
+            stmt = stmt.where(Inventory.warehouse_id == warehouse_id)
+        if product_ids:
+            stmt = stmt.where(Inventory.product_id.in_(product_ids))
+
+        result = await self.sess.execute(stmt)
+        return [Availability.model_validate(row._mapping) for row in result]
@@ -0,0 +1,167 @@
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+
+from pydantic import BaseModel, Field
+from sqlalchemy import insert, text
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from fastapi import status, HTTPException
+
+from app.models import DispatchRouteAssignment
+
+# Pick lines of the day per route, warehouse and product plus one total row
+# per route, in a single pass over the active reservations. The route of an
+# order is its latest assignment. Loads follow the sale unit of the product:
+# pallets, boxes and square meters are converted with the product measures,
+# and are left NULL when a measure is missing.
+PLAN_DAY = text("""
+    WITH orders AS (
+        SELECT o.id, a.route_id
+        FROM dispatch_orders o
+        LEFT JOIN LATERAL (
+            SELECT a.route_id
+            FROM dispatch_route_assignments a
+            WHERE a.dispatch_order_id = o.id
+            ORDER BY a.assigned_at DESC, a.id DESC
+            LIMIT 1
+        ) a ON true
+        WHERE o.dispatch_date >= :since AND o.dispatch_date < :until
+    ), picks AS (
+        SELECT o.route_id, r.dispatch_order_id, r.warehouse_id, r.product_id,
+               r.quantity,
+               CASE u.code
+                   WHEN 'PALETA' THEN r.quantity
+                   WHEN 'CAJA' THEN r.quantity * p.mt2_box / NULLIF(p.mt2_pallet, 0)
+                   WHEN 'M2' THEN r.quantity / NULLIF(p.mt2_pallet, 0)
+               END AS pallets,
+               CASE u.code
+                   WHEN 'PALETA' THEN r.quantity * p.pallet_load_weight
+                   WHEN 'CAJA' THEN r.quantity * p.box_weight
+                   WHEN 'M2' THEN r.quantity / NULLIF(p.mt2_box, 0) * p.box_weight
+                   WHEN 'KG' THEN r.quantity
+               END AS weight,
+               CASE u.code
+                   WHEN 'PALETA' THEN r.quantity * p.mt2_pallet
+                   WHEN 'CAJA' THEN r.quantity * p.mt2_box
+                   WHEN 'M2' THEN r.quantity
+               END AS mt2
+        FROM orders o
+        JOIN stock_reservations r
+          ON r.dispatch_order_id = o.id AND r.status = 'ACTIVA'
+        JOIN products p ON p.id = r.product_id
+        JOIN unit_measure u ON u.id = p.unit_measure_id
+    ), grouped AS (
+        SELECT route_id, warehouse_id, product_id,
+               GROUPING(warehouse_id, product_id) <> 0 AS is_total,
+               SUM(quantity) AS quantity,
+               count(DISTINCT dispatch_order_id) AS orders,
+               ROUND(SUM(pallets), 2) AS pallets,
+               ROUND(SUM(weight), 2) AS weight_kg,
+               ROUND(SUM(mt2), 2) AS mt2,
+               count(*) FILTER (WHERE weight IS NULL) AS unweighed
+        FROM picks
+        GROUP BY GROUPING SETS ((route_id, warehouse_id, product_id), (route_id))
+    )
+    SELECT g.*, dr.name AS route_name, p.code, p.name, u.code AS unit
+    FROM grouped g
+    LEFT JOIN dispatch_routes dr ON dr.id = g.route_id
+    LEFT JOIN products p ON p.id = g.product_id
+    LEFT JOIN unit_measure u ON u.id = p.unit_measure_id
+    ORDER BY g.route_id NULLS LAST, g.is_total DESC, g.warehouse_id, p.code
+""")
+
+
+class RouteAssignmentIn(BaseModel):
+    order_ids: list[int] = Field(min_length=1)
+
+
+class PickLine(BaseModel):
+    product_id: int
+    code: str
+    name: str
+    unit: str
+    quantity: Decimal
+    orders: int
+    pallets: Decimal | None = None
+    weight_kg: Decimal | None = None
+    mt2: Decimal | None = None
+
+
+class PickList(BaseModel):
+    warehouse_id: int
+    lines: list[PickLine] = []
+
+
+class RouteLoad(BaseModel):
+    # None groups the orders not assigned to a route.
+    route_id: int | None
+    route_name: str | None = None
+    orders: int
+    pallets: Decimal | None = None
+    weight_kg: Decimal | None = None
+    mt2: Decimal | None = None
+    # Lines left out of weight_kg for lack of product measures.
+    unweighed: int = 0
+    pick_lists: list[PickList] = []
+
+
+class DispatchPlan(BaseModel):
+    day: date
+    orders: int
+    routes: list[RouteLoad]
+
+
+class RoutePlanner:
+
+    def __init__(self, sess: AsyncSession):
+        self.sess = sess
+
+    async def plan(self, day: date) -> DispatchPlan:
+        """Consolidated pick lists and loads of the orders pending on ``day``.
+
+        Pending orders are the ones dated that day that still hold active
+        reservations; each is counted on the route it was last assigned to.
+        """
+        since = datetime.combine(day, time())
+        result = await self.sess.execute(
+            PLAN_DAY, {"since": since, "until": since + timedelta(days=1)}
+        )
+
+        routes: list[RouteLoad] = []
+        for row in result:
+            if row.is_total:
+                route = RouteLoad.model_validate(row._mapping)
+                routes.append(route)
+                continue
+
+            pick_lists = route.pick_lists
+            if not pick_lists or pick_lists[-1].warehouse_id != row.warehouse_id:
+                pick_lists.append(PickList(warehouse_id=row.warehouse_id))
+            pick_lists[-1].lines.append(PickLine.model_validate(row._mapping))
+
+        return DispatchPlan(
+            day=day, orders=sum(route.orders for route in routes), routes=routes
+        )
+
+    async def assign(self, route_id: int, order_ids: list[int]) -> int:
+        """Assign orders to a route, replacing their previous route."""
+        try:
+            await self.sess.execute(
+                insert(DispatchRouteAssignment),
+                [
+                    {"dispatch_order_id": order_id, "route_id": route_id}
+                    for order_id in dict.fromkeys(order_ids)
+                ],
+            )
+            await self.sess.commit()
+        except IntegrityError as ex:
+            await self.sess.rollback()
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Route or dispatch order not found",
+            ) from ex
+        except Exception:
+            await self.sess.rollback()
+            raise
+
+        return len(set(order_ids))
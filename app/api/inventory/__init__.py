@@ -0,0 +1,10 @@
+from fastapi import APIRouter
+from .inventory_router import movements_router
+
+
+inventory_router = APIRouter()
+inventory_router.include_router(movements_router)
+
+__all__ = [
+    "inventory_router",
+]
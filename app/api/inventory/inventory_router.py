@@ -0,0 +1,136 @@
+from datetime import datetime
+from fastapi import APIRouter, Body, Request
+from app.core import admission_controller, connection_manager
+from app.dependencies import CurrentUser, DBSessionDep
+from app.api.inventory.inventory_service import (
+    InventoryService,
+    MovementIn,
+    PostingResult,
+)
+from app.api.inventory.movement_ingest import (
+    IngestFormat,
+    IngestResult,
+    MovementIngestService,
+    iter_spool,
+    spool_body,
+)
+from app.api.inventory.partition_service import (
+    InventoryPartitionService,
+    MovementPartition,
+)
+from app.api.inventory.snapshot_service import (
+    INVENTORY_PARTITIONS_AHEAD,
+    AsOfBalance,
+    InventorySnapshotService,
+    SnapshotRun,
+    inventory_snapshotter,
+)
+
+movements_router = APIRouter(prefix="/inventory", tags=["Inventory"])
+
+
+@movements_router.post("/movements", response_model=PostingResult)
+async def post_movements(
+    _: CurrentUser,
+    sess: DBSessionDep,
+    movements: list[MovementIn] = Body(min_length=1),
+    allow_negative: bool = False,
+):
+    """
+    Post a batch of ENTRADA/SALIDA movements and update the stock balances
+    in one transaction
+    """
+
+    service = InventoryService(sess)
+    return await service.post_movements(movements, allow_negative=allow_negative)
+
+
+@movements_router.post("/movements/bulk", response_model=IngestResult)
+async def ingest_movements(
+    _: CurrentUser,
+    request: Request,
+    fmt: IngestFormat | None = None,
+    allow_negative: bool = False,
+):
+    """
+    Stream a NDJSON or CSV body of movements (CSV with a header line), rows
+    that fail validation are returned as rejects and the rest is posted
+    """
+
+    if fmt is None:
+        fmt = "csv" if "csv" in request.headers.get("content-type", "") else "ndjson"
+
+    # The body is received whole before a connection and an admission
+    # permit are taken, a slow upload holds neither.
+    spool = await spool_body(request.stream())
+    try:
+        async with admission_controller.admit():
+            async with connection_manager.get_context_session() as sess:
+                service = MovementIngestService(sess)
+                return await service.ingest(
+                    iter_spool(spool), fmt=fmt, allow_negative=allow_negative
+                )
+    finally:
+        spool.close()
+
+
+@movements_router.get("/stock/as-of", response_model=list[AsOfBalance])
+async def stock_as_of(
+    _: CurrentUser,
+    sess: DBSessionDep,
+    as_of: datetime,
+    warehouse_id: int | None = None,
+    product_id: int | None = None,
+):
+    """
+    Stock balances at a past date, from the nearest snapshot plus the
+    movements after it
+    """
+
+    service = InventorySnapshotService(sess)
+    return await service.as_of(as_of, warehouse_id=warehouse_id, product_id=product_id)
+
+
+@movements_router.post("/snapshots", response_model=SnapshotRun)
+async def take_snapshot(_: CurrentUser):
+    """
+    Take a stock snapshot and compact old ones now, unless another worker
+    is already doing it
+    """
+
+    return await inventory_snapshotter.run_once()
+
+
+@movements_router.get("/partitions", response_model=list[MovementPartition])
+async def list_partitions(_: CurrentUser, sess: DBSessionDep):
+    """
+    Monthly partitions of inventory_movements
+    """
+
+    service = InventoryPartitionService(sess)
+    return await service.list_partitions()
+
+
+@movements_router.post("/partitions/ensure")
+async def ensure_partitions(
+    _: CurrentUser, sess: DBSessionDep, months: int = INVENTORY_PARTITIONS_AHEAD
+):
+    """
+    Create the partitions of the next months that do not exist yet
+    """
+
+    service = InventoryPartitionService(sess)
+    return {"created": await service.ensure_upcoming(months)}
+
+
+@movements_router.post("/partitions/{name}/detach", response_model=MovementPartition)
+async def detach_partition(
+    _: CurrentUser, sess: DBSessionDep, name: str, archive: bool = True
+):
+    """
+    Detach a past month of movements without locking the live table and
+    optionally move it to the archive schema
+    """
+
+    service = InventoryPartitionService(sess)
+    return await service.detach(name, archive=archive)
@@ -0,0 +1,225 @@
+import os
+from decimal import Decimal
+from datetime import datetime
+from typing import Iterable, Literal
+
+from pydantic import BaseModel, Field
+from sqlalchemy import TIMESTAMP, Integer, column, delete, func, insert, select, values
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from fastapi import status, HTTPException
+
+from app.models import Inventory, InventoryMovement, InventorySnapshot
+from app.utils.database_time import to_session_times
+from app.api.inventory.snapshot_service import (
+    block_snapshots,
+    detached_until,
+    ensure_movement_partitions,
+)
+
+# Rows per INSERT ... ON CONFLICT statement, 3 bind parameters each, well
+# below the 32767 parameters asyncpg accepts in one statement.
+POSTING_CHUNK_SIZE = int(os.getenv("INVENTORY_POSTING_CHUNK_SIZE") or 5000)
+
+MovementType = Literal["ENTRADA", "SALIDA"]
+BalanceKey = tuple[int, int]
+
+
+class MovementIn(BaseModel):
+    warehouse_id: int
+    product_id: int
+    movement_type: MovementType
+    quantity: Decimal = Field(gt=0, max_digits=10, decimal_places=2)
+    unit_measure_id: int
+    movement_date: datetime | None = None
+    source_document: str | None = Field(None, max_length=255)
+    notes: str | None = None
+
+
+class StockBalance(BaseModel):
+    warehouse_id: int
+    product_id: int
+    stock_quantity: Decimal
+    reserved_quantity: Decimal = Decimal(0)
+
+
+class PostingResult(BaseModel):
+    movements: int
+    balances: list[StockBalance]
+
+
+def signed_quantity(movement_type: str, quantity: Decimal) -> Decimal:
+    return quantity if movement_type == "ENTRADA" else -quantity
+
+
+def aggregate_deltas(movements: Iterable[MovementIn]) -> dict[BalanceKey, Decimal]:
+    """Net stock change per (warehouse_id, product_id), in lock order."""
+    deltas: dict[BalanceKey, Decimal] = {}
+    for movement in movements:
+        key = (movement.warehouse_id, movement.product_id)
+        deltas[key] = deltas.get(key, Decimal(0)) + signed_quantity(
+            movement.movement_type, movement.quantity
+        )
+
+    return dict(sorted(deltas.items()))
+
+
+class InventoryService:
+
+    def __init__(self, sess: AsyncSession):
+        self.sess = sess
+
+    async def apply_deltas(
+        self, deltas: dict[BalanceKey, Decimal], allow_negative: bool = False
+    ) -> list[StockBalance]:
+        """Add ``deltas`` to ``inventory.stock_quantity`` without reading it first.
+
+        Each chunk is one ``INSERT ... ON CONFLICT DO UPDATE`` that creates
+        missing balances and increments the others. Keys are applied in
+        ``(warehouse_id, product_id)`` order so concurrent postings lock the
+        inventory rows in the same order and cannot deadlock each other.
+        """
+        balances: list[StockBalance] = []
+        items = sorted(deltas.items())
+
+        for start in range(0, len(items), POSTING_CHUNK_SIZE):
+            stmt = pg_insert(Inventory).values(
+                [
+                    {
+                        "warehouse_id": warehouse_id,
+                        "product_id": product_id,
+                        "stock_quantity": delta,
+                    }
+                    for (warehouse_id, product_id), delta in items[
+                        start:start + POSTING_CHUNK_SIZE
+                    ]
+                ]
+            )
+            stmt = stmt.on_conflict_do_update(
+                index_elements=[Inventory.warehouse_id, Inventory.product_id],
+                set_={
+                    "stock_quantity": Inventory.stock_quantity
+                    + stmt.excluded.stock_quantity,
+                    "last_update": func.now(),
+                },
+            ).returning(
+                Inventory.warehouse_id,
+                Inventory.product_id,
+                Inventory.stock_quantity,
+                Inventory.reserved_quantity,
+            )
+
+            result = await self.sess.execute(stmt)
+            balances.extend(StockBalance.model_validate(row._mapping) for row in result)
+
+        if not allow_negative:
+            # Stock held by reservations cannot be taken by other outputs.
+            negative = [
+                balance
+                for balance in balances
+                if deltas[(balance.warehouse_id, balance.product_id)] < 0
+                and balance.stock_quantity < balance.reserved_quantity
+            ]
+            if negative:
+                raise HTTPException(
+                    status_code=status.HTTP_409_CONFLICT,
+                    detail={
+                        "message": "Insufficient stock",
+                        "balances": [
+                            balance.model_dump(mode="json") for balance in negative
+                        ],
+                    },
+                )
+
+        return balances
+
+    async def discard_snapshots(self, movements: Iterable[MovementIn]):
+        """Drop the snapshots that back-dated ``movements`` made stale."""
+        since: dict[BalanceKey, datetime] = {}
+        for movement in movements:
+            if movement.movement_date is None:
+                continue
+            key = (movement.warehouse_id, movement.product_id)
+            if key not in since or movement.movement_date < since[key]:
+                since[key] = movement.movement_date
+
+        if not since:
+            return
+
+        stale = values(
+            column("warehouse_id", Integer),
+            column("product_id", Integer),
+            column("since", TIMESTAMP),
+            name="stale",
+        ).data([(*key, date) for key, date in since.items()])
+
+        await self.sess.execute(
+            delete(InventorySnapshot).where(
+                InventorySnapshot.warehouse_id == stale.c.warehouse_id,
+                InventorySnapshot.product_id == stale.c.product_id,
+                InventorySnapshot.snapshot_at >= stale.c.since,
+                # Pinned snapshots end before any date that can still be posted.
+                InventorySnapshot.pinned.is_(False),
+            )
+        )
+
+    async def post_movements(
+        self, movements: list[MovementIn], allow_negative: bool = False
+    ) -> PostingResult:
+        """Record ``movements`` and update the stock balances in one transaction.
+
+        A SALIDA that would leave a balance below its reserved quantity rolls
+        back the whole batch unless ``allow_negative`` is set.
+        """
+        if not movements:
+            return PostingResult(movements=0, balances=[])
+
+        # Offset-aware dates are stored in the session time zone, the clock
+        # of the undated ones below.
+        for movement, date in zip(
+            movements, await to_session_times(self.sess, [m.movement_date for m in movements])
+        ):
+            movement.movement_date = date
+
+        # Partitions ahead of today always exist, dated movements may fall
+        # in a month that has none yet or that was detached.
+        dates = [m.movement_date for m in movements if m.movement_date is not None]
+        if dates:
+            await block_snapshots(self.sess)
+            until = await detached_until(self.sess)
+            if until is not None and min(dates) < until:
+                raise HTTPException(
+                    status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                    detail=f"Movements dated before {until} fall in detached months",
+                )
+            await ensure_movement_partitions(
+                min(dates).date(), max(dates).date(), sess=self.sess
+            )
+
+        try:
+            balances = await self.apply_deltas(
+                aggregate_deltas(movements), allow_negative
+            )
+
+            # executemany needs the same columns in every row, so undated
+            # movements take the transaction timestamp like the column default.
+            posted_at = await self.sess.scalar(select(func.localtimestamp()))
+            for start in range(0, len(movements), POSTING_CHUNK_SIZE):
+                await self.sess.execute(
+                    insert(InventoryMovement),
+                    [
+                        {
+                            **movement.model_dump(),
+                            "movement_date": movement.movement_date or posted_at,
+                        }
+                        for movement in movements[start:start + POSTING_CHUNK_SIZE]
+                    ],
+                )
+
+            await self.discard_snapshots(movements)
+            await self.sess.commit()
+        except Exception:
+            await self.sess.rollback()
+            raise
+
+        return PostingResult(movements=len(movements), balances=balances)
@@ -0,0 +1,403 @@
+import os
+import re
+import csv
+import json
+from tempfile import SpooledTemporaryFile
+from typing import Any, AsyncIterable, AsyncIterator, Literal
+
+from pydantic import BaseModel, ValidationError
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.concurrency import run_in_threadpool
+
+from app.utils.database_time import to_session_times
+from app.api.inventory.inventory_service import MovementIn
+from app.api.inventory.snapshot_service import (
+    block_snapshots,
+    ensure_movement_partitions,
+)
+
+BULK_INGEST_CHUNK_SIZE = int(os.getenv("BULK_INGEST_CHUNK_SIZE") or 5000)
+BULK_INGEST_MAX_REJECTS = int(os.getenv("BULK_INGEST_MAX_REJECTS") or 1000)
+# Bytes of a body kept in memory while it is received, the rest goes to disk.
+BULK_INGEST_SPOOL_SIZE = 8 * 1024 * 1024
+# Bytes read back from the spool at a time.
+BULK_INGEST_READ_SIZE = 64 * 1024
+
+# Bytes that are not UTF-8, kept by the surrogateescape error handler.
+UNDECODABLE = re.compile("[\udc80-\udcff]")
+
+IngestFormat = Literal["ndjson", "csv"]
+
+STAGING_TABLE = "inventory_movements_staging"
+STAGING_COLUMNS = (
+    "line",
+    "warehouse_id",
+    "product_id",
+    "movement_type",
+    "quantity",
+    "movement_date",
+    "source_document",
+    "notes",
+    "unit_measure_id",
+)
+
+CREATE_STAGING = text(f"""
+    CREATE TEMP TABLE IF NOT EXISTS {STAGING_TABLE} (
+        line INTEGER NOT NULL,
+        warehouse_id INTEGER NOT NULL,
+        product_id INTEGER NOT NULL,
+        movement_type VARCHAR(50) NOT NULL,
+        quantity DECIMAL(10, 2) NOT NULL,
+        movement_date TIMESTAMP,
+        source_document VARCHAR(255),
+        notes TEXT,
+        unit_measure_id INTEGER NOT NULL
+    ) ON COMMIT DROP
+""")
+
+REJECT_UNKNOWN_REFERENCES = text(f"""
+    DELETE FROM {STAGING_TABLE} s
+    WHERE NOT EXISTS (SELECT 1 FROM warehouses w WHERE w.id = s.warehouse_id)
+       OR NOT EXISTS (SELECT 1 FROM products p WHERE p.id = s.product_id)
+       OR NOT EXISTS (SELECT 1 FROM unit_measure u WHERE u.id = s.unit_measure_id)
+    RETURNING s.line, CASE
+        WHEN NOT EXISTS (SELECT 1 FROM warehouses w WHERE w.id = s.warehouse_id)
+            THEN 'Unknown warehouse_id'
+        WHEN NOT EXISTS (SELECT 1 FROM products p WHERE p.id = s.product_id)
+            THEN 'Unknown product_id'
+        ELSE 'Unknown unit_measure_id'
+    END AS error
+""")
+
+REJECT_DETACHED = text(f"""
+    DELETE FROM {STAGING_TABLE} s
+    USING (SELECT max(period_end) AS until FROM inventory_detached_partitions) d
+    WHERE s.movement_date < d.until
+    RETURNING s.line, 'Movement date in a detached month' AS error
+""")
+
+# Rows of a month that still has no partition attached after creating the
+# missing ones, e.g. a month detached by hand.
+REJECT_UNPARTITIONED = text(f"""
+    DELETE FROM {STAGING_TABLE} s
+    WHERE s.movement_date IS NOT NULL
+      AND NOT EXISTS (
+        SELECT 1
+        FROM pg_inherits i
+        JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = 'inventory_movements'::regclass
+          AND c.relname = format(
+              'inventory_movements_y%sm%s',
+              to_char(s.movement_date, 'YYYY'), to_char(s.movement_date, 'MM')
+          )
+      )
+    RETURNING s.line, 'No partition for the movement date' AS error
+""")
+
+STAGED_PERIOD = text(f"SELECT min(movement_date), max(movement_date) FROM {STAGING_TABLE}")
+
+# Lock the affected balances in (warehouse_id, product_id) order, the same
+# order used by the posting service, before checking them.
+LOCK_BALANCES = text(f"""
+    SELECT 1
+    FROM inventory i
+    JOIN (SELECT DISTINCT warehouse_id, product_id FROM {STAGING_TABLE}) k
+      ON k.warehouse_id = i.warehouse_id AND k.product_id = i.product_id
+    ORDER BY i.warehouse_id, i.product_id
+    FOR UPDATE OF i
+""")
+
+REJECT_INSUFFICIENT_STOCK = text(f"""
+    WITH delta AS (
+        SELECT warehouse_id, product_id,
+               SUM(CASE WHEN movement_type = 'ENTRADA' THEN quantity ELSE -quantity END) AS delta
+        FROM {STAGING_TABLE}
+        GROUP BY warehouse_id, product_id
+    ), short AS (
+        SELECT d.warehouse_id, d.product_id
+        FROM delta d
+        LEFT JOIN inventory i
+          ON i.warehouse_id = d.warehouse_id AND i.product_id = d.product_id
+        WHERE d.delta < 0
+          AND COALESCE(i.stock_quantity - i.reserved_quantity, 0) + d.delta < 0
+    )
+    DELETE FROM {STAGING_TABLE} s
+    USING short
+    WHERE s.warehouse_id = short.warehouse_id AND s.product_id = short.product_id
+    RETURNING s.line, 'Insufficient stock' AS error
+""")
+
+MERGE_STAGING = text(f"""
+    WITH moved AS (
+        INSERT INTO inventory_movements (
+            warehouse_id, product_id, movement_type, quantity, movement_date,
+            source_document, notes, unit_measure_id
+        )
+        SELECT warehouse_id, product_id, movement_type, quantity,
+               COALESCE(movement_date, LOCALTIMESTAMP), source_document, notes,
+               unit_measure_id
+        FROM {STAGING_TABLE}
+        ORDER BY line
+        RETURNING 1
+    ), applied AS (
+        INSERT INTO inventory (warehouse_id, product_id, stock_quantity)
+        SELECT warehouse_id, product_id,
+               SUM(CASE WHEN movement_type = 'ENTRADA' THEN quantity ELSE -quantity END)
+        FROM {STAGING_TABLE}
+        GROUP BY warehouse_id, product_id
+        ORDER BY warehouse_id, product_id
+        ON CONFLICT (warehouse_id, product_id) DO UPDATE
+        SET stock_quantity = inventory.stock_quantity + EXCLUDED.stock_quantity,
+            last_update = now()
+        RETURNING 1
+    ), stale AS (
+        -- Back-dated movements invalidate the snapshots taken after them.
+        DELETE FROM inventory_snapshots s
+        USING (
+            SELECT warehouse_id, product_id, MIN(movement_date) AS since
+            FROM {STAGING_TABLE}
+            WHERE movement_date IS NOT NULL
+            GROUP BY warehouse_id, product_id
+        ) d
+        WHERE s.warehouse_id = d.warehouse_id
+          AND s.product_id = d.product_id
+          AND s.snapshot_at >= d.since
+          AND NOT s.pinned
+        RETURNING 1
+    )
+    SELECT (SELECT count(*) FROM moved) AS inserted,
+           (SELECT count(*) FROM applied) AS balances
+""")
+
+
+class RejectedRow(BaseModel):
+    line: int
+    errors: list[Any]
+
+
+class IngestResult(BaseModel):
+    received: int
+    inserted: int
+    balances_updated: int
+    rejected_count: int
+    rejected: list[RejectedRow]
+
+
+async def spool_body(chunks: AsyncIterable[bytes]) -> SpooledTemporaryFile:
+    """Copy of a streamed body, spilled to disk when large."""
+    spool = SpooledTemporaryFile(max_size=BULK_INGEST_SPOOL_SIZE)
+    try:
+        async for chunk in chunks:
+            await run_in_threadpool(spool.write, chunk)
+    except BaseException:
+        spool.close()
+        raise
+    spool.seek(0)
+    return spool
+
+
+async def iter_spool(spool: SpooledTemporaryFile) -> AsyncIterator[bytes]:
+    while chunk := await run_in_threadpool(spool.read, BULK_INGEST_READ_SIZE):
+        yield chunk
+
+
+async def iter_lines(chunks: AsyncIterable[bytes]) -> AsyncIterator[str]:
+    """Split a streamed body into decoded lines without buffering it whole.
+
+    Bytes that are not UTF-8 are kept as lone surrogates so the line they
+    are in can be rejected on its own.
+    """
+    pending = b""
+    async for chunk in chunks:
+        pending += chunk
+        *lines, pending = pending.split(b"\n")
+        for line in lines:
+            yield line.rstrip(b"\r").decode(errors="surrogateescape")
+
+    if pending:
+        yield pending.rstrip(b"\r").decode(errors="surrogateescape")
+
+
+async def iter_ndjson(lines: AsyncIterator[str]) -> AsyncIterator[tuple[int, Any]]:
+    number = 0
+    async for line in lines:
+        number += 1
+        if not line.strip():
+            continue
+        if UNDECODABLE.search(line):
+            yield number, ValueError("Line is not valid UTF-8")
+            continue
+        try:
+            yield number, json.loads(line)
+        except ValueError as ex:
+            yield number, ex
+
+
+async def iter_csv(lines: AsyncIterator[str]) -> AsyncIterator[tuple[int, Any]]:
+    """Rows of a CSV with a header line, empty cells are read as null."""
+    header: list[str] | None = None
+    number = 0
+    record, start = "", 0
+
+    async for line in lines:
+        number += 1
+        if not record:
+            start = number
+        record += line
+        # A quoted field may contain line breaks: keep reading until the
+        # quotes of the record are balanced.
+        if record.count('"') % 2:
+            record += "\n"
+            continue
+
+        if header is not None and UNDECODABLE.search(record):
+            yield start, ValueError("Line is not valid UTF-8")
+            record = ""
+            continue
+
+        values = next(csv.reader([record]), [])
+        record = ""
+
+        if header is None:
+            header = [name.strip() for name in values]
+            continue
+        if not any(values):
+            continue
+        if len(values) != len(header):
+            yield start, ValueError(
+                f"Expected {len(header)} columns, got {len(values)}"
+            )
+            continue
+
+        yield start, {
+            name: value if value != "" else None for name, value in zip(header, values)
+        }
+
+    if record:
+        yield start, ValueError("Unterminated quoted field")
+
+
+class MovementIngestService:
+    """Bulk load of inventory movements through a COPY into a staging table.
+
+    Rows are validated as they are read and copied in chunks of
+    ``BULK_INGEST_CHUNK_SIZE`` into a temporary table. Rows with unknown
+    references, dated in a month without partition, or whose balance would
+    go below zero, are then rejected with set-based deletes and the rest is
+    merged into ``inventory_movements`` and ``inventory`` by a single
+    statement, all in one transaction. Bodies are read from a
+    ``spool_body`` copy so the transaction does not wait on the client.
+    """
+
+    def __init__(self, sess: AsyncSession):
+        self.sess = sess
+        self.received = 0
+        self.rejected_count = 0
+        self.rejected: list[RejectedRow] = []
+
+    def _reject(self, line: int, errors: list[Any]):
+        self.rejected_count += 1
+        if len(self.rejected) < BULK_INGEST_MAX_REJECTS:
+            self.rejected.append(RejectedRow(line=line, errors=errors))
+
+    def _validate(self, line: int, row: Any) -> tuple | None:
+        if isinstance(row, Exception):
+            self._reject(line, [str(row)])
+            return None
+
+        try:
+            movement = MovementIn.model_validate(row)
+        except ValidationError as ex:
+            self._reject(
+                line,
+                ex.errors(include_url=False, include_context=False, include_input=False),
+            )
+            return None
+
+        return (
+            line,
+            movement.warehouse_id,
+            movement.product_id,
+            movement.movement_type,
+            movement.quantity,
+            movement.movement_date,
+            movement.source_document,
+            movement.notes,
+            movement.unit_measure_id,
+        )
+
+    async def _copy(self, records: list[tuple]):
+        # COPY only takes naive dates for the TIMESTAMP column.
+        dates = await to_session_times(self.sess, [record[5] for record in records])
+        records = [(*record[:5], date, *record[6:]) for record, date in zip(records, dates)]
+
+        connection = await self.sess.connection()
+        raw = await connection.get_raw_connection()
+        await raw.driver_connection.copy_records_to_table(
+            STAGING_TABLE, records=records, columns=STAGING_COLUMNS
+        )
+
+    async def ingest(
+        self,
+        chunks: AsyncIterable[bytes],
+        fmt: IngestFormat = "ndjson",
+        allow_negative: bool = False,
+    ) -> IngestResult:
+        rows = iter_csv(iter_lines(chunks)) if fmt == "csv" else iter_ndjson(
+            iter_lines(chunks)
+        )
+
+        try:
+            # Runs through SQLAlchemy first so COPY happens inside its transaction.
+            await self.sess.execute(CREATE_STAGING)
+
+            records: list[tuple] = []
+            async for line, row in rows:
+                self.received += 1
+                record = self._validate(line, row)
+                if record is not None:
+                    records.append(record)
+                if len(records) >= BULK_INGEST_CHUNK_SIZE:
+                    await self._copy(records)
+                    records = []
+            if records:
+                await self._copy(records)
+
+            await self._reject_staged(REJECT_UNKNOWN_REFERENCES)
+            # Staged rows may be dated before a snapshot being taken.
+            await block_snapshots(self.sess)
+            await self._reject_staged(REJECT_DETACHED)
+
+            # Dated rows may fall in a month without a partition yet.
+            first_date, last_date = (await self.sess.execute(STAGED_PERIOD)).one()
+            if first_date is not None:
+                await ensure_movement_partitions(
+                    first_date.date(), last_date.date(), sess=self.sess
+                )
+                await self._reject_staged(REJECT_UNPARTITIONED)
+
+            if not allow_negative:
+                await self.sess.execute(LOCK_BALANCES)
+                await self._reject_staged(REJECT_INSUFFICIENT_STOCK)
+
+            merged = (await self.sess.execute(MERGE_STAGING)).one()
+            await self.sess.commit()
+        except Exception:
+            await self.sess.rollback()
+            raise
+
+        self.rejected.sort(key=lambda row: row.line)
+
+        return IngestResult(
+            received=self.received,
+            inserted=merged.inserted,
+            balances_updated=merged.balances,
+            rejected_count=self.rejected_count,
+            rejected=self.rejected,
+        )
+
+    async def _reject_staged(self, statement):
+        result = await self.sess.execute(statement)
+        for line, error in result:
+            self._reject(line, [error])
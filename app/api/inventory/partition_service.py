@@ -0,0 +1,139 @@
+import os
+import re
+from datetime import date, datetime, timedelta
+
+from pydantic import BaseModel
+from sqlalchemy import func, select, text
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from fastapi import status, HTTPException
+
+from app.core import connection_manager
+from app.models import InventoryDetachedPartition
+from app.api.inventory.snapshot_service import (
+    INVENTORY_PARTITIONS_AHEAD,
+    InventorySnapshotService,
+    ensure_movement_partitions,
+)
+
+INVENTORY_ARCHIVE_SCHEMA = os.getenv("INVENTORY_ARCHIVE_SCHEMA") or "archive"
+
+_BOUND = re.compile(r"FROM \('([^']+)'\) TO \('([^']+)'\)")
+
+
+class MovementPartition(BaseModel):
+    name: str
+    start: datetime
+    end: datetime
+    estimated_rows: int
+
+
+class InventoryPartitionService:
+    """Monthly partitions of ``inventory_movements``.
+
+    Partitions are created by ``ensure_inventory_movement_partitions`` in
+    ``sql/database.sql`` and attached without blocking the live table. Old
+    months are detached with ``DETACH PARTITION ... CONCURRENTLY`` and moved
+    to ``INVENTORY_ARCHIVE_SCHEMA``.
+    """
+
+    def __init__(self, sess: AsyncSession):
+        self.sess = sess
+
+    async def ensure_partitions(self, start: date, end: date) -> int:
+        """Create the missing monthly partitions between ``start`` and ``end``."""
+        return await ensure_movement_partitions(start, end)
+
+    async def ensure_upcoming(self, months: int = INVENTORY_PARTITIONS_AHEAD) -> int:
+        return await ensure_movement_partitions(months=months)
+
+    async def list_partitions(self) -> list[MovementPartition]:
+        result = await self.sess.execute(
+            text("""
+                SELECT c.relname AS name,
+                       pg_get_expr(c.relpartbound, c.oid) AS bound,
+                       GREATEST(c.reltuples, 0)::bigint AS estimated_rows
+                FROM pg_inherits i
+                JOIN pg_class c ON c.oid = i.inhrelid
+                WHERE i.inhparent = 'inventory_movements'::regclass
+                ORDER BY c.relname
+            """)
+        )
+
+        partitions = []
+        for name, bound, estimated_rows in result:
+            match = _BOUND.search(bound)
+            if match is None:
+                continue
+            partitions.append(
+                MovementPartition(
+                    name=name,
+                    start=datetime.fromisoformat(match.group(1)),
+                    end=datetime.fromisoformat(match.group(2)),
+                    estimated_rows=estimated_rows,
+                )
+            )
+
+        return partitions
+
+    async def detach(self, name: str, archive: bool = True) -> MovementPartition:
+        """Detach a past month without blocking writes to the live months.
+
+        A pinned snapshot of the movements up to the end of the month is
+        taken first so as-of balances after it no longer need them. The month
+        is recorded in ``inventory_detached_partitions`` in the same
+        transaction: it is never created again and movements dated before
+        its end are refused from then on. Detaching fails while
+        ``inventory_shrinkage`` rows still reference movements of the month.
+        """
+        partition = next(
+            (item for item in await self.list_partitions() if item.name == name),
+            None,
+        )
+        if partition is None:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND, detail="Partition not found"
+            )
+
+        today = await self.sess.scalar(select(func.localtimestamp()))
+        if partition.end > today:
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail="Only partitions of past months can be detached",
+            )
+
+        try:
+            await self.sess.execute(
+                pg_insert(InventoryDetachedPartition)
+                .values(name=name, period_start=partition.start, period_end=partition.end)
+                .on_conflict_do_nothing()
+            )
+            # Movements at the end itself belong to the next month, still attached.
+            await InventorySnapshotService(self.sess).take_snapshot(
+                taken_at=partition.end - timedelta(microseconds=1), pinned=True
+            )
+            await self.sess.commit()
+        except Exception:
+            await self.sess.rollback()
+            raise
+
+        # DETACH ... CONCURRENTLY cannot run inside a transaction block.
+        engine = connection_manager.get_engine()
+        async with engine.connect() as connection:
+            connection = await connection.execution_options(
+                isolation_level="AUTOCOMMIT"
+            )
+            await connection.execute(
+                text(
+                    f'ALTER TABLE inventory_movements DETACH PARTITION "{name}" CONCURRENTLY'
+                )
+            )
+            if archive:
+                await connection.execute(
+                    text(f'CREATE SCHEMA IF NOT EXISTS "{INVENTORY_ARCHIVE_SCHEMA}"')
+                )
+                await connection.execute(
+                    text(f'ALTER TABLE "{name}" SET SCHEMA "{INVENTORY_ARCHIVE_SCHEMA}"')
+                )
+
+        return partition
@@ -0,0 +1,175 @@
+"""Latency of as-of stock queries as the movement history grows.
+
+Run with ``python -m app.api.inventory.snapshot_benchmark [rows ...]`` against
+the configured database. Everything happens in a scratch schema that is
+dropped at the end: for each size the movement table is grown to that many
+rows (one movement every 30 seconds spread over 1000 warehouse/product keys),
+monthly snapshots are taken and random as-of queries on the latest month are
+timed with snapshots and by summing the whole history.
+"""
+import sys
+import time
+import random
+import asyncio
+import statistics
+from datetime import datetime, timedelta
+
+from sqlalchemy import func, select, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core import connection_manager
+from app.models import InventoryMovement
+from app.api.inventory.snapshot_service import InventorySnapshotService, signed_quantity
+
+SCHEMA = "inventory_benchmark"
+SIZES = (100_000, 1_000_000, 10_000_000)
+WAREHOUSES = 4
+PRODUCTS = 250
+QUERIES = 200
+START = datetime(2000, 1, 1)
+STEP = timedelta(seconds=30)
+INSERT_BATCH = 1_000_000
+
+
+def _month_starts(since: datetime, until: datetime):
+    month = datetime(since.year, since.month, 1)
+    while month <= until:
+        if month > since:
+            yield month
+        month = datetime(month.year + month.month // 12, month.month % 12 + 1, 1)
+
+
+async def _setup(sess: AsyncSession):
+    await sess.execute(text(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE"))
+    await sess.execute(text(f"CREATE SCHEMA {SCHEMA}"))
+    for table in ("inventory", "inventory_movements", "inventory_snapshots"):
+        await sess.execute(
+            text(f"CREATE TABLE {SCHEMA}.{table} (LIKE public.{table} INCLUDING ALL)")
+        )
+    # LIKE copies the id defaults, which would draw from the public sequences.
+    for table in ("inventory", "inventory_movements"):
+        await sess.execute(text(f"CREATE SEQUENCE {SCHEMA}.{table}_id_seq"))
+        await sess.execute(
+            text(
+                f"ALTER TABLE {SCHEMA}.{table} ALTER COLUMN id "
+                f"SET DEFAULT nextval('{SCHEMA}.{table}_id_seq')"
+            )
+        )
+    await sess.execute(text(f"SET search_path TO {SCHEMA}, public"))
+    await sess.execute(
+        text("""
+            INSERT INTO inventory (warehouse_id, product_id)
+            SELECT w, p FROM generate_series(1, :w) w, generate_series(1, :p) p
+        """),
+        {"w": WAREHOUSES, "p": PRODUCTS},
+    )
+    await sess.commit()
+
+
+async def _grow(sess: AsyncSession, rows: int, size: int):
+    for low in range(rows, size, INSERT_BATCH):
+        await sess.execute(
+            text("""
+                INSERT INTO inventory_movements (
+                    warehouse_id, product_id, movement_type, quantity,
+                    movement_date, unit_measure_id
+                )
+                SELECT 1 + i % :w, 1 + (i / :w) % :p,
+                       CASE WHEN i % 3 = 0 THEN 'SALIDA' ELSE 'ENTRADA' END,
+                       1 + i % 7, CAST(:start AS timestamp) + i * CAST(:step AS interval), 1
+                FROM generate_series(:low, :high - 1) i
+            """),
+            {
+                "w": WAREHOUSES,
+                "p": PRODUCTS,
+                "start": START,
+                "step": STEP,
+                "low": low,
+                "high": min(low + INSERT_BATCH, size),
+            },
+        )
+        await sess.commit()
+    await sess.execute(text("ANALYZE inventory_movements"))
+
+
+async def _timed(sess: AsyncSession, queries) -> dict[str, float]:
+    latencies = []
+    for query in queries:
+        started = time.perf_counter()
+        await query(sess)
+        latencies.append((time.perf_counter() - started) * 1000)
+    latencies.sort()
+
+    return {
+        "p50_ms": round(statistics.median(latencies), 3),
+        "p95_ms": round(latencies[int(len(latencies) * 0.95) - 1], 3),
+    }
+
+
+async def run(sizes=SIZES, seed: int = 0):
+    rng = random.Random(seed)
+    engine = connection_manager.get_engine()
+
+    async with engine.connect() as connection:
+        sess = AsyncSession(bind=connection)
+        await _setup(sess)
+
+        try:
+            rows, snapshot_at = 0, START
+            for size in sizes:
+                await _grow(sess, rows, size)
+                rows = size
+                last = START + STEP * (rows - 1)
+
+                service = InventorySnapshotService(sess)
+                for month in _month_starts(snapshot_at, last):
+                    await service.take_snapshot(taken_at=month)
+                    snapshot_at = month
+                await sess.commit()
+                await sess.execute(text("ANALYZE inventory_snapshots"))
+
+                samples = [
+                    (
+                        rng.randint(1, WAREHOUSES),
+                        rng.randint(1, PRODUCTS),
+                        last - timedelta(seconds=rng.uniform(0, 30 * 24 * 3600)),
+                    )
+                    for _ in range(QUERIES)
+                ]
+
+                with_snapshots = await _timed(
+                    sess,
+                    [
+                        lambda s, w=w, p=p, d=d: InventorySnapshotService(s).as_of(d, w, p)
+                        for w, p, d in samples
+                    ],
+                )
+                full_history = await _timed(
+                    sess,
+                    [
+                        lambda s, w=w, p=p, d=d: s.scalar(
+                            select(func.sum(signed_quantity)).where(
+                                InventoryMovement.warehouse_id == w,
+                                InventoryMovement.product_id == p,
+                                InventoryMovement.movement_date <= d,
+                            )
+                        )
+                        for w, p, d in samples
+                    ],
+                )
+
+                print(
+                    f"{rows:>12,} rows  snapshots: {with_snapshots}  "
+                    f"full history: {full_history}"
+                )
+        finally:
+            await sess.rollback()
+            await sess.execute(text(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE"))
+            await sess.commit()
+            await sess.close()
+
+    await connection_manager.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(run([int(size) for size in sys.argv[1:]] or SIZES))
@@ -0,0 +1,401 @@
+import os
+import time
+import asyncio
+from decimal import Decimal
+from datetime import date, datetime, timedelta
+from typing import Literal
+
+from pydantic import BaseModel
+from sqlalchemy import (
+    Select,
+    and_,
+    case,
+    delete,
+    func,
+    insert,
+    literal,
+    literal_column,
+    select,
+    text,
+    true,
+)
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.logger import logger
+from app.core import connection_manager
+from app.utils.database_time import to_session_time
+from app.models import (
+    Inventory,
+    InventoryDetachedPartition,
+    InventoryMovement,
+    InventorySnapshot,
+)
+
+# Seconds between snapshot runs, 0 disables the background job.
+INVENTORY_SNAPSHOT_INTERVAL = float(os.getenv("INVENTORY_SNAPSHOT_INTERVAL") or 3600)
+# Movements are dated with their transaction start: a snapshot is never taken
+# closer to now than this, nor after the start of any open transaction.
+INVENTORY_SNAPSHOT_LAG = float(os.getenv("INVENTORY_SNAPSHOT_LAG") or 60)
+# Snapshots younger than this are all kept, older ones are thinned out to
+# the last one of each INVENTORY_SNAPSHOT_COMPACT_TO period.
+INVENTORY_SNAPSHOT_RETAIN_DAYS = int(os.getenv("INVENTORY_SNAPSHOT_RETAIN_DAYS") or 31)
+INVENTORY_SNAPSHOT_COMPACT_TO = os.getenv("INVENTORY_SNAPSHOT_COMPACT_TO") or "month"
+# Months of inventory_movements partitions kept created ahead of today.
+INVENTORY_PARTITIONS_AHEAD = int(os.getenv("INVENTORY_PARTITIONS_AHEAD") or 3)
+
+CompactPeriod = Literal["day", "week", "month", "year"]
+
+# Only one worker of the deployment takes snapshots at a time.
+SNAPSHOT_LOCK_ID = 7_310_001
+# Taken by snapshots and held shared by postings of dated movements: either
+# the snapshot sees a back-dated movement or its posting sees the snapshot
+# and deletes it.
+SNAPSHOT_WRITE_LOCK_ID = 7_310_004
+
+ENSURE_UPCOMING_PARTITIONS = text("""
+    SELECT ensure_inventory_movement_partitions(
+        CURRENT_DATE, (CURRENT_DATE + make_interval(months => :months))::date
+    )
+""")
+
+MISSING_PARTITIONS = text("""
+    SELECT count(*)
+    FROM generate_series(
+        date_trunc('month', CAST(:start AS date)), CAST(:end AS date), interval '1 month'
+    ) AS m
+    WHERE to_regclass(
+        format('inventory_movements_y%sm%s', to_char(m, 'YYYY'), to_char(m, 'MM'))
+    ) IS NULL
+""")
+
+# Two sessions creating the same partition at once: the loser fails with
+# duplicate_table, or unique_violation on the catalog.
+CONCURRENT_DDL_STATES = ("42P07", "23505")
+
+signed_quantity = case(
+    (InventoryMovement.movement_type == "ENTRADA", InventoryMovement.quantity),
+    else_=-InventoryMovement.quantity,
+)
+
+
+async def ensure_movement_partitions(
+    start: date | None = None,
+    end: date | None = None,
+    months: int = INVENTORY_PARTITIONS_AHEAD,
+    sess: AsyncSession | None = None,
+) -> int:
+    """Create the missing monthly partitions in a short transaction of its own.
+
+    Between ``start`` and ``end``, or from today to ``months`` ahead. Never
+    run inside a posting transaction: attaching a partition locks
+    ``inventory_movements`` until commit. When another worker creates the
+    same month at once the call is retried and finds it. With ``sess`` the
+    range is checked there first, so no other connection is taken when
+    every month already has its partition.
+    """
+    if start is not None and sess is not None:
+        missing = await sess.scalar(MISSING_PARTITIONS, {"start": start, "end": end or start})
+        if not missing:
+            return 0
+
+    if start is None:
+        statement = ENSURE_UPCOMING_PARTITIONS.bindparams(months=months)
+    else:
+        statement = select(func.ensure_inventory_movement_partitions(start, end or start))
+
+    engine = connection_manager.get_engine()
+    for retry in (True, False):
+        try:
+            async with engine.begin() as connection:
+                return await connection.scalar(statement)
+        except DBAPIError as ex:
+            if not retry or getattr(ex.orig, "sqlstate", None) not in CONCURRENT_DDL_STATES:
+                raise
+
+    return 0
+
+
+async def block_snapshots(sess: AsyncSession):
+    """Keep snapshots from being taken until the transaction of ``sess`` ends.
+
+    Called before posting movements dated by the client, which may be older
+    than a snapshot being taken at the same time.
+    """
+    await sess.execute(select(func.pg_advisory_xact_lock_shared(SNAPSHOT_WRITE_LOCK_ID)))
+
+
+async def detached_until(sess: AsyncSession) -> datetime | None:
+    """End of the last month detached from ``inventory_movements``.
+
+    Pinned snapshots hold the balances up to it, movements dated before it
+    can no longer be posted.
+    """
+    return await sess.scalar(select(func.max(InventoryDetachedPartition.period_end)))
+
+
+class AsOfBalance(BaseModel):
+    warehouse_id: int
+    product_id: int
+    stock_quantity: Decimal
+    snapshot_at: datetime | None = None
+
+
+class SnapshotRun(BaseModel):
+    taken: bool
+    snapshot_at: datetime | None = None
+    snapshots: int = 0
+    compacted: int = 0
+
+
+def as_of_select(
+    as_of,
+    warehouse_id: int | None = None,
+    product_id: int | None = None,
+) -> Select:
+    """Balances at ``as_of`` from the nearest snapshot plus the movements after it.
+
+    For every (warehouse, product) of ``inventory`` the latest snapshot at or
+    before ``as_of`` is found through the primary key and only the movements
+    between it and ``as_of`` are summed, so the cost does not grow with the
+    history. The ``delta`` column is NULL when no movement was replayed.
+    """
+    keys = select(Inventory.warehouse_id, Inventory.product_id)
+    if warehouse_id is not None:
+        keys = keys.where(Inventory.warehouse_id == warehouse_id)
+    if product_id is not None:
+        keys = keys.where(Inventory.product_id == product_id)
+    keys = keys.subquery("k")
+
+    snapshot = (
+        select(InventorySnapshot.snapshot_at, InventorySnapshot.stock_quantity)
+        .where(
+            InventorySnapshot.warehouse_id == keys.c.warehouse_id,
+            InventorySnapshot.product_id == keys.c.product_id,
+            InventorySnapshot.snapshot_at <= as_of,
+        )
+        .order_by(InventorySnapshot.snapshot_at.desc())
+        .limit(1)
+        .lateral("s")
+    )
+
+    replay = (
+        select(func.sum(signed_quantity).label("delta"))
+        .where(
+            InventoryMovement.warehouse_id == keys.c.warehouse_id,
+            InventoryMovement.product_id == keys.c.product_id,
+            InventoryMovement.in_period(
+                func.coalesce(
+                    snapshot.c.snapshot_at, literal_column("'-infinity'::timestamp")
+                ),
+                as_of,
+                closed="right",
+            ),
+        )
+        .lateral("m")
+    )
+
+    return (
+        select(
+            keys.c.warehouse_id,
+            keys.c.product_id,
+            (
+                func.coalesce(snapshot.c.stock_quantity, 0)
+                + func.coalesce(replay.c.delta, 0)
+            ).label("stock_quantity"),
+            snapshot.c.snapshot_at,
+            replay.c.delta,
+        )
+        .select_from(keys)
+        .outerjoin(snapshot, true())
+        .outerjoin(replay, true())
+    )
+
+
+class InventorySnapshotService:
+
+    def __init__(self, sess: AsyncSession):
+        self.sess = sess
+
+    async def as_of(
+        self,
+        as_of: datetime,
+        warehouse_id: int | None = None,
+        product_id: int | None = None,
+    ) -> list[AsOfBalance]:
+        as_of = await to_session_time(self.sess, as_of)
+        stmt = as_of_select(as_of, warehouse_id, product_id).order_by(
+            "warehouse_id", "product_id"
+        )
+        result = await self.sess.execute(stmt)
+
+        return [AsOfBalance.model_validate(row._mapping) for row in result]
+
+    async def _snapshot_time(self) -> datetime:
+        # A transaction still open may commit movements dated at its start.
+        oldest = await self.sess.scalar(
+            text("""
+                SELECT min(xact_start)::timestamp
+                FROM pg_stat_activity
+                WHERE datname = current_database()
+                  AND pid <> pg_backend_pid()
+                  AND xact_start IS NOT NULL
+            """)
+        )
+        now = await self.sess.scalar(select(func.localtimestamp()))
+        taken_at = now - timedelta(seconds=INVENTORY_SNAPSHOT_LAG)
+
+        # Undated movements of that transaction are dated at its start.
+        if oldest is not None:
+            return min(taken_at, oldest - timedelta(microseconds=1))
+        return taken_at
+
+    async def take_snapshot(
+        self, taken_at: datetime | None = None, pinned: bool = False
+    ) -> tuple[datetime, int]:
+        """Snapshot every balance that changed since its previous snapshot.
+
+        ``taken_at`` backfills a snapshot at a past date, it must not be
+        later than any movement still to be committed. ``pinned`` snapshots
+        are never compacted. Waits for the postings of dated movements in
+        progress, and holds back new ones until the transaction ends.
+        """
+        await self.sess.execute(select(func.pg_advisory_xact_lock(SNAPSHOT_WRITE_LOCK_ID)))
+        taken_at = taken_at or await self._snapshot_time()
+        balances = as_of_select(taken_at).subquery("b")
+
+        result = await self.sess.execute(
+            insert(InventorySnapshot)
+            .from_select(
+                ["warehouse_id", "product_id", "snapshot_at", "stock_quantity", "pinned"],
+                select(
+                    balances.c.warehouse_id,
+                    balances.c.product_id,
+                    literal(taken_at, InventorySnapshot.snapshot_at.type),
+                    balances.c.stock_quantity,
+                    literal(pinned),
+                ).where(balances.c.delta.is_not(None)),
+            )
+            .returning(InventorySnapshot.product_id)
+        )
+
+        return taken_at, len(result.all())
+
+    async def compact(
+        self,
+        retain_days: int = INVENTORY_SNAPSHOT_RETAIN_DAYS,
+        period: CompactPeriod = INVENTORY_SNAPSHOT_COMPACT_TO,
+    ) -> int:
+        """Keep only the last snapshot per key and ``period`` past ``retain_days``.
+
+        Pinned snapshots stay, they replace the movements of detached months.
+        """
+        cutoff = func.localtimestamp() - timedelta(days=retain_days)
+
+        ranked = (
+            select(
+                InventorySnapshot.warehouse_id,
+                InventorySnapshot.product_id,
+                InventorySnapshot.snapshot_at,
+                func.row_number()
+                .over(
+                    partition_by=(
+                        InventorySnapshot.warehouse_id,
+                        InventorySnapshot.product_id,
+                        func.date_trunc(period, InventorySnapshot.snapshot_at),
+                    ),
+                    order_by=InventorySnapshot.snapshot_at.desc(),
+                )
+                .label("rank"),
+            )
+            .where(InventorySnapshot.snapshot_at < cutoff, InventorySnapshot.pinned.is_(False))
+            .subquery("old")
+        )
+
+        result = await self.sess.execute(
+            delete(InventorySnapshot).where(
+                and_(
+                    InventorySnapshot.warehouse_id == ranked.c.warehouse_id,
+                    InventorySnapshot.product_id == ranked.c.product_id,
+                    InventorySnapshot.snapshot_at == ranked.c.snapshot_at,
+                    ranked.c.rank > 1,
+                )
+            )
+        )
+
+        return result.rowcount
+
+    async def run(self) -> SnapshotRun:
+        """Create upcoming movement partitions, take a snapshot and compact
+        old ones, unless another worker is already doing it."""
+        try:
+            locked = await self.sess.scalar(
+                select(func.pg_try_advisory_xact_lock(SNAPSHOT_LOCK_ID))
+            )
+            if not locked:
+                await self.sess.rollback()
+                return SnapshotRun(taken=False)
+
+            await ensure_movement_partitions()
+            taken_at, snapshots = await self.take_snapshot()
+            compacted = await self.compact()
+            await self.sess.commit()
+        except Exception:
+            await self.sess.rollback()
+            raise
+
+        return SnapshotRun(
+            taken=True, snapshot_at=taken_at, snapshots=snapshots, compacted=compacted
+        )
+
+
+class InventorySnapshotter:
+    """Background job taking inventory snapshots every ``interval`` seconds."""
+
+    def __init__(self, interval: float = INVENTORY_SNAPSHOT_INTERVAL):
+        self.interval = interval
+        self._task: asyncio.Task | None = None
+        self.last_run: SnapshotRun | None = None
+        self.last_duration = 0.0
+
+    async def run_once(self) -> SnapshotRun:
+        started = time.perf_counter()
+        async with connection_manager.get_context_session() as sess:
+            run = await InventorySnapshotService(sess).run()
+
+        if run.taken:
+            self.last_run = run
+            self.last_duration = time.perf_counter() - started
+
+        return run
+
+    async def _run_periodically(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.run_once()
+            except Exception as ex:  # pylint: disable=broad-exception-caught
+                logger.error(ex)
+
+    async def start(self):
+        if self.interval > 0:
+            self._task = asyncio.create_task(self._run_periodically())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def stats(self) -> dict:
+        return {
+            "interval": self.interval,
+            "last_run": self.last_run.model_dump(mode="json") if self.last_run else None,
+            "last_duration_ms": round(self.last_duration * 1000, 3),
+        }
+
+
+inventory_snapshotter = InventorySnapshotter()
@@ -0,0 +1,10 @@
+from fastapi import APIRouter
+from .monitoring_router import metrics_router
+
+
+monitoring_router = APIRouter()
+monitoring_router.include_router(metrics_router)
+
+__all__ = [
+    "monitoring_router",
+]
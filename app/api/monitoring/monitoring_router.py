@@ -0,0 +1,105 @@
+from fastapi import APIRouter, Depends
+from app.api.inventory.snapshot_service import inventory_snapshotter
+from app.api.purchases.aggregate_reconciler import purchase_aggregate_reconciler
+from app.api.valuation.valuation_service import inventory_valuator
+from app.core import admission_controller, connection_manager
+from app.external_services._redis import latency_histogram
+from app.jwt import get_current_user, password_hasher, token_cache
+from app.lib.authentication.token_revocation import revocation_list
+from app.lib.dimension_cache import dimension_cache
+
+metrics_router = APIRouter(
+    prefix="/monitoring",
+    tags=["Monitoring"],
+    dependencies=[Depends(get_current_user)],
+)
+
+
+@metrics_router.get("/pool")
+async def pool_stats():
+    """
+    Connection pool statistics of every database engine of this worker
+    """
+
+    return {"engines": connection_manager.pool_stats()}
+
+
+@metrics_router.get("/admission")
+async def admission_stats():
+    """
+    Admission control of DB-bound requests: active, queued and shed requests
+    """
+
+    return admission_controller.stats()
+
+
+@metrics_router.get("/password-hasher")
+async def password_hasher_stats():
+    """
+    Queue and timing of the password hashing worker pool
+    """
+
+    return password_hasher.stats()
+
+
+@metrics_router.get("/token-cache")
+async def token_cache_stats():
+    """
+    Hits and misses of the verified access token cache
+    """
+
+    return token_cache.stats()
+
+
+@metrics_router.get("/token-revocation")
+async def token_revocation_stats():
+    """
+    Refresh token revocation checks answered locally and by Redis
+    """
+
+    return revocation_list.stats()
+
+
+@metrics_router.get("/redis")
+async def redis_stats():
+    """
+    Latency histogram of the Redis commands issued through RedisService
+    """
+
+    return latency_histogram.stats()
+
+
+@metrics_router.get("/inventory-snapshots")
+async def inventory_snapshot_stats():
+    """
+    Last stock snapshot taken by this worker
+    """
+
+    return inventory_snapshotter.stats()
+
+
+@metrics_router.get("/purchase-aggregates")
+async def purchase_aggregate_stats():
+    """
+    Last reconciliation of the purchase order aggregates run by this worker
+    """
+
+    return purchase_aggregate_reconciler.stats()
+
+
+@metrics_router.get("/inventory-valuation")
+async def inventory_valuation_stats():
+    """
+    Last batch of movements valued by this worker
+    """
+
+    return inventory_valuator.stats()
+
+
+@metrics_router.get("/dimensions")
+async def dimension_cache_stats():
+    """
+    Lookup tables cached by this worker and how often they were reloaded
+    """
+
+    return dimension_cache.stats()
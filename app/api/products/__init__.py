@@ -0,0 +1,10 @@
+from fastapi import APIRouter
+from .products_router import product_router
+
+
+products_router = APIRouter()
+products_router.include_router(product_router)
+
+__all__ = [
+    "products_router",
+]
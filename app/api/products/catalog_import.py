@@ -0,0 +1,344 @@
+import os
+import shutil
+from decimal import Decimal
+from tempfile import SpooledTemporaryFile
+from itertools import islice
+from typing import IO, Any, AsyncIterator, Iterator, Literal
+
+import pandas as pd
+from openpyxl import load_workbook
+from pydantic import BaseModel
+from sqlalchemy import literal_column, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.concurrency import iterate_in_threadpool, run_in_threadpool
+from fastapi import UploadFile
+
+from app.models import Product
+from app.lib.dimension_cache import dimension_cache
+from app.api.products.product_service import PRODUCT_INSERT_CHUNK_SIZE, ProductService
+
+PRODUCT_IMPORT_CHUNK_SIZE = int(os.getenv("PRODUCT_IMPORT_CHUNK_SIZE") or 5000)
+PRODUCT_IMPORT_MAX_ERRORS = int(os.getenv("PRODUCT_IMPORT_MAX_ERRORS") or 1000)
+# Bytes of an upload kept in memory when it is copied for a streamed import.
+PRODUCT_IMPORT_SPOOL_SIZE = 8 * 1024 * 1024
+
+ImportFormat = Literal["csv", "xlsx"]
+
+# File column: (products column, cached dimension resolving its code)
+REFERENCES = {
+    "category": ("category_id", "category"),
+    "quality": ("quality_id", "quality"),
+    "format": ("format_id", "formats"),
+    "model": ("model_id", "model"),
+    "make": ("make_id", "make"),
+    "unit_measure": ("unit_measure_id", "unit_measure"),
+    "currency": ("currency_id", "currency"),
+}
+REQUIRED = ("category", "quality", "unit_measure", "name")
+# DECIMAL(10, 2) columns
+NUMERIC = ("amount_of_content", "pallet_load_weight", "box_weight", "mt2_pallet", "mt2_box")
+FLAGS = ("batching", "serial_processing")
+COLUMNS = ("code", "name", *REFERENCES, *NUMERIC, *FLAGS)
+NUMERIC_LIMIT = 10**8
+
+TRUE = frozenset(("1", "true", "t", "yes", "y", "si", "sí", "x"))
+FALSE = frozenset(("0", "false", "f", "no", "n"))
+
+# Columns refreshed when a product with the same code already exists.
+UPSERT_COLUMNS = (
+    "name",
+    "format_id",
+    "model_id",
+    "make_id",
+    "unit_measure_id",
+    "batching",
+    "serial_processing",
+    *NUMERIC,
+    "currency_id",
+)
+
+
+class RejectedProduct(BaseModel):
+    row: int
+    errors: list[str]
+
+
+class ImportProgress(BaseModel):
+    rows: int = 0
+    inserted: int = 0
+    updated: int = 0
+    rejected_count: int = 0
+    done: bool = False
+    rejected: list[RejectedProduct] = []
+
+
+def import_format(upload: UploadFile) -> ImportFormat:
+    if (upload.filename or "").lower().endswith(".xlsx") or "spreadsheet" in (
+        upload.content_type or ""
+    ):
+        return "xlsx"
+    return "csv"
+
+
+async def spool_upload(upload: UploadFile) -> SpooledTemporaryFile:
+    """Copy of an upload that outlives the request, spilled to disk when large."""
+    spool = SpooledTemporaryFile(max_size=PRODUCT_IMPORT_SPOOL_SIZE)
+    await upload.seek(0)
+    await run_in_threadpool(shutil.copyfileobj, upload.file, spool)
+    spool.seek(0)
+    return spool
+
+
+def read_csv(file: IO[bytes], chunk_size: int) -> Iterator[pd.DataFrame]:
+    """Chunks of a CSV with a header line, every cell read as text."""
+    yield from pd.read_csv(
+        file,
+        dtype=str,
+        chunksize=chunk_size,
+        keep_default_na=False,
+        na_values=[""],
+        skipinitialspace=True,
+    )
+
+
+def read_xlsx(file: IO[bytes], chunk_size: int) -> Iterator[pd.DataFrame]:
+    """Chunks of the first sheet of a workbook, read row by row."""
+    workbook = load_workbook(file, read_only=True, data_only=True)
+    try:
+        rows = workbook.worksheets[0].iter_rows(values_only=True)
+        header = [str(value) if value is not None else "" for value in next(rows, ())]
+        start = 0
+        while batch := list(islice(rows, chunk_size)):
+            frame = pd.DataFrame(batch, columns=header, dtype=object)
+            frame.index = pd.RangeIndex(start, start + len(batch))
+            start += len(batch)
+            yield frame.map(lambda value: None if value is None else str(value))
+    finally:
+        workbook.close()
+
+
+def normalize(frame: pd.DataFrame) -> pd.DataFrame:
+    """Known columns only, trimmed, with blank cells as missing."""
+    frame.columns = [str(name).strip().lower() for name in frame.columns]
+    frame = frame.reindex(columns=list(COLUMNS))
+    frame = frame.astype(object).apply(lambda column: column.str.strip())
+    frame = frame.replace("", None)
+    frame = frame.dropna(how="all")
+    frame.insert(0, "row", frame.index + 1)
+    return frame
+
+
+class ChunkValidation:
+    """Column-wise checks of one chunk, every failing row collects its errors."""
+
+    def __init__(self, frame: pd.DataFrame):
+        self.frame = frame
+        self.errors: dict[int, list[str]] = {}
+
+    def fail(self, mask: pd.Series, message: str, column: str | None = None):
+        failing = self.frame.loc[mask]
+        values = failing[column] if column else [None] * len(failing)
+        for row, value in zip(failing["row"], values):
+            self.errors.setdefault(row, []).append(
+                message.format(value=value) if column else message
+            )
+
+    def required(self):
+        for column in REQUIRED:
+            self.fail(self.frame[column].isna(), f"{column} is required")
+
+    def lengths(self):
+        self.fail(self.frame["code"].str.len() > 20, "code is longer than 20")
+        self.fail(self.frame["name"].str.len() > 200, "name is longer than 200")
+
+    def references(self) -> pd.DataFrame:
+        ids = pd.DataFrame(index=self.frame.index)
+        for column, (target, dimension) in REFERENCES.items():
+            given = self.frame[column]
+            codes = dimension_cache.codes(dimension)
+            ids[target] = given.str.casefold().map(codes).astype("Int64")
+            self.fail(
+                given.notna() & ids[target].isna(),
+                f"Unknown {column} '{{value}}'",
+                column,
+            )
+        return ids
+
+    def numbers(self) -> pd.DataFrame:
+        numbers = pd.DataFrame(index=self.frame.index)
+        for column in NUMERIC:
+            given = self.frame[column]
+            parsed = pd.to_numeric(given, errors="coerce")
+            invalid = given.notna() & parsed.isna()
+            self.fail(invalid, f"{column} '{{value}}' is not a number", column)
+            self.fail(
+                (parsed < 0) | (parsed >= NUMERIC_LIMIT),
+                f"{column} {{value}} is out of range",
+                column,
+            )
+            numbers[column] = given.where(given.notna() & ~invalid, None).map(
+                Decimal, na_action="ignore"
+            )
+        return numbers
+
+    def flags(self) -> pd.DataFrame:
+        flags = pd.DataFrame(index=self.frame.index)
+        for column in FLAGS:
+            given = self.frame[column].str.casefold()
+            flags[column] = given.isin(TRUE)
+            self.fail(
+                given.notna() & ~given.isin(TRUE) & ~given.isin(FALSE),
+                f"{column} '{{value}}' is not a yes/no value",
+                column,
+            )
+        return flags
+
+    def duplicates(self):
+        for column in ("code", "name"):
+            given = self.frame[column]
+            self.fail(
+                given.notna() & given.duplicated(), f"{column} is repeated in the chunk"
+            )
+
+
+class CatalogImportService:
+    """Upsert of a supplier catalog read in chunks from a CSV or XLSX file.
+
+    Dimension codes are resolved against the worker's dimension cache and
+    mapped onto each chunk column by column, as are the numeric and yes/no
+    checks. Rows with a code update the product with that code,
+    rows without one update the product with the same name or are created
+    with a code reserved in blocks per category and quality. Each chunk of
+    ``PRODUCT_IMPORT_CHUNK_SIZE`` rows is committed on its own and reported
+    as progress.
+    """
+
+    def __init__(self, sess: AsyncSession):
+        self.sess = sess
+        self.progress = ImportProgress()
+
+    def _reject(self, row: int, errors: list[str]):
+        self.progress.rejected_count += 1
+        if len(self.progress.rejected) < PRODUCT_IMPORT_MAX_ERRORS:
+            self.progress.rejected.append(RejectedProduct(row=row, errors=errors))
+
+    async def _existing(self, names: list[str]) -> dict[str, str]:
+        """Code of the products already named as one of ``names``."""
+        result = await self.sess.execute(
+            select(Product.name, Product.code).where(Product.name.in_(names))
+        )
+        return dict(result.all())
+
+    async def _prepare(self, frame: pd.DataFrame) -> list[dict[str, Any]]:
+        check = ChunkValidation(frame)
+        check.required()
+        check.lengths()
+        ids = check.references()
+        numbers = check.numbers()
+        flags = check.flags()
+        check.duplicates()
+
+        records = pd.concat([frame[["row", "code", "name"]], ids, numbers, flags], axis=1)
+        records = records[~records["row"].isin(list(check.errors))]
+
+        existing = await self._existing(records["name"].tolist()) if len(records) else {}
+        current = records["name"].map(existing)
+        taken = records["code"].notna() & current.notna() & (current != records["code"])
+        for row, code in zip(records.loc[taken, "row"], current[taken]):
+            check.errors.setdefault(row, []).append(
+                f"name already belongs to product {code}"
+            )
+        records = records[~taken]
+        records["code"] = records["code"].fillna(current[~taken])
+        # Two rows may have matched the same product, one by code and one by name.
+        repeated = records["code"].notna() & records["code"].duplicated()
+        for row in records.loc[repeated, "row"]:
+            check.errors.setdefault(row, []).append("product is repeated in the chunk")
+        records = records[~repeated]
+
+        for row, errors in check.errors.items():
+            self._reject(row, errors)
+
+        records = records.astype(object).where(records.notna(), None)
+        return records.to_dict("records")
+
+    async def _upsert(self, records: list[dict[str, Any]]) -> tuple[int, int]:
+        # New products of a category and quality share one reserved block.
+        pending: dict[tuple[int, int], list[dict[str, Any]]] = {}
+        for record in records:
+            record["numeric_seq"] = None
+            if record["code"] is None:
+                key = (record["category_id"], record["quality_id"])
+                pending.setdefault(key, []).append(record)
+        products = ProductService(self.sess)
+        for key, block in sorted(pending.items()):
+            for record, seq in zip(block, await products.reserve_codes(*key, len(block))):
+                record["numeric_seq"] = seq
+
+        inserted = updated = 0
+        for start in range(0, len(records), PRODUCT_INSERT_CHUNK_SIZE):
+            stmt = pg_insert(Product).values(
+                [
+                    {key: value for key, value in record.items() if key != "row"}
+                    for record in records[start:start + PRODUCT_INSERT_CHUNK_SIZE]
+                ]
+            )
+            stmt = stmt.on_conflict_do_update(
+                index_elements=[Product.code],
+                set_={column: stmt.excluded[column] for column in UPSERT_COLUMNS},
+            ).returning(literal_column("xmax = 0"))
+            created = (await self.sess.scalars(stmt)).all()
+            inserted += sum(created)
+            updated += len(created) - sum(created)
+
+        return inserted, updated
+
+    async def _import_chunk(self, frame: pd.DataFrame):
+        frame = normalize(frame)
+        self.progress.rows += len(frame)
+        records = await self._prepare(frame)
+        if not records:
+            return
+
+        try:
+            inserted, updated = await self._upsert(records)
+            await self.sess.commit()
+        except DBAPIError as ex:
+            await self.sess.rollback()
+            message = f"Chunk rejected: {ex.orig}"
+            for record in records:
+                self._reject(record["row"], [message])
+            return
+
+        self.progress.inserted += inserted
+        self.progress.updated += updated
+
+    async def run(
+        self, file: IO[bytes], fmt: ImportFormat = "csv"
+    ) -> AsyncIterator[ImportProgress]:
+        """Import ``file``, yielding the progress after every chunk."""
+        reader = read_xlsx if fmt == "xlsx" else read_csv
+
+        try:
+            # Picks up dimension rows created moments before the import.
+            await dimension_cache.refresh()
+            # Parsing is blocking, every chunk is read in a worker thread.
+            async for frame in iterate_in_threadpool(
+                reader(file, PRODUCT_IMPORT_CHUNK_SIZE)
+            ):
+                await self._import_chunk(frame)
+                yield self.progress.model_copy(update={"rejected": []})
+        except Exception:
+            await self.sess.rollback()
+            raise
+
+        self.progress.done = True
+        self.progress.rejected.sort(key=lambda rejected: rejected.row)
+        yield self.progress
+
+    async def import_file(self, file: IO[bytes], fmt: ImportFormat = "csv") -> ImportProgress:
+        async for progress in self.run(file, fmt):
+            pass
+        return progress
@@ -0,0 +1,154 @@
+"""Concurrent product code allocation against the configured database.
+
+Run with ``python -m app.api.products.code_allocation_check [workers] [rounds]``.
+The products table, its counters and the insert trigger are recreated in a
+scratch schema that is dropped at the end. Every worker inserts products of
+the same category and quality in parallel, alternating single inserts
+numbered by the trigger and batches reserved as one block, then the codes
+are checked to be unique and gapless. Any unique violation is reported as a
+failure, there are no retries.
+"""
+import sys
+import time
+import asyncio
+
+from sqlalchemy import text
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core import connection_manager
+from app.api.products.product_service import ProductIn, ProductService
+
+SCHEMA = "product_code_check"
+WORKERS = 16
+ROUNDS = 50
+BATCH = 20
+
+
+async def _setup(sess: AsyncSession) -> tuple[int, int, int]:
+    await sess.execute(text(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE"))
+    await sess.execute(text(f"CREATE SCHEMA {SCHEMA}"))
+    for table in ("products", "product_code_counters"):
+        await sess.execute(
+            text(f"CREATE TABLE {SCHEMA}.{table} (LIKE public.{table} INCLUDING ALL)")
+        )
+    await sess.execute(text(f"CREATE SEQUENCE {SCHEMA}.products_id_seq"))
+    await sess.execute(
+        text(
+            f"ALTER TABLE {SCHEMA}.products ALTER COLUMN id "
+            f"SET DEFAULT nextval('{SCHEMA}.products_id_seq')"
+        )
+    )
+    await sess.execute(
+        text(f"""
+            CREATE TRIGGER before_insert_productos
+            BEFORE INSERT ON {SCHEMA}.products
+            FOR EACH ROW EXECUTE FUNCTION trigger_generar_codigo_producto()
+        """)
+    )
+    keys = (
+        await sess.execute(
+            text("""
+                SELECT (SELECT min(id) FROM category),
+                       (SELECT min(id) FROM quality),
+                       (SELECT min(id) FROM unit_measure)
+            """)
+        )
+    ).one()
+    await sess.commit()
+
+    return tuple(keys)
+
+
+async def _worker(number: int, keys: tuple[int, int, int], rounds: int) -> int:
+    category_id, quality_id, unit_measure_id = keys
+    failures = 0
+
+    engine = connection_manager.get_engine()
+    async with engine.connect() as connection:
+        sess = AsyncSession(bind=connection)
+        # The trigger functions resolve products and its counters through the
+        # search path, so they write to the scratch tables.
+        await sess.execute(text(f"SET search_path TO {SCHEMA}, public"))
+        await sess.commit()
+        service = ProductService(sess)
+
+        try:
+            for round_ in range(rounds):
+                products = [
+                    ProductIn(
+                        category_id=category_id,
+                        quality_id=quality_id,
+                        unit_measure_id=unit_measure_id,
+                        name=f"worker {number} round {round_} item {item}",
+                    )
+                    for item in range(1 if round_ % 2 else BATCH)
+                ]
+                try:
+                    await service.create_products(products)
+                except Exception as ex:  # pylint: disable=broad-exception-caught
+                    if not isinstance(ex.__cause__, IntegrityError):
+                        raise
+                    failures += 1
+        finally:
+            await sess.execute(text("RESET search_path"))
+            await sess.commit()
+            await sess.close()
+
+    return failures
+
+
+async def run(workers: int = WORKERS, rounds: int = ROUNDS):
+    engine = connection_manager.get_engine()
+
+    async with engine.connect() as connection:
+        sess = AsyncSession(bind=connection)
+        keys = await _setup(sess)
+
+        try:
+            started = time.perf_counter()
+            failures = sum(
+                await asyncio.gather(
+                    *(_worker(number, keys, rounds) for number in range(workers))
+                )
+            )
+            elapsed = time.perf_counter() - started
+
+            check = (
+                await sess.execute(
+                    text(f"""
+                        SELECT count(*) AS products,
+                               count(DISTINCT code) AS codes,
+                               min(numeric_seq) AS first,
+                               max(numeric_seq) AS last
+                        FROM {SCHEMA}.products
+                    """)
+                )
+            ).one()
+            await sess.commit()
+
+            ok = (
+                failures == 0
+                and check.products == check.codes
+                and check.first == 1
+                and check.last == check.products
+            )
+            print(
+                f"{check.products} products by {workers} workers in {elapsed:.3f}s  "
+                f"codes: {check.codes}  numbers: {check.first}..{check.last}  "
+                f"unique violations: {failures}  {'OK' if ok else 'FAILED'}"
+            )
+        finally:
+            await sess.rollback()
+            await sess.execute(text(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE"))
+            await sess.commit()
+            await sess.close()
+
+    await connection_manager.close()
+
+    if not ok:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    asyncio.run(run(*(int(arg) for arg in sys.argv[1:3])))
@@ -0,0 +1,145 @@
+import os
+from decimal import Decimal
+from typing import Iterable
+
+from pydantic import BaseModel, Field, computed_field
+from sqlalchemy import func, insert, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from fastapi import status, HTTPException
+
+from app.models import Product
+from app.lib.dimension_cache import dimension_cache
+
+# Rows per multi-row INSERT of a product import, 17 bind parameters each.
+PRODUCT_INSERT_CHUNK_SIZE = int(os.getenv("PRODUCT_INSERT_CHUNK_SIZE") or 1000)
+
+CodeKey = tuple[int, int]
+
+
+class ProductIn(BaseModel):
+    category_id: int
+    quality_id: int
+    name: str = Field(max_length=200)
+    unit_measure_id: int
+    # Left empty the code is generated from the category, the quality and
+    # the next number of their counter.
+    code: str | None = Field(None, max_length=20)
+    numeric_seq: int | None = Field(None, gt=0)
+    format_id: int | None = None
+    model_id: int | None = None
+    make_id: int | None = None
+    batching: bool = False
+    serial_processing: bool = False
+    amount_of_content: Decimal | None = Field(None, max_digits=10, decimal_places=2)
+    pallet_load_weight: Decimal | None = Field(None, max_digits=10, decimal_places=2)
+    box_weight: Decimal | None = Field(None, max_digits=10, decimal_places=2)
+    mt2_pallet: Decimal | None = Field(None, max_digits=10, decimal_places=2)
+    mt2_box: Decimal | None = Field(None, max_digits=10, decimal_places=2)
+    currency_id: int | None = None
+
+
+class ProductCreated(BaseModel):
+    id: int
+    code: str
+    numeric_seq: int | None
+    category_id: int
+    quality_id: int
+    name: str
+
+    # Labels come from the dimension cache instead of joining the tables.
+    @computed_field
+    @property
+    def category(self) -> str | None:
+        return dimension_cache.label("category", self.category_id)
+
+    @computed_field
+    @property
+    def quality(self) -> str | None:
+        return dimension_cache.label("quality", self.quality_id)
+
+
+def pending_codes(products: Iterable[ProductIn]) -> dict[CodeKey, int]:
+    """Numbers to reserve per (category_id, quality_id), in lock order."""
+    counts: dict[CodeKey, int] = {}
+    for product in products:
+        if product.code or product.numeric_seq is not None:
+            continue
+        key = (product.category_id, product.quality_id)
+        counts[key] = counts.get(key, 0) + 1
+
+    return dict(sorted(counts.items()))
+
+
+class ProductService:
+    """Product creation on top of the ``product_code_counters`` allocator.
+
+    Codes are numbered per (category, quality) by ``reservar_codigos_producto``
+    in ``sql/database.sql``, which increments a single counter row instead of
+    scanning ``products`` for the current maximum. A batch reserves one block
+    per key up front and inserts the rows with their number already set.
+    """
+
+    def __init__(self, sess: AsyncSession):
+        self.sess = sess
+
+    async def reserve_codes(self, category_id: int, quality_id: int, count: int) -> range:
+        """Reserve ``count`` consecutive numbers, held until the transaction ends."""
+        first = await self.sess.scalar(
+            select(func.reservar_codigos_producto(category_id, quality_id, count))
+        )
+        return range(first, first + count)
+
+    async def create_products(self, products: list[ProductIn]) -> list[ProductCreated]:
+        if not products:
+            return []
+
+        try:
+            # Counters are locked in key order so concurrent imports of the
+            # same categories cannot deadlock each other. A single product is
+            # left to the insert trigger, which takes its number the same way.
+            blocks = {
+                key: iter(await self.reserve_codes(*key, count))
+                for key, count in pending_codes(products).items()
+                if len(products) > 1
+            }
+
+            rows = []
+            for product in products:
+                row = product.model_dump()
+                block = blocks.get((product.category_id, product.quality_id))
+                if block is not None and not product.code and product.numeric_seq is None:
+                    row["numeric_seq"] = next(block)
+                rows.append(row)
+
+            created: list[ProductCreated] = []
+            for start in range(0, len(rows), PRODUCT_INSERT_CHUNK_SIZE):
+                result = await self.sess.execute(
+                    insert(Product)
+                    .values(rows[start:start + PRODUCT_INSERT_CHUNK_SIZE])
+                    .returning(
+                        Product.id,
+                        Product.code,
+                        Product.numeric_seq,
+                        Product.category_id,
+                        Product.quality_id,
+                        Product.name,
+                    )
+                )
+                created.extend(ProductCreated.model_validate(row._mapping) for row in result)
+
+            await self.sess.commit()
+        except IntegrityError as ex:
+            await self.sess.rollback()
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail="Duplicated product code or name, or unknown reference",
+            ) from ex
+        except Exception:
+            await self.sess.rollback()
+            raise
+
+        return created
+
+    async def create_product(self, product: ProductIn) -> ProductCreated:
+        return (await self.create_products([product]))[0]
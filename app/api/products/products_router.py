@@ -0,0 +1,87 @@
+from fastapi import APIRouter, Body, UploadFile
+from sse_starlette.sse import EventSourceResponse
+from app.core import connection_manager
+from app.dependencies import CurrentUser, DBSessionDep
+from app.api.products.catalog_import import (
+    CatalogImportService,
+    ImportFormat,
+    ImportProgress,
+    import_format,
+    spool_upload,
+)
+from app.api.products.product_service import (
+    ProductCreated,
+    ProductIn,
+    ProductService,
+)
+
+product_router = APIRouter(prefix="/products", tags=["Products"])
+
+
+@product_router.post("", response_model=ProductCreated)
+async def create_product(_: CurrentUser, sess: DBSessionDep, product: ProductIn):
+    """
+    Create a product, without a code it gets the next one of its category
+    and quality
+    """
+
+    service = ProductService(sess)
+    return await service.create_product(product)
+
+
+@product_router.post("/batch", response_model=list[ProductCreated])
+async def create_products(
+    _: CurrentUser,
+    sess: DBSessionDep,
+    products: list[ProductIn] = Body(min_length=1),
+):
+    """
+    Create a batch of products in one transaction, the codes of each
+    category and quality are reserved as one block
+    """
+
+    service = ProductService(sess)
+    return await service.create_products(products)
+
+
+@product_router.post("/import", response_model=ImportProgress)
+async def import_catalog(
+    _: CurrentUser,
+    sess: DBSessionDep,
+    file: UploadFile,
+    fmt: ImportFormat | None = None,
+):
+    """
+    Upsert the products of a CSV or XLSX catalog referencing categories,
+    qualities, formats, models, makes, units and currencies by code
+    """
+
+    service = CatalogImportService(sess)
+    return await service.import_file(file.file, fmt or import_format(file))
+
+
+@product_router.post("/import/stream")
+async def import_catalog_stream(
+    _: CurrentUser, file: UploadFile, fmt: ImportFormat | None = None
+):
+    """
+    Same as /import, reporting the progress as server-sent events after
+    every chunk and the rejected rows in the final "done" event
+    """
+
+    fmt = fmt or import_format(file)
+    # The upload and the request session are closed before the events are sent.
+    spool = await spool_upload(file)
+
+    async def events():
+        try:
+            async with connection_manager.get_context_session() as sess:
+                async for progress in CatalogImportService(sess).run(spool, fmt):
+                    yield {
+                        "event": "done" if progress.done else "progress",
+                        "data": progress.model_dump_json(),
+                    }
+        finally:
+            spool.close()
+
+    return EventSourceResponse(events())
@@ -0,0 +1,10 @@
+from fastapi import APIRouter
+from .purchases_router import purchase_router
+
+
+purchases_router = APIRouter()
+purchases_router.include_router(purchase_router)
+
+__all__ = [
+    "purchases_router",
+]
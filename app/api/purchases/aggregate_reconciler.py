@@ -0,0 +1,186 @@
+import os
+import time
+import asyncio
+from decimal import Decimal
+
+from pydantic import BaseModel
+from sqlalchemy import func, select, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.logger import logger
+from app.core import connection_manager
+
+# Seconds between checks of the purchase order aggregates, 0 disables the job.
+PURCHASE_RECONCILE_INTERVAL = float(os.getenv("PURCHASE_RECONCILE_INTERVAL") or 86400)
+
+# Only one worker of the deployment reconciles at a time.
+RECONCILE_LOCK_ID = 7_310_002
+
+# Orders whose stored aggregates differ from their detail lines, in one pass
+# over both tables.
+DRIFTED_ORDERS = """
+    SELECT o.id,
+           o.total_amount, o.line_count, o.ordered_quantity, o.received_quantity,
+           COALESCE(d.total_amount, 0) AS actual_total_amount,
+           COALESCE(d.line_count, 0) AS actual_line_count,
+           COALESCE(d.ordered_quantity, 0) AS actual_ordered_quantity,
+           COALESCE(d.received_quantity, 0) AS actual_received_quantity
+    FROM purchase_orders o
+    LEFT JOIN (
+        SELECT purchase_order_id,
+               SUM(subtotal) AS total_amount,
+               count(*) AS line_count,
+               SUM(quantity) AS ordered_quantity,
+               SUM(received_quantity) AS received_quantity
+        FROM purchase_order_details
+        {where_details}
+        GROUP BY purchase_order_id
+    ) d ON d.purchase_order_id = o.id
+    WHERE (o.total_amount, o.line_count, o.ordered_quantity, o.received_quantity)
+          IS DISTINCT FROM (
+              COALESCE(d.total_amount, 0), COALESCE(d.line_count, 0),
+              COALESCE(d.ordered_quantity, 0), COALESCE(d.received_quantity, 0)
+          )
+      {where_orders}
+    ORDER BY o.id
+"""
+FIND_DRIFT = text(DRIFTED_ORDERS.format(where_details="", where_orders=""))
+
+LOCK_ORDERS = text("""
+    SELECT id FROM purchase_orders
+    WHERE id = ANY(:ids)
+    ORDER BY id
+    FOR UPDATE
+""")
+
+# Recomputed once the orders are locked: a concurrent writer either already
+# committed its lines, or applies its delta after this repair.
+REPAIR_DRIFT = text(
+    """
+    UPDATE purchase_orders o
+    SET total_amount = r.actual_total_amount,
+        line_count = r.actual_line_count,
+        ordered_quantity = r.actual_ordered_quantity,
+        received_quantity = r.actual_received_quantity
+    FROM ({drifted}) r
+    WHERE o.id = r.id
+    RETURNING o.id
+    """.format(
+        drifted=DRIFTED_ORDERS.format(
+            where_details="WHERE purchase_order_id = ANY(:ids)",
+            where_orders="AND o.id = ANY(:ids)",
+        )
+    )
+)
+
+
+class AggregateDrift(BaseModel):
+    id: int
+    total_amount: Decimal
+    line_count: int
+    ordered_quantity: Decimal
+    received_quantity: Decimal
+    actual_total_amount: Decimal
+    actual_line_count: int
+    actual_ordered_quantity: Decimal
+    actual_received_quantity: Decimal
+
+
+class ReconcileRun(BaseModel):
+    checked: bool
+    drifted: list[AggregateDrift] = []
+    repaired: int = 0
+
+
+class PurchaseAggregateService:
+
+    def __init__(self, sess: AsyncSession):
+        self.sess = sess
+
+    async def drift(self) -> list[AggregateDrift]:
+        result = await self.sess.execute(FIND_DRIFT)
+        return [AggregateDrift.model_validate(row._mapping) for row in result]
+
+    async def reconcile(self, repair: bool = True) -> ReconcileRun:
+        """Find the orders whose aggregates drifted and optionally fix them,
+        unless another worker is already doing it."""
+        try:
+            locked = await self.sess.scalar(
+                select(func.pg_try_advisory_xact_lock(RECONCILE_LOCK_ID))
+            )
+            if not locked:
+                await self.sess.rollback()
+                return ReconcileRun(checked=False)
+
+            drifted = await self.drift()
+            repaired = 0
+            if repair and drifted:
+                ids = [order.id for order in drifted]
+                await self.sess.execute(LOCK_ORDERS, {"ids": ids})
+                result = await self.sess.execute(REPAIR_DRIFT, {"ids": ids})
+                repaired = len(result.all())
+            await self.sess.commit()
+        except Exception:
+            await self.sess.rollback()
+            raise
+
+        return ReconcileRun(checked=True, drifted=drifted, repaired=repaired)
+
+
+class PurchaseAggregateReconciler:
+    """Background job reconciling the purchase order aggregates every
+    ``interval`` seconds."""
+
+    def __init__(self, interval: float = PURCHASE_RECONCILE_INTERVAL):
+        self.interval = interval
+        self._task: asyncio.Task | None = None
+        self.last_run: ReconcileRun | None = None
+        self.last_duration = 0.0
+
+    async def run_once(self, repair: bool = True) -> ReconcileRun:
+        started = time.perf_counter()
+        async with connection_manager.get_context_session() as sess:
+            run = await PurchaseAggregateService(sess).reconcile(repair)
+
+        if run.checked:
+            self.last_run = run
+            self.last_duration = time.perf_counter() - started
+            if run.drifted:
+                logger.warning(
+                    f"Purchase order aggregates drifted on {len(run.drifted)} orders, "
+                    f"{run.repaired} repaired"
+                )
+
+        return run
+
+    async def _run_periodically(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.run_once()
+            except Exception as ex:  # pylint: disable=broad-exception-caught
+                logger.error(ex)
+
+    async def start(self):
+        if self.interval > 0:
+            self._task = asyncio.create_task(self._run_periodically())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def stats(self) -> dict:
+        return {
+            "interval": self.interval,
+            "last_drifted": len(self.last_run.drifted) if self.last_run else None,
+            "last_repaired": self.last_run.repaired if self.last_run else None,
+            "last_duration_ms": round(self.last_duration * 1000, 3),
+        }
+
+
+purchase_aggregate_reconciler = PurchaseAggregateReconciler()
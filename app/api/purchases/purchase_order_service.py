@@ -0,0 +1,75 @@
+from datetime import date, datetime
+from decimal import Decimal
+
+from pydantic import BaseModel, computed_field
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models import PurchaseOrder
+from app.schemas import PaginatedPerPageRequest, PaginatedPerPageResponse
+from app.lib.dimension_cache import dimension_cache
+
+
+class PurchaseOrderFilters(PaginatedPerPageRequest):
+    partner_id: int | None = None
+    state_flow: int | None = None
+
+
+class PurchaseOrderSummary(BaseModel):
+    id: int
+    order_number: str
+    partner_id: int
+    order_date: datetime | None
+    delivery_date: date | None
+    state_flow: int
+    total_amount: Decimal
+    line_count: int
+    ordered_quantity: Decimal
+    received_quantity: Decimal
+
+    @computed_field
+    @property
+    def state(self) -> str | None:
+        return dimension_cache.label("state_flow", self.state_flow)
+
+
+class PurchaseOrderService:
+
+    def __init__(self, sess: AsyncSession):
+        self.sess = sess
+
+    async def list_orders(
+        self, filters: PurchaseOrderFilters
+    ) -> PaginatedPerPageResponse[PurchaseOrderSummary]:
+        """Newest orders first, aggregates are read from the order row."""
+        conditions = []
+        if filters.partner_id is not None:
+            conditions.append(PurchaseOrder.partner_id == filters.partner_id)
+        if filters.state_flow is not None:
+            conditions.append(PurchaseOrder.state_flow == filters.state_flow)
+
+        total = await self.sess.scalar(
+            select(func.count()).select_from(PurchaseOrder).where(*conditions)
+        )
+        result = await self.sess.execute(
+            select(
+                *(
+                    getattr(PurchaseOrder, name)
+                    for name in PurchaseOrderSummary.model_fields
+                )
+            )
+            .where(*conditions)
+            .order_by(PurchaseOrder.order_date.desc(), PurchaseOrder.id.desc())
+            .limit(filters.per_page)
+            .offset((filters.page - 1) * filters.per_page)
+        )
+        await dimension_cache.ensure_loaded()
+
+        return PaginatedPerPageResponse[PurchaseOrderSummary](
+            total=total,
+            page=[PurchaseOrderSummary.model_validate(row._mapping) for row in result],
+            nextPage=(
+                filters.page + 1 if filters.page * filters.per_page < total else None
+            ),
+            prevPage=filters.page - 1 if filters.page > 1 else None,
+        )
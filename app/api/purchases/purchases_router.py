@@ -0,0 +1,68 @@
+from typing import Annotated
+from fastapi import APIRouter, Query
+from app.dependencies import CurrentUser, DBSessionDep
+from app.schemas import PaginatedPerPageResponse
+from app.api.purchases.aggregate_reconciler import (
+    AggregateDrift,
+    PurchaseAggregateService,
+    ReconcileRun,
+    purchase_aggregate_reconciler,
+)
+from app.api.purchases.purchase_order_service import (
+    PurchaseOrderFilters,
+    PurchaseOrderService,
+    PurchaseOrderSummary,
+)
+from app.api.purchases.receiving_service import (
+    ReceiptIn,
+    ReceiptOut,
+    ReceivingService,
+)
+
+purchase_router = APIRouter(prefix="/purchase-orders", tags=["Purchase orders"])
+
+
+@purchase_router.get("", response_model=PaginatedPerPageResponse[PurchaseOrderSummary])
+async def list_orders(
+    _: CurrentUser,
+    sess: DBSessionDep,
+    filters: Annotated[PurchaseOrderFilters, Query()],
+):
+    """
+    Purchase orders with their totals, line counts and received quantities
+    """
+
+    service = PurchaseOrderService(sess)
+    return await service.list_orders(filters)
+
+
+@purchase_router.get("/aggregates/drift", response_model=list[AggregateDrift])
+async def aggregate_drift(_: CurrentUser, sess: DBSessionDep):
+    """
+    Orders whose stored aggregates differ from their detail lines
+    """
+
+    service = PurchaseAggregateService(sess)
+    return await service.drift()
+
+
+@purchase_router.post("/aggregates/reconcile", response_model=ReconcileRun)
+async def reconcile_aggregates(_: CurrentUser, repair: bool = True):
+    """
+    Check the aggregates of every order now and repair the drifted ones
+    """
+
+    return await purchase_aggregate_reconciler.run_once(repair)
+
+
+@purchase_router.post("/{order_id}/receipts", response_model=ReceiptOut)
+async def receive_order(
+    current_user: CurrentUser, sess: DBSessionDep, order_id: int, receipt: ReceiptIn
+):
+    """
+    Receive a purchase order, or part of it, into a warehouse. A document
+    already received returns its first receipt without posting it again
+    """
+
+    service = ReceivingService(sess)
+    return await service.receive(order_id, receipt, current_user.user_id)
@@ -0,0 +1,279 @@
+import json
+from decimal import Decimal
+
+from pydantic import BaseModel, Field
+from sqlalchemy import func, select, text
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from fastapi import status, HTTPException
+
+from app.models import (
+    PurchaseOrder,
+    PurchaseOrderDetail,
+    PurchaseOrderReceipt,
+    PurchaseOrderReceiptLine,
+)
+
+# State a purchase order moves to once every line was received.
+RECEIVED_STATE = "Completado"
+
+# Receive a purchase order in one statement: register the receipt, add the
+# quantities to the detail lines, write an ENTRADA movement per line, add the
+# stock and advance the order state, its aggregates follow the detail lines
+# through triggers. The receipt insert does nothing when its source_document
+# was already used, and every other step depends on it, so a retried request
+# changes nothing. Lines asking for more than is pending block every write;
+# the caller rolls the receipt back.
+RECEIVE_ORDER = text("""
+    WITH receipt AS (
+        INSERT INTO purchase_order_receipts (
+            purchase_order_id, source_document, warehouse_id, received_by_user_id
+        )
+        SELECT id, :source_document, :warehouse_id, :user_id
+        FROM purchase_orders
+        WHERE id = :order_id
+        ON CONFLICT (source_document) DO NOTHING
+        RETURNING id, received_at
+    ), lines AS (
+        SELECT detail_id, quantity
+        FROM jsonb_to_recordset(CAST(:lines AS jsonb)) AS l(detail_id integer, quantity numeric)
+    ), requested AS (
+        -- Every line of the order, locked, with the quantity to receive now.
+        SELECT d.id, d.product_id, d.quantity AS ordered, d.received_quantity,
+               d.subtotal, p.unit_measure_id,
+               CASE WHEN :receive_all THEN d.quantity - d.received_quantity
+                    ELSE COALESCE(l.quantity, 0)
+               END AS quantity
+        FROM purchase_order_details d
+        JOIN products p ON p.id = d.product_id
+        LEFT JOIN lines l ON l.detail_id = d.id
+        WHERE d.purchase_order_id = :order_id
+          AND EXISTS (SELECT 1 FROM receipt)
+        ORDER BY d.id
+        FOR UPDATE OF d
+    ), received AS (
+        UPDATE purchase_order_details d
+        SET received_quantity = d.received_quantity + r.quantity
+        FROM requested r
+        WHERE d.id = r.id
+          AND r.quantity > 0
+          AND NOT EXISTS (
+              SELECT 1 FROM requested x WHERE x.received_quantity + x.quantity > x.ordered
+          )
+        RETURNING d.id, d.product_id, r.quantity, r.unit_measure_id
+    ), receipt_lines AS (
+        INSERT INTO purchase_order_receipt_lines (receipt_id, purchase_order_detail_id, quantity)
+        SELECT receipt.id, received.id, received.quantity
+        FROM receipt, received
+        RETURNING purchase_order_detail_id
+    ), moved AS (
+        INSERT INTO inventory_movements (
+            warehouse_id, product_id, movement_type, quantity, movement_date,
+            source_document, unit_measure_id
+        )
+        SELECT :warehouse_id, received.product_id, 'ENTRADA', received.quantity,
+               receipt.received_at, :source_document, received.unit_measure_id
+        FROM receipt, received
+        ORDER BY received.id
+        RETURNING product_id
+    ), applied AS (
+        INSERT INTO inventory (warehouse_id, product_id, stock_quantity)
+        SELECT :warehouse_id, product_id, SUM(quantity)
+        FROM received
+        GROUP BY product_id
+        ORDER BY product_id
+        ON CONFLICT (warehouse_id, product_id) DO UPDATE
+        SET stock_quantity = inventory.stock_quantity + EXCLUDED.stock_quantity,
+            last_update = now()
+        RETURNING product_id
+    ), ordered AS (
+        UPDATE purchase_orders o
+        SET state_flow = CASE
+                WHEN t.completed THEN COALESCE(
+                    (SELECT id FROM state_flow WHERE name = :received_state),
+                    o.state_flow
+                )
+                ELSE o.state_flow
+            END
+        FROM (
+            SELECT bool_and(received_quantity + quantity >= ordered) AS completed
+            FROM requested
+        ) t
+        WHERE o.id = :order_id AND EXISTS (SELECT 1 FROM received)
+        RETURNING t.completed
+    )
+    SELECT (SELECT id FROM receipt) AS receipt_id,
+           r.id AS detail_id, r.product_id, r.quantity,
+           r.ordered - r.received_quantity AS pending,
+           EXISTS (SELECT 1 FROM received x WHERE x.id = r.id) AS received,
+           COALESCE((SELECT completed FROM ordered), false) AS completed
+    FROM requested r
+    WHERE r.quantity > 0
+    ORDER BY r.id
+""")
+
+
+class ReceiptLineIn(BaseModel):
+    detail_id: int
+    quantity: Decimal = Field(gt=0, max_digits=10, decimal_places=2)
+
+
+class ReceiptIn(BaseModel):
+    # Delivery note or guide number, a receipt is posted once per document.
+    source_document: str = Field(min_length=1, max_length=255)
+    warehouse_id: int
+    # Lines received, every pending quantity when omitted.
+    lines: list[ReceiptLineIn] | None = Field(None, min_length=1)
+
+
+class ReceiptLine(BaseModel):
+    detail_id: int
+    product_id: int
+    quantity: Decimal
+
+
+class ReceiptOut(BaseModel):
+    receipt_id: int
+    purchase_order_id: int
+    source_document: str
+    # True when the document had already been received, nothing was posted.
+    replayed: bool = False
+    completed: bool
+    lines: list[ReceiptLine]
+
+
+class ReceivingService:
+
+    def __init__(self, sess: AsyncSession):
+        self.sess = sess
+
+    async def receive(self, order_id: int, receipt: ReceiptIn, user_id: int) -> ReceiptOut:
+        """Post a receipt of a purchase order into the inventory.
+
+        Partial receipts add to the quantities received so far. Posting the
+        same ``source_document`` again returns the first receipt untouched.
+        """
+        requested: dict[int, Decimal] = {}
+        for line in receipt.lines or ():
+            requested[line.detail_id] = requested.get(line.detail_id, 0) + line.quantity
+
+        try:
+            result = await self.sess.execute(
+                RECEIVE_ORDER,
+                {
+                    "order_id": order_id,
+                    "source_document": receipt.source_document,
+                    "warehouse_id": receipt.warehouse_id,
+                    "user_id": user_id,
+                    "receive_all": receipt.lines is None,
+                    "lines": json.dumps(
+                        [
+                            {"detail_id": detail_id, "quantity": str(quantity)}
+                            for detail_id, quantity in requested.items()
+                        ]
+                    ),
+                    "received_state": RECEIVED_STATE,
+                },
+            )
+            rows = result.all()
+        except IntegrityError as ex:
+            await self.sess.rollback()
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Warehouse not found",
+            ) from ex
+        except Exception:
+            await self.sess.rollback()
+            raise
+
+        # Nothing comes back when the document was already received, the
+        # order does not exist or there is nothing to receive.
+        if not rows:
+            await self.sess.rollback()
+            return await self._replayed(order_id, receipt)
+
+        unknown = sorted(requested.keys() - {row.detail_id for row in rows})
+        if unknown or not rows[0].received:
+            await self.sess.rollback()
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail={
+                    "message": "Lines not in the order or above their pending quantity",
+                    "unknown": unknown,
+                    "lines": [
+                        {
+                            "detail_id": row.detail_id,
+                            "quantity": str(row.quantity),
+                            "pending": str(row.pending),
+                        }
+                        for row in rows
+                        if row.quantity > row.pending
+                    ],
+                },
+            )
+
+        await self.sess.commit()
+        return ReceiptOut(
+            receipt_id=rows[0].receipt_id,
+            purchase_order_id=order_id,
+            source_document=receipt.source_document,
+            completed=rows[0].completed,
+            lines=[ReceiptLine.model_validate(row._mapping) for row in rows],
+        )
+
+    async def _replayed(self, order_id: int, receipt: ReceiptIn) -> ReceiptOut:
+        """The receipt already posted for the document."""
+        previous = await self.sess.scalar(
+            select(PurchaseOrderReceipt).where(
+                PurchaseOrderReceipt.source_document == receipt.source_document
+            )
+        )
+        if previous is None:
+            exists = await self.sess.scalar(
+                select(PurchaseOrder.id).where(PurchaseOrder.id == order_id)
+            )
+            if exists is None:
+                raise HTTPException(
+                    status_code=status.HTTP_404_NOT_FOUND,
+                    detail="Purchase order not found",
+                )
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail="Nothing pending to receive in the purchase order lines",
+            )
+        if previous.purchase_order_id != order_id:
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail="The document was received for another purchase order",
+            )
+
+        result = await self.sess.execute(
+            select(
+                PurchaseOrderReceiptLine.purchase_order_detail_id.label("detail_id"),
+                PurchaseOrderDetail.product_id,
+                PurchaseOrderReceiptLine.quantity,
+            )
+            .join(
+                PurchaseOrderDetail,
+                PurchaseOrderDetail.id == PurchaseOrderReceiptLine.purchase_order_detail_id,
+            )
+            .where(PurchaseOrderReceiptLine.receipt_id == previous.id)
+            .order_by(PurchaseOrderReceiptLine.purchase_order_detail_id)
+        )
+        lines = [ReceiptLine.model_validate(row._mapping) for row in result]
+        completed = await self.sess.scalar(
+            select(
+                func.bool_and(
+                    PurchaseOrderDetail.received_quantity >= PurchaseOrderDetail.quantity
+                )
+            ).where(PurchaseOrderDetail.purchase_order_id == order_id)
+        )
+
+        return ReceiptOut(
+            receipt_id=previous.id,
+            purchase_order_id=order_id,
+            source_document=receipt.source_document,
+            replayed=True,
+            completed=bool(completed),
+            lines=lines,
+        )
@@ -0,0 +1,10 @@
+from fastapi import APIRouter
+from .rates_router import rate_router
+
+
+rates_router = APIRouter()
+rates_router.include_router(rate_router)
+
+__all__ = [
+    "rates_router",
+]
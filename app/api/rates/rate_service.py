@@ -0,0 +1,223 @@
+import os
+from bisect import bisect_right
+from datetime import date
+
+import numpy as np
+from pydantic import BaseModel, Field, model_validator
+from sqlalchemy.ext.asyncio import AsyncSession
+from fastapi import status, HTTPException
+
+from app.models import Rate
+from app.lib.dimension_cache import DimensionTable, dimension_cache
+
+# Code of the currency the rates are quoted in, its rate is always 1. The
+# database reads it from the inventory.base_currency setting, keep both equal.
+RATE_BASE_CURRENCY = os.getenv("RATE_BASE_CURRENCY") or "BS"
+
+
+class RateIn(BaseModel):
+    currency_id: int
+    rate_date: date
+    rate_value: float = Field(gt=0)
+
+
+class RateOut(BaseModel):
+    id: int | None = None
+    currency_id: int
+    rate_date: date | None = None
+    rate_value: float
+
+
+class ConversionIn(BaseModel):
+    from_currency_id: int
+    to_currency_id: int
+    amounts: list[float]
+    # One date per amount, or ``as_of`` for all of them.
+    dates: list[date] | None = None
+    as_of: date | None = None
+
+    @model_validator(mode="after")
+    def _one_date_per_amount(self):
+        if self.dates is None and self.as_of is None:
+            raise ValueError("Either dates or as_of is required")
+        if self.dates is not None and len(self.dates) != len(self.amounts):
+            raise ValueError("dates and amounts must have the same length")
+        return self
+
+
+class ConversionOut(BaseModel):
+    # None where one of the currencies had no usable rate at that date.
+    amounts: list[float | None]
+    rates: list[float | None]
+
+
+class CurrencyRates:
+    """Rates of one currency sorted by date, the last one entered for each day."""
+
+    __slots__ = ("ids", "dates", "days", "values")
+
+    def __init__(self, rows: list[tuple]):
+        by_day: dict[date, tuple] = {}
+        for row in sorted(rows, key=lambda row: (row.rate_date, row.id)):
+            by_day[row.rate_date] = row
+
+        self.dates = list(by_day)
+        self.ids = [row.id for row in by_day.values()]
+        self.days = np.array(self.dates, dtype="datetime64[D]")
+        self.values = np.array(
+            [row.rate_value for row in by_day.values()], dtype=np.float64
+        )
+
+    def position(self, day: date) -> int:
+        """Index of the rate in force on ``day``, -1 before the first one."""
+        return bisect_right(self.dates, day) - 1
+
+    def at(self, days: np.ndarray) -> np.ndarray:
+        """Rate in force on each of ``days``, NaN before the first one."""
+        positions = np.searchsorted(self.days, days, side="right") - 1
+        rates = self.values[np.maximum(positions, 0)]
+        return np.where(positions >= 0, rates, np.nan)
+
+
+class RateIndex:
+    """As-of lookups over every rate, grouped by currency.
+
+    Single lookups bisect the sorted dates of the currency; whole columns of
+    dates are resolved at once with ``searchsorted`` and converted with array
+    arithmetic.
+    """
+
+    def __init__(self, table: DimensionTable, base_currency_id: int | None):
+        self.base_currency_id = base_currency_id
+        rows: dict[int, list[tuple]] = {}
+        for row in table.rows.values():
+            # Rows seeded with the column default 0 are not rates yet, the
+            # previous one stays in force.
+            if row.currency_id is not None and row.rate_value and row.rate_value > 0:
+                rows.setdefault(row.currency_id, []).append(row)
+        self.currencies = {
+            currency_id: CurrencyRates(items) for currency_id, items in rows.items()
+        }
+
+    def as_of(self, currency_id: int, day: date) -> RateOut | None:
+        if currency_id == self.base_currency_id:
+            return RateOut(currency_id=currency_id, rate_value=1.0)
+
+        rates = self.currencies.get(currency_id)
+        if rates is None:
+            return None
+        position = rates.position(day)
+        if position < 0:
+            return None
+
+        return RateOut(
+            id=rates.ids[position],
+            currency_id=currency_id,
+            rate_date=rates.dates[position],
+            rate_value=float(rates.values[position]),
+        )
+
+    def rates(self, currency_id: int, days: np.ndarray) -> np.ndarray:
+        """Value of one unit of ``currency_id`` in the base currency on each day."""
+        if currency_id == self.base_currency_id:
+            return np.ones(len(days))
+
+        rates = self.currencies.get(currency_id)
+        if rates is None:
+            return np.full(len(days), np.nan)
+        return rates.at(days)
+
+    def convert(
+        self,
+        amounts: np.ndarray,
+        days: np.ndarray,
+        from_currency_id: int,
+        to_currency_id: int,
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """``amounts`` converted on ``days``, with the rate applied to each."""
+        rates = self.rates(from_currency_id, days) / self.rates(to_currency_id, days)
+        return amounts * rates, rates
+
+
+class _IndexCache:
+    """Index of the rate table currently held by the dimension cache."""
+
+    def __init__(self):
+        self.tables: tuple | None = None
+        self.index = RateIndex(DimensionTable({}, {}, None, 0.0), None)
+
+    def get(self) -> RateIndex:
+        tables = (dimension_cache.table("rate"), dimension_cache.table("currency"))
+        if self.tables is None or any(
+            new is not old for new, old in zip(tables, self.tables)
+        ):
+            self.index = RateIndex(
+                tables[0], dimension_cache.id_for("currency", RATE_BASE_CURRENCY)
+            )
+            self.tables = tables
+        return self.index
+
+
+_index_cache = _IndexCache()
+
+
+async def rate_index() -> RateIndex:
+    await dimension_cache.ensure_loaded()
+    return _index_cache.get()
+
+
+def _nullable(values: np.ndarray, decimals: int | None = None) -> list[float | None]:
+    if decimals is not None:
+        values = np.round(values, decimals)
+    return [value if np.isfinite(value) else None for value in values.tolist()]
+
+
+class RateService:
+
+    def __init__(self, sess: AsyncSession):
+        self.sess = sess
+
+    async def add_rate(self, rate: RateIn) -> RateOut:
+        """Store a rate, every worker reloads its index once committed."""
+        row = Rate(**rate.model_dump())
+        self.sess.add(row)
+        try:
+            await self.sess.flush()
+            # Read before the commit expires the instance.
+            created = RateOut(id=row.id, **rate.model_dump())
+            await self.sess.commit()
+        except Exception:
+            await self.sess.rollback()
+            raise
+
+        # The other workers are told through the dimension cache, this one
+        # reloads now so the rate can be read back right away.
+        await dimension_cache.refresh(["rate"])
+        return created
+
+    @staticmethod
+    async def as_of(currency_id: int, day: date) -> RateOut:
+        rate = (await rate_index()).as_of(currency_id, day)
+        if rate is None:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="No rate for the currency at that date",
+            )
+        return rate
+
+    @staticmethod
+    async def convert(conversion: ConversionIn) -> ConversionOut:
+        index = await rate_index()
+        days = (
+            np.array(conversion.dates, dtype="datetime64[D]")
+            if conversion.dates is not None
+            else np.full(len(conversion.amounts), conversion.as_of, dtype="datetime64[D]")
+        )
+        amounts, rates = index.convert(
+            np.array(conversion.amounts, dtype=np.float64),
+            days,
+            conversion.from_currency_id,
+            conversion.to_currency_id,
+        )
+
+        return ConversionOut(amounts=_nullable(amounts, 2), rates=_nullable(rates))
@@ -0,0 +1,41 @@
+from datetime import date
+from fastapi import APIRouter
+from app.dependencies import CurrentUser, DBSessionDep
+from app.api.rates.rate_service import (
+    ConversionIn,
+    ConversionOut,
+    RateIn,
+    RateOut,
+    RateService,
+)
+
+rate_router = APIRouter(prefix="/rates", tags=["Rates"])
+
+
+@rate_router.post("", response_model=RateOut)
+async def add_rate(_: CurrentUser, sess: DBSessionDep, rate: RateIn):
+    """
+    Register the rate of a currency for a day
+    """
+
+    service = RateService(sess)
+    return await service.add_rate(rate)
+
+
+@rate_router.get("/as-of", response_model=RateOut)
+async def rate_as_of(_: CurrentUser, currency_id: int, as_of: date):
+    """
+    Rate of a currency in force at a date
+    """
+
+    return await RateService.as_of(currency_id, as_of)
+
+
+@rate_router.post("/convert", response_model=ConversionOut)
+async def convert_amounts(_: CurrentUser, conversion: ConversionIn):
+    """
+    Convert a column of amounts between currencies at the rate in force on
+    each date, for reports and exports
+    """
+
+    return await RateService.convert(conversion)
@@ -0,0 +1,10 @@
+from fastapi import APIRouter
+from .shrinkage_router import shrinkage_router
+
+
+inventory_shrinkage_router = APIRouter()
+inventory_shrinkage_router.include_router(shrinkage_router)
+
+__all__ = [
+    "inventory_shrinkage_router",
+]
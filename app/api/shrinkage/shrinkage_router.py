@@ -0,0 +1,53 @@
+from typing import Annotated
+from fastapi import APIRouter, Query
+from app.dependencies import CurrentUser, DBSessionDep
+from app.schemas import PaginatedPerPageResponse
+from app.api.shrinkage.shrinkage_service import (
+    RebuildIn,
+    ShrinkageDashboard,
+    ShrinkageDashboardIn,
+    ShrinkageLoss,
+    ShrinkageLossFilters,
+    ShrinkageService,
+)
+
+shrinkage_router = APIRouter(prefix="/shrinkage", tags=["Shrinkage"])
+
+
+@shrinkage_router.get("/dashboard", response_model=ShrinkageDashboard)
+async def dashboard(
+    _: CurrentUser,
+    sess: DBSessionDep,
+    query: Annotated[ShrinkageDashboardIn, Query()],
+):
+    """
+    Losses by month, reason, warehouse and product category, in the base
+    currency and in the currency of their rates, read from the monthly rollup
+    """
+
+    service = ShrinkageService(sess)
+    return await service.dashboard(query)
+
+
+@shrinkage_router.get("/losses", response_model=PaginatedPerPageResponse[ShrinkageLoss])
+async def losses(
+    _: CurrentUser,
+    sess: DBSessionDep,
+    filters: Annotated[ShrinkageLossFilters, Query()],
+):
+    """
+    Individual losses of one month behind a dashboard cut
+    """
+
+    service = ShrinkageService(sess)
+    return await service.losses(filters)
+
+
+@shrinkage_router.post("/rollup/rebuild")
+async def rebuild_rollup(_: CurrentUser, sess: DBSessionDep, months: RebuildIn):
+    """
+    Recompute the monthly rollup of a range of months from the losses
+    """
+
+    service = ShrinkageService(sess)
+    return {"rows": await service.rebuild(months)}
@@ -0,0 +1,332 @@
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Literal
+
+from pydantic import BaseModel, Field, computed_field, model_validator
+from sqlalchemy import and_, func, select, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models import (
+    InventoryMovement,
+    InventoryShrinkage,
+    InventoryShrinkageMonthly,
+    Product,
+    Rate,
+    Warehouse,
+)
+from app.schemas import PaginatedPerPageRequest, PaginatedPerPageResponse
+from app.lib.dimension_cache import dimension_cache
+from app.api.rates.rate_service import RATE_BASE_CURRENCY
+from app.api.categories.category_service import subtree_ids
+
+ShrinkageDimension = Literal["month", "reason", "warehouse", "category"]
+
+monthly = InventoryShrinkageMonthly
+DIMENSION_COLUMNS = {
+    "month": monthly.month,
+    "reason": monthly.shrinkage_reason_id,
+    "warehouse": monthly.warehouse_id,
+    "category": monthly.category_id,
+}
+
+REBUILD_MONTHS = text("SELECT reconstruir_resumen_mermas(:since, :until)")
+
+# Same date the rollup groups the losses by, and indexed as such.
+loss_day = func.coalesce(
+    InventoryShrinkage.loss_date, InventoryShrinkage.inventory_movement_date
+)
+
+
+def month_start(day: date) -> date:
+    return day.replace(day=1)
+
+
+def next_month(day: date) -> date:
+    return date(day.year + day.month // 12, day.month % 12 + 1, 1)
+
+
+class ShrinkageFilters(BaseModel):
+    # Any day of the first and last months included.
+    first_month: date | None = None
+    last_month: date | None = None
+    shrinkage_reason_id: int | None = None
+    warehouse_id: int | None = None
+    # The category and all of its subcategories.
+    category_id: int | None = None
+
+
+class ShrinkageDashboardIn(ShrinkageFilters):
+    group_by: list[ShrinkageDimension] = Field(["month"], max_length=4)
+
+
+class ShrinkageLossFilters(PaginatedPerPageRequest):
+    # Any day of the month drilled into.
+    month: date
+    shrinkage_reason_id: int | None = None
+    warehouse_id: int | None = None
+    category_id: int | None = None
+
+
+class RebuildIn(BaseModel):
+    first_month: date
+    last_month: date
+
+    @model_validator(mode="after")
+    def _ordered(self):
+        if month_start(self.last_month) < month_start(self.first_month):
+            raise ValueError("last_month is before first_month")
+        return self
+
+
+class ShrinkageAmount(BaseModel):
+    currency_id: int
+    amount: Decimal
+
+    @computed_field
+    @property
+    def currency(self) -> str | None:
+        row = dimension_cache.get("currency", self.currency_id)
+        return row.code if row is not None else None
+
+
+class ShrinkageCut(BaseModel):
+    month: date | None = None
+    shrinkage_reason_id: int | None = None
+    warehouse_id: int | None = None
+    warehouse: str | None = None
+    category_id: int | None = None
+    loss_count: int = 0
+    quantity_lost: int = 0
+    # In the base currency, each loss converted with its own rate.
+    base_amount: Decimal = Decimal(0)
+    # In the currency of the rates recorded with the losses.
+    amounts: list[ShrinkageAmount] = []
+    # Losses recorded without a price, left out of the amounts.
+    unpriced_count: int = 0
+
+    @computed_field
+    @property
+    def reason(self) -> str | None:
+        return dimension_cache.label("shrinkage_reasons", self.shrinkage_reason_id)
+
+    @computed_field
+    @property
+    def category(self) -> str | None:
+        return dimension_cache.label("category", self.category_id)
+
+    def add(self, row):
+        self.loss_count += int(row.loss_count)
+        self.quantity_lost += int(row.quantity_lost)
+        self.base_amount += row.base_amount
+        self.unpriced_count += int(row.unpriced_count)
+        for item in self.amounts:
+            if item.currency_id == row.currency_id:
+                item.amount += row.amount
+                return
+        self.amounts.append(ShrinkageAmount(currency_id=row.currency_id, amount=row.amount))
+
+
+class ShrinkageDashboard(BaseModel):
+    group_by: list[ShrinkageDimension]
+    base_currency: str
+    total: ShrinkageCut
+    cuts: list[ShrinkageCut]
+
+
+class ShrinkageLoss(BaseModel):
+    id: int
+    loss_date: datetime | None
+    shrinkage_reason_id: int
+    inventory_movement_id: int
+    warehouse_id: int
+    product_id: int
+    product_code: str
+    category_id: int
+    quantity_lost: int
+    price: Decimal | None
+    currency_id: int | None
+    rate_value: float
+    amount: Decimal | None
+    base_amount: Decimal | None
+    notes: str | None
+
+    @computed_field
+    @property
+    def reason(self) -> str | None:
+        return dimension_cache.label("shrinkage_reasons", self.shrinkage_reason_id)
+
+
+class ShrinkageService:
+
+    def __init__(self, sess: AsyncSession):
+        self.sess = sess
+
+    @staticmethod
+    def _conditions(filters, reason_column, category_column) -> list:
+        conditions = []
+        if filters.shrinkage_reason_id is not None:
+            conditions.append(reason_column == filters.shrinkage_reason_id)
+        if filters.category_id is not None:
+            conditions.append(category_column.in_(subtree_ids(filters.category_id)))
+        return conditions
+
+    async def dashboard(self, query: ShrinkageDashboardIn) -> ShrinkageDashboard:
+        """Losses per requested dimensions, summed from the monthly rollup."""
+        conditions = self._conditions(
+            query, monthly.shrinkage_reason_id, monthly.category_id
+        )
+        if query.warehouse_id is not None:
+            conditions.append(monthly.warehouse_id == query.warehouse_id)
+        if query.first_month is not None:
+            conditions.append(monthly.month >= month_start(query.first_month))
+        if query.last_month is not None:
+            conditions.append(monthly.month <= month_start(query.last_month))
+
+        group_by = list(dict.fromkeys(query.group_by))
+        dimensions = [DIMENSION_COLUMNS[name] for name in group_by]
+        result = await self.sess.execute(
+            select(
+                *dimensions,
+                monthly.currency_id,
+                func.sum(monthly.loss_count).label("loss_count"),
+                func.sum(monthly.quantity_lost).label("quantity_lost"),
+                func.sum(monthly.amount).label("amount"),
+                func.sum(monthly.base_amount).label("base_amount"),
+                func.sum(monthly.unpriced_count).label("unpriced_count"),
+            )
+            .where(*conditions)
+            .group_by(*dimensions, monthly.currency_id)
+            .having(func.sum(monthly.loss_count) != 0)
+            .order_by(*dimensions, monthly.currency_id)
+        )
+
+        total = ShrinkageCut()
+        cuts: dict[tuple, ShrinkageCut] = {}
+        for row in result:
+            key = tuple(getattr(row, column.key) for column in dimensions)
+            cut = cuts.get(key)
+            if cut is None:
+                cut = cuts[key] = ShrinkageCut(
+                    **{column.key: value for column, value in zip(dimensions, key)}
+                )
+            cut.add(row)
+            total.add(row)
+
+        if "warehouse" in group_by and cuts:
+            names = dict(
+                (
+                    await self.sess.execute(
+                        select(Warehouse.id, Warehouse.name).where(
+                            Warehouse.id.in_({cut.warehouse_id for cut in cuts.values()})
+                        )
+                    )
+                ).all()
+            )
+            for cut in cuts.values():
+                cut.warehouse = names.get(cut.warehouse_id)
+        await dimension_cache.ensure_loaded()
+
+        return ShrinkageDashboard(
+            group_by=group_by,
+            base_currency=RATE_BASE_CURRENCY,
+            total=total,
+            cuts=list(cuts.values()),
+        )
+
+    async def losses(
+        self, filters: ShrinkageLossFilters
+    ) -> PaginatedPerPageResponse[ShrinkageLoss]:
+        """Raw losses of one month behind a dashboard cut, newest first."""
+        since = month_start(filters.month)
+        conditions = self._conditions(
+            filters, InventoryShrinkage.shrinkage_reason_id, Product.category_id
+        )
+        conditions += [loss_day >= since, loss_day < next_month(since)]
+
+        # Losses may be dated apart from their movements: the movements are
+        # read within the dates of the month's losses, so Postgres only scans
+        # the partitions holding them.
+        first, last = (
+            await self.sess.execute(
+                select(
+                    func.min(InventoryShrinkage.inventory_movement_date),
+                    func.max(InventoryShrinkage.inventory_movement_date),
+                ).where(loss_day >= since, loss_day < next_month(since))
+            )
+        ).one()
+        if first is None:
+            return PaginatedPerPageResponse[ShrinkageLoss](total=0, page=[])
+
+        conditions.append(InventoryMovement.in_period(first, last, closed="both"))
+        if filters.warehouse_id is not None:
+            conditions.append(InventoryMovement.warehouse_id == filters.warehouse_id)
+
+        amount = InventoryShrinkage.quantity_lost * InventoryShrinkage.price
+        query = (
+            select(
+                InventoryShrinkage.id,
+                loss_day.label("loss_date"),
+                InventoryShrinkage.shrinkage_reason_id,
+                InventoryShrinkage.inventory_movement_id,
+                InventoryMovement.warehouse_id,
+                InventoryMovement.product_id,
+                Product.code.label("product_code"),
+                Product.category_id,
+                InventoryShrinkage.quantity_lost,
+                InventoryShrinkage.price,
+                Rate.currency_id,
+                Rate.rate_value,
+                amount.label("amount"),
+                (
+                    amount * func.tasa_moneda_base(Rate.currency_id, Rate.rate_value)
+                ).label("base_amount"),
+                InventoryShrinkage.notes,
+            )
+            .join(
+                InventoryMovement,
+                and_(
+                    InventoryMovement.id == InventoryShrinkage.inventory_movement_id,
+                    InventoryMovement.movement_date
+                    == InventoryShrinkage.inventory_movement_date,
+                ),
+            )
+            .join(Product, Product.id == InventoryMovement.product_id)
+            .join(Rate, Rate.id == InventoryShrinkage.rate_id)
+            .where(*conditions)
+        )
+
+        total = await self.sess.scalar(
+            select(func.count()).select_from(query.subquery())
+        )
+        result = await self.sess.execute(
+            query.order_by(loss_day.desc(), InventoryShrinkage.id.desc())
+            .limit(filters.per_page)
+            .offset((filters.page - 1) * filters.per_page)
+        )
+        await dimension_cache.ensure_loaded()
+
+        return PaginatedPerPageResponse[ShrinkageLoss](
+            total=total,
+            page=[ShrinkageLoss.model_validate(row._mapping) for row in result],
+            nextPage=(
+                filters.page + 1 if filters.page * filters.per_page < total else None
+            ),
+            prevPage=filters.page - 1 if filters.page > 1 else None,
+        )
+
+    async def rebuild(self, months: RebuildIn) -> int:
+        """Recompute the rollup of a range of months from the losses."""
+        try:
+            rows = await self.sess.scalar(
+                REBUILD_MONTHS,
+                {
+                    "since": month_start(months.first_month),
+                    "until": next_month(months.last_month),
+                },
+            )
+            await self.sess.commit()
+        except Exception:
+            await self.sess.rollback()
+            raise
+
+        return rows
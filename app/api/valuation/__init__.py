@@ -0,0 +1,10 @@
+from fastapi import APIRouter
+from .valuation_router import valuation_router
+
+
+inventory_valuation_router = APIRouter()
+inventory_valuation_router.include_router(valuation_router)
+
+__all__ = [
+    "inventory_valuation_router",
+]
@@ -0,0 +1,328 @@
+"""Vectorized FIFO and weighted-average valuation of movement sequences.
+
+Both methods are computed for every (warehouse, product) key at once with
+array operations, no Python loop runs per movement:
+
+* FIFO: the cost of the first ``x`` units that entered a key is a piecewise
+  linear function of ``x`` (its layers). The value of the stock after each
+  movement is the value of everything that entered minus that function at
+  the quantity that left so far, located with ``searchsorted``.
+* Weighted average: each movement maps the value of the stock before it to
+  the value after it with ``v -> a * v + b`` (an ENTRADA adds its cost, a
+  SALIDA keeps the fraction of stock left). The value after every movement
+  is the running composition of those maps, a segmented prefix scan done in
+  ``log2(n)`` array passes.
+
+Quantities are handled in hundredths as integers so layer boundaries are
+exact, values are floats in the base currency.
+"""
+import numpy as np
+import pandas as pd
+
+KEY = ["warehouse_id", "product_id"]
+ORDER = KEY + ["movement_date", "movement_id"]
+
+ENTRY_COLUMNS = ORDER + [
+    "quantity",
+    "unit_cost",
+    "fifo_cost",
+    "average_cost",
+    "stock_quantity",
+    "fifo_value",
+    "average_value",
+]
+LAYER_COLUMNS = ORDER + ["unit_cost", "remaining_quantity"]
+
+
+def _hundredths(values) -> np.ndarray:
+    return np.rint(np.asarray(values, dtype=np.float64) * 100).astype(np.int64)
+
+
+def _key_codes(*frames: pd.DataFrame) -> pd.DataFrame:
+    keys = pd.concat([frame[KEY] for frame in frames], ignore_index=True)
+    keys = keys.drop_duplicates().sort_values(KEY, ignore_index=True)
+    keys["code"] = np.arange(len(keys), dtype=np.int64)
+    return keys
+
+
+def _with_codes(frame: pd.DataFrame, keys: pd.DataFrame) -> pd.DataFrame:
+    return frame.merge(keys, on=KEY, how="left", sort=False)
+
+
+def _group_starts(codes: np.ndarray) -> np.ndarray:
+    starts = np.ones(len(codes), dtype=bool)
+    starts[1:] = codes[1:] != codes[:-1]
+    return starts
+
+
+def _group_cumsum(values: np.ndarray, codes: np.ndarray) -> np.ndarray:
+    """Running sum of ``values`` restarted at each new code, codes sorted."""
+    total = np.cumsum(values)
+    if not len(total):
+        return total
+    start = np.maximum.accumulate(np.where(_group_starts(codes), np.arange(len(total)), 0))
+    return total - total[start] + np.asarray(values)[start]
+
+
+def affine_scan(
+    a: np.ndarray, b: np.ndarray, starts: np.ndarray
+) -> tuple[np.ndarray, np.ndarray]:
+    """Running composition of ``x -> a[i] * x + b[i]``, restarted at ``starts``.
+
+    Returns ``(A, B)`` with ``A[i] * x + B[i]`` equal to applying the maps
+    from the start of the segment of ``i`` up to ``i`` to ``x``.
+    """
+    a, b, flags = a.copy(), b.copy(), starts.copy()
+    step = 1
+    while step < len(a):
+        prev_a, prev_b, prev_flags = a[:-step].copy(), b[:-step].copy(), flags[:-step].copy()
+        join = ~flags[step:]
+        new_a = np.where(join, a[step:] * prev_a, a[step:])
+        new_b = np.where(join, a[step:] * prev_b + b[step:], b[step:])
+        a[step:], b[step:] = new_a, new_b
+        flags[step:] |= prev_flags
+        step *= 2
+    return a, b
+
+
+def _layer_value(
+    codes: np.ndarray,
+    taken: np.ndarray,
+    layer_codes: np.ndarray,
+    layer_end: np.ndarray,
+    layer_quantity: np.ndarray,
+    layer_cost: np.ndarray,
+    layer_total: np.ndarray,
+) -> np.ndarray:
+    """Cost of the first ``taken`` hundredths that entered each key.
+
+    Layers are sorted by key and entry order, ``layer_end`` is the running
+    quantity at the end of each layer and ``layer_total`` the running value.
+    ``taken`` must not exceed the quantity entered in the key.
+    """
+    value = np.zeros(len(codes))
+    if not len(layer_codes):
+        return value
+
+    stride = int(max(layer_end.max(initial=0), taken.max(initial=0))) + 1
+    position = np.searchsorted(layer_codes * stride + layer_end, codes * stride + taken)
+    inside = (taken > 0) & (position < len(layer_codes))
+    inside[inside] = layer_codes[position[inside]] == codes[inside]
+
+    layer = position[inside]
+    start = layer_end[layer] - layer_quantity[layer]
+    value[inside] = (
+        layer_total[layer]
+        - layer_quantity[layer] * layer_cost[layer] / 100
+        + (taken[inside] - start) * layer_cost[layer] / 100
+    )
+    return value
+
+
+def empty_layers() -> pd.DataFrame:
+    return pd.DataFrame({column: [] for column in LAYER_COLUMNS})
+
+
+def empty_balances() -> pd.DataFrame:
+    return pd.DataFrame(
+        {column: [] for column in KEY + ["stock_quantity", "average_value", "unit_cost"]}
+    )
+
+
+def value_movements(
+    movements: pd.DataFrame,
+    layers: pd.DataFrame | None = None,
+    balances: pd.DataFrame | None = None,
+) -> tuple[pd.DataFrame, pd.DataFrame]:
+    """Value ``movements`` after the opening ``layers`` and ``balances``.
+
+    ``movements`` has the ``ORDER`` columns, a signed ``quantity`` and the
+    ``unit_cost`` of the ENTRADA rows (NaN when unknown, they take the cost
+    of the previous layer of the key). ``layers`` are the open FIFO layers
+    and ``balances`` the stock, average value and last unit cost of each key
+    before the first movement. Returns the entries, one per movement, and
+    the FIFO layers left open.
+    """
+    layers = empty_layers() if layers is None else layers
+    balances = empty_balances() if balances is None else balances
+
+    keys = _key_codes(movements, layers, balances)
+    moves = _with_codes(movements, keys).sort_values(ORDER, ignore_index=True)
+    opening = _with_codes(layers, keys).sort_values(ORDER, ignore_index=True)
+    balances = _with_codes(balances, keys).set_index("code")
+
+    codes = moves["code"].to_numpy()
+    quantity = _hundredths(moves["quantity"])
+    inflow = quantity > 0
+
+    # FIFO layers of every key: the open ones, then each ENTRADA in order.
+    # Unknown costs follow the previous layer, then the last cost the key had
+    # before these movements.
+    rows = np.flatnonzero(inflow)
+    layer_frame = pd.concat(
+        [
+            pd.DataFrame(
+                {
+                    "code": opening["code"].to_numpy(),
+                    "row": -1,
+                    "quantity": _hundredths(opening["remaining_quantity"]),
+                    "cost": opening["unit_cost"].to_numpy(dtype=np.float64),
+                    "movement_date": opening["movement_date"].to_numpy(),
+                    "movement_id": opening["movement_id"].to_numpy(),
+                }
+            ),
+            pd.DataFrame(
+                {
+                    "code": codes[rows],
+                    "row": rows,
+                    "quantity": quantity[rows],
+                    "cost": moves["unit_cost"].to_numpy(dtype=np.float64)[rows],
+                    "movement_date": moves["movement_date"].to_numpy()[rows],
+                    "movement_id": moves["movement_id"].to_numpy()[rows],
+                }
+            ),
+        ],
+        ignore_index=True,
+    )
+    layer_frame = layer_frame.sort_values("code", kind="stable", ignore_index=True)
+    layer_frame["cost"] = layer_frame.groupby("code")["cost"].ffill()
+    if len(balances):
+        layer_frame["cost"] = layer_frame["cost"].fillna(
+            layer_frame["code"].map(balances["unit_cost"].astype(np.float64))
+        )
+    layer_frame["cost"] = layer_frame["cost"].fillna(0.0)
+
+    layer_codes = layer_frame["code"].to_numpy()
+    layer_rows = layer_frame["row"].to_numpy()
+    layer_quantity = layer_frame["quantity"].to_numpy()
+    layer_cost = layer_frame["cost"].to_numpy()
+    layer_end = _group_cumsum(layer_quantity, layer_codes)
+    layer_total = _group_cumsum(layer_quantity * layer_cost / 100, layer_codes)
+
+    unit_cost = np.zeros(len(moves))
+    unit_cost[layer_rows[layer_rows >= 0]] = layer_cost[layer_rows >= 0]
+    priced = moves["unit_cost"].notna().to_numpy() | ~inflow
+
+    opening_stock = _hundredths(
+        balances["stock_quantity"].reindex(codes, fill_value=0).to_numpy(dtype=np.float64)
+    )
+
+    # FIFO value: everything that entered minus the cost of what left. A
+    # SALIDA never takes from layers entered after it: what exceeds the stock
+    # costs the last cost known, and stock that was already negative before
+    # these movements is taken from the first layers that enter.
+    out = np.where(inflow, 0, -quantity)
+    deficit = np.maximum(-opening_stock, 0)
+    taken_after = deficit + _group_cumsum(out, codes)
+    taken_before = taken_after - out
+
+    opening_layers = layer_rows < 0
+    opening_quantity = (
+        pd.Series(layer_quantity[opening_layers]).groupby(layer_codes[opening_layers]).sum()
+    )
+    opening_value = (
+        pd.Series(layer_quantity[opening_layers] * layer_cost[opening_layers] / 100)
+        .groupby(layer_codes[opening_layers])
+        .sum()
+    )
+    opening_cost = (
+        pd.Series(layer_cost[opening_layers]).groupby(layer_codes[opening_layers]).last()
+    )
+    if len(balances):
+        opening_cost = opening_cost.combine_first(balances["unit_cost"].astype(np.float64))
+    entered_quantity = opening_quantity.reindex(codes, fill_value=0).to_numpy() + _group_cumsum(
+        np.where(inflow, quantity, 0), codes
+    )
+    last_cost = (
+        pd.Series(np.where(inflow, unit_cost, np.nan))
+        .groupby(codes)
+        .ffill()
+        .fillna(pd.Series(opening_cost.reindex(codes).to_numpy()))
+        .fillna(0.0)
+        .to_numpy()
+    )
+    entered = opening_value.reindex(codes, fill_value=0.0).to_numpy() + _group_cumsum(
+        np.where(inflow, quantity * unit_cost / 100, 0.0), codes
+    )
+    layers_of = (layer_codes, layer_end, layer_quantity, layer_cost, layer_total)
+
+    def consumed(taken: np.ndarray) -> np.ndarray:
+        available = np.minimum(taken, entered_quantity)
+        return (
+            _layer_value(codes, available, *layers_of)
+            + (taken - available) * last_cost / 100
+        )
+
+    consumed_after = consumed(taken_after)
+    consumed_before = consumed(taken_before)
+    fifo_value = entered - consumed_after
+    fifo_cost = np.where(inflow, quantity * unit_cost / 100, consumed_before - consumed_after)
+
+    # Weighted average as a running composition of affine maps.
+    opening_average = (
+        balances["average_value"].reindex(codes, fill_value=0).to_numpy(dtype=np.float64)
+    )
+    stock_after = opening_stock + _group_cumsum(quantity, codes)
+    stock_before = stock_after - quantity
+    kept = np.divide(
+        stock_after,
+        stock_before,
+        out=np.zeros(len(moves)),
+        where=(stock_before > 0) & (stock_after > 0),
+    )
+    a = np.where(inflow, (stock_before > 0).astype(np.float64), kept)
+    b = np.where(
+        inflow,
+        np.where(stock_before > 0, quantity, np.maximum(stock_after, 0)) * unit_cost / 100,
+        0.0,
+    )
+    starts = _group_starts(codes)
+    scan_a, scan_b = affine_scan(a, b, starts)
+    average_value = scan_a * opening_average + scan_b
+    average_before = np.where(starts, opening_average, np.roll(average_value, 1))
+
+    entries = moves[ORDER].copy()
+    entries["quantity"] = quantity / 100
+    entries["unit_cost"] = np.where(
+        inflow,
+        unit_cost,
+        np.divide(fifo_cost, quantity / 100, out=np.zeros(len(moves)), where=quantity != 0),
+    )
+    entries["fifo_cost"] = fifo_cost
+    entries["average_cost"] = average_value - average_before
+    entries["stock_quantity"] = stock_after / 100
+    entries["fifo_value"] = fifo_value
+    entries["average_value"] = average_value
+    entries["priced"] = priced
+
+    # Layers still open once every SALIDA consumed the oldest ones first.
+    total_out = pd.Series(out + np.where(_group_starts(codes), deficit, 0)).groupby(codes).sum()
+    remaining = np.clip(
+        layer_end - total_out.reindex(layer_codes, fill_value=0).to_numpy(),
+        0,
+        layer_quantity,
+    )
+    closing = layer_frame.loc[remaining > 0, ["code", "movement_date", "movement_id", "cost"]]
+    closing = closing.merge(keys, on="code").rename(columns={"cost": "unit_cost"})
+    closing["remaining_quantity"] = remaining[remaining > 0] / 100
+    return entries[ENTRY_COLUMNS + ["priced"]], closing[LAYER_COLUMNS]
+
+
+def open_layers(entries: pd.DataFrame) -> pd.DataFrame:
+    """FIFO layers left open by a complete history of ledger entries."""
+    entries = entries.sort_values(ORDER, ignore_index=True)
+    keys = _key_codes(entries)
+    codes = _with_codes(entries[KEY], keys)["code"].to_numpy()
+    quantity = _hundredths(entries["quantity"])
+    inflow = quantity > 0
+
+    total_out = pd.Series(np.where(inflow, 0, -quantity)).groupby(codes).sum()
+    layer_end = _group_cumsum(quantity[inflow], codes[inflow])
+    remaining = np.clip(
+        layer_end - total_out.reindex(codes[inflow], fill_value=0).to_numpy(),
+        0,
+        quantity[inflow],
+    )
+    layers = entries.loc[inflow, ORDER + ["unit_cost"]].reset_index(drop=True)
+    layers["remaining_quantity"] = remaining / 100
+    return layers.loc[remaining > 0, LAYER_COLUMNS].reset_index(drop=True)
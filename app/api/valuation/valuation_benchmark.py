@@ -0,0 +1,108 @@
+"""Time of the vectorized valuation against a per-movement replay.
+
+Run with ``python -m app.api.valuation.valuation_benchmark [movements ...]``,
+no database is needed. For each size a random history is generated over
+``KEYS`` warehouse/product keys, valued with ``value_movements`` and with a
+plain loop keeping FIFO layers and the average cost per key, and the final
+balances of both are checked to agree.
+"""
+import sys
+import time
+from collections import deque
+
+import numpy as np
+import pandas as pd
+
+from app.api.valuation.cost_engine import KEY, value_movements
+
+SIZES = (10_000, 100_000, 1_000_000)
+KEYS = 2_000
+
+
+def _history(size: int, seed: int = 7) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    keys = rng.integers(0, KEYS, size)
+    quantity = rng.integers(1, 5000, size) / 100
+    inflow = rng.random(size) < 0.55
+    return pd.DataFrame(
+        {
+            "warehouse_id": keys % 5,
+            "product_id": keys,
+            "movement_date": pd.Timestamp("2000-01-01")
+            + pd.to_timedelta(np.arange(size), unit="s"),
+            "movement_id": np.arange(1, size + 1),
+            "quantity": np.where(inflow, quantity, -quantity),
+            "unit_cost": np.where(inflow, np.round(rng.uniform(1, 100, size), 4), np.nan),
+        }
+    )
+
+
+def _replay(history: pd.DataFrame) -> dict[tuple, tuple[float, float, float]]:
+    """Final stock, FIFO and average value per key, one movement at a time."""
+    state: dict[tuple, list] = {}
+    for row in history.itertuples(index=False):
+        key = (row.warehouse_id, row.product_id)
+        layers, stock, average, cost = state.setdefault(key, [deque(), 0.0, 0.0, 0.0])
+        if row.quantity > 0:
+            cost = row.unit_cost
+            if stock < 0:
+                left = row.quantity + stock
+                if left > 0:
+                    layers.append([left, cost])
+            else:
+                layers.append([row.quantity, cost])
+            if stock > 0:
+                average = average + row.quantity * cost
+            else:
+                average = max(stock + row.quantity, 0) * cost
+        else:
+            need = -row.quantity
+            while need > 1e-9 and layers:
+                take = min(need, layers[0][0])
+                layers[0][0] -= take
+                need -= take
+                if layers[0][0] <= 1e-9:
+                    layers.popleft()
+            after = stock + row.quantity
+            average = average * after / stock if stock > 0 and after > 0 else 0.0
+        stock += row.quantity
+        state[key] = [layers, stock, average, cost]
+
+    return {
+        key: (
+            stock,
+            sum(quantity * cost for quantity, cost in layers) + min(stock, 0) * cost,
+            average,
+        )
+        for key, (layers, stock, average, cost) in state.items()
+    }
+
+
+def main(sizes: tuple[int, ...]):
+    print(f"{'movements':>10} {'vectorized_ms':>14} {'loop_ms':>10} {'max_diff':>10}")
+    for size in sizes:
+        history = _history(size)
+
+        started = time.perf_counter()
+        entries, _ = value_movements(history)
+        vectorized = time.perf_counter() - started
+
+        started = time.perf_counter()
+        expected = _replay(history)
+        loop = time.perf_counter() - started
+
+        final = entries.groupby(KEY).last()
+        diff = max(
+            np.abs(
+                np.array(expected[key])
+                - final.loc[key, ["stock_quantity", "fifo_value", "average_value"]].to_numpy(
+                    dtype=np.float64
+                )
+            ).max()
+            for key in expected
+        )
+        print(f"{size:>10} {vectorized * 1000:>14.1f} {loop * 1000:>10.1f} {diff:>10.2e}")
+
+
+if __name__ == "__main__":
+    main(tuple(int(arg) for arg in sys.argv[1:]) or SIZES)
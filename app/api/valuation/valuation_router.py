@@ -0,0 +1,56 @@
+from datetime import datetime
+from fastapi import APIRouter
+from app.dependencies import CurrentUser, DBSessionDep
+from app.api.valuation.valuation_service import (
+    InventoryValuation,
+    RebuildResult,
+    ValuationRun,
+    ValuationService,
+    inventory_valuator,
+)
+
+valuation_router = APIRouter(prefix="/valuation", tags=["Valuation"])
+
+
+@valuation_router.get("/as-of", response_model=InventoryValuation)
+async def valuation_as_of(
+    _: CurrentUser,
+    sess: DBSessionDep,
+    as_of: datetime | None = None,
+    warehouse_id: int | None = None,
+    product_id: int | None = None,
+    currency_id: int | None = None,
+):
+    """
+    Inventory value by FIFO and weighted average at a date, now by default,
+    in the base currency or converted to ``currency_id``
+    """
+
+    service = ValuationService(sess)
+    return await service.as_of(as_of, warehouse_id, product_id, currency_id)
+
+
+@valuation_router.post("/apply", response_model=ValuationRun)
+async def apply_pending(_: CurrentUser):
+    """
+    Value the movements posted since the last run now
+    """
+
+    return await inventory_valuator.run_once()
+
+
+@valuation_router.post("/rebuild", response_model=RebuildResult)
+async def rebuild(
+    _: CurrentUser,
+    sess: DBSessionDep,
+    warehouse_id: int | None = None,
+    product_id: int | None = None,
+    apply: bool = False,
+):
+    """
+    Replay the movement history to audit the valuation ledger, replacing it
+    when ``apply`` is set
+    """
+
+    service = ValuationService(sess)
+    return await service.rebuild(warehouse_id, product_id, apply)
@@ -0,0 +1,701 @@
+import io
+import os
+import time
+import asyncio
+from decimal import Decimal
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+from pydantic import BaseModel
+from sqlalchemy import bindparam, func, select, text
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import aliased
+from fastapi import status, HTTPException
+
+from app.logger import logger
+from app.core import connection_manager
+from app.models import InventoryMovement
+from app.utils.database_time import to_session_time
+from app.api.rates.rate_service import RateIndex, rate_index
+from app.api.inventory.partition_service import (
+    InventoryPartitionService,
+    MovementPartition,
+)
+from app.api.valuation.cost_engine import (
+    ENTRY_COLUMNS,
+    KEY,
+    LAYER_COLUMNS,
+    ORDER,
+    open_layers,
+    value_movements,
+)
+
+# Seconds between runs valuing the pending movements, 0 disables the job.
+VALUATION_APPLY_INTERVAL = float(os.getenv("VALUATION_APPLY_INTERVAL") or 60)
+# Pending movements valued per transaction.
+VALUATION_BATCH_SIZE = int(os.getenv("VALUATION_BATCH_SIZE") or 50000)
+
+# Only one worker of the deployment writes the valuation at a time.
+VALUATION_LOCK_ID = 7_310_003
+
+# Movements with the cost of their ENTRADA in the base currency, from the
+# first source available: the purchase order lines of the receipt posted
+# under the same source_document, the loss being restocked, or the product
+# replacement cost, converted later with the rate of the movement day.
+# Order and loss rates go through tasa_moneda_base: 1 for the base currency,
+# none when not positive, leaving the next source to price the movement.
+MOVEMENT_COSTS = """
+    SELECT m.warehouse_id, m.product_id, m.movement_date, m.id AS movement_id,
+           CASE WHEN m.movement_type = 'ENTRADA' THEN m.quantity ELSE -m.quantity END AS quantity,
+           c.unit_cost AS receipt_cost,
+           s.unit_cost AS shrinkage_cost,
+           p.replacement_cost, p.currency_id
+    FROM inventory_movements m
+    {scope}
+    JOIN products p ON p.id = m.product_id
+    LEFT JOIN LATERAL (
+        SELECT SUM(d.unit_price * l.quantity) / SUM(l.quantity)
+               * CASE
+                   WHEN COUNT(r.id) = 0 THEN 1
+                   ELSE MAX(tasa_moneda_base(r.currency_id, r.rate_value))
+               END AS unit_cost
+        FROM purchase_order_receipts pr
+        JOIN purchase_orders o ON o.id = pr.purchase_order_id
+        LEFT JOIN rate r ON r.id = o.rate_id
+        JOIN purchase_order_receipt_lines l ON l.receipt_id = pr.id
+        JOIN purchase_order_details d
+          ON d.id = l.purchase_order_detail_id AND d.product_id = m.product_id
+        WHERE m.movement_type = 'ENTRADA' AND pr.source_document = m.source_document
+        HAVING SUM(l.quantity) > 0
+    ) c ON true
+    LEFT JOIN LATERAL (
+        SELECT x.price * tasa_moneda_base(r.currency_id, r.rate_value) AS unit_cost
+        FROM inventory_shrinkage x
+        JOIN rate r ON r.id = x.rate_id
+        WHERE m.movement_type = 'ENTRADA'
+          AND x.inventory_movement_id = m.id
+          AND x.inventory_movement_date = m.movement_date
+          AND x.price IS NOT NULL
+          AND tasa_moneda_base(r.currency_id, r.rate_value) IS NOT NULL
+        ORDER BY x.id DESC
+        LIMIT 1
+    ) s ON true
+"""
+
+# Movements are read within [:period_start, :period_end) so Postgres only
+# scans the partitions of that range.
+IN_PERIOD = str(
+    aliased(InventoryMovement, name="m")
+    .in_period(bindparam("period_start"), bindparam("period_end"))
+    .compile()
+)
+
+KEYS = """
+    unnest(CAST(:warehouse_ids AS integer[]), CAST(:product_ids AS integer[]),
+           CAST(:since AS timestamp[])) AS k(warehouse_id, product_id, since)
+"""
+
+CLAIMED_MOVEMENTS = text(
+    MOVEMENT_COSTS.format(
+        scope="""
+    JOIN unnest(CAST(:movement_ids AS integer[]), CAST(:movement_dates AS timestamp[]))
+         AS q(movement_id, movement_date)
+      ON m.id = q.movement_id AND m.movement_date = q.movement_date
+    """
+    )
+)
+
+MOVEMENTS_SINCE = text(
+    MOVEMENT_COSTS.format(
+        scope="""
+    JOIN {keys}
+      ON m.warehouse_id = k.warehouse_id AND m.product_id = k.product_id
+     AND m.movement_date >= k.since
+    """.format(keys=KEYS)
+    )
+    + f"""
+    WHERE {IN_PERIOD}
+    """
+)
+
+ALL_MOVEMENTS = text(
+    MOVEMENT_COSTS.format(scope="")
+    + """
+    WHERE (CAST(:warehouse_id AS integer) IS NULL OR m.warehouse_id = :warehouse_id)
+      AND (CAST(:product_id AS integer) IS NULL OR m.product_id = :product_id)
+      AND {period}
+    """.format(period=IN_PERIOD)
+)
+
+# Oldest pending movements, removed from the queue by the transaction that
+# values them.
+CLAIM_PENDING = text("""
+    DELETE FROM inventory_valuation_queue q
+    USING (
+        SELECT movement_date, movement_id
+        FROM inventory_valuation_queue
+        ORDER BY movement_date, movement_id
+        LIMIT :limit
+    ) c
+    WHERE q.movement_date = c.movement_date AND q.movement_id = c.movement_id
+    RETURNING q.warehouse_id, q.product_id, q.movement_date, q.movement_id
+""")
+
+CLAIM_KEYS = text("""
+    DELETE FROM inventory_valuation_queue
+    WHERE (CAST(:warehouse_id AS integer) IS NULL OR warehouse_id = :warehouse_id)
+      AND (CAST(:product_id AS integer) IS NULL OR product_id = :product_id)
+""")
+
+LAST_ENTRIES = text(
+    """
+    SELECT k.warehouse_id, k.product_id, e.movement_date,
+           e.stock_quantity, e.average_value, c.unit_cost
+    FROM {keys}
+    CROSS JOIN LATERAL (
+        SELECT e.movement_date, e.stock_quantity, e.average_value
+        FROM inventory_valuation_entries e
+        WHERE e.warehouse_id = k.warehouse_id AND e.product_id = k.product_id
+        ORDER BY e.movement_date DESC, e.movement_id DESC
+        LIMIT 1
+    ) e
+    LEFT JOIN LATERAL (
+        SELECT e.unit_cost
+        FROM inventory_valuation_entries e
+        WHERE e.warehouse_id = k.warehouse_id AND e.product_id = k.product_id
+          AND e.quantity > 0
+        ORDER BY e.movement_date DESC, e.movement_id DESC
+        LIMIT 1
+    ) c ON true
+    """.format(keys=KEYS)
+)
+
+OPEN_LAYERS = text(
+    """
+    SELECT l.warehouse_id, l.product_id, l.movement_date, l.movement_id,
+           l.unit_cost, l.remaining_quantity
+    FROM {keys}
+    JOIN inventory_cost_layers l
+      ON l.warehouse_id = k.warehouse_id AND l.product_id = k.product_id
+    """.format(keys=KEYS)
+)
+
+# Ledger of the keys before the date they are revalued from, to rebuild
+# their FIFO layers at that point.
+ENTRIES_BEFORE = text(
+    """
+    SELECT e.warehouse_id, e.product_id, e.movement_date, e.movement_id,
+           e.quantity, e.unit_cost, e.stock_quantity, e.average_value
+    FROM {keys}
+    JOIN inventory_valuation_entries e
+      ON e.warehouse_id = k.warehouse_id AND e.product_id = k.product_id
+     AND e.movement_date < k.since
+    """.format(keys=KEYS)
+)
+
+DELETE_ENTRIES_SINCE = text(
+    """
+    DELETE FROM inventory_valuation_entries e
+    USING {keys}
+    WHERE e.warehouse_id = k.warehouse_id AND e.product_id = k.product_id
+      AND e.movement_date >= k.since
+    """.format(keys=KEYS)
+)
+
+DELETE_LAYERS = text(
+    """
+    DELETE FROM inventory_cost_layers l
+    USING {keys}
+    WHERE l.warehouse_id = k.warehouse_id AND l.product_id = k.product_id
+    """.format(keys=KEYS)
+)
+
+# Latest entry of every stocked key at the date, one index probe each.
+VALUE_AS_OF = text("""
+    SELECT i.warehouse_id, i.product_id,
+           e.stock_quantity, e.fifo_value, e.average_value
+    FROM inventory i
+    CROSS JOIN LATERAL (
+        SELECT e.stock_quantity, e.fifo_value, e.average_value
+        FROM inventory_valuation_entries e
+        WHERE e.warehouse_id = i.warehouse_id AND e.product_id = i.product_id
+          AND e.movement_date <= :as_of
+        ORDER BY e.movement_date DESC, e.movement_id DESC
+        LIMIT 1
+    ) e
+    WHERE (CAST(:warehouse_id AS integer) IS NULL OR i.warehouse_id = :warehouse_id)
+      AND (CAST(:product_id AS integer) IS NULL OR i.product_id = :product_id)
+      AND (e.stock_quantity <> 0 OR e.fifo_value <> 0 OR e.average_value <> 0)
+    ORDER BY i.warehouse_id, i.product_id
+""")
+
+PENDING_AS_OF = text("""
+    SELECT count(*) FROM inventory_valuation_queue
+    WHERE movement_date <= :as_of
+      AND (CAST(:warehouse_id AS integer) IS NULL OR warehouse_id = :warehouse_id)
+      AND (CAST(:product_id AS integer) IS NULL OR product_id = :product_id)
+""")
+
+LATEST_ENTRIES = text("""
+    SELECT DISTINCT ON (warehouse_id, product_id)
+           warehouse_id, product_id, stock_quantity, fifo_value, average_value
+    FROM inventory_valuation_entries
+    WHERE (CAST(:warehouse_id AS integer) IS NULL OR warehouse_id = :warehouse_id)
+      AND (CAST(:product_id AS integer) IS NULL OR product_id = :product_id)
+    ORDER BY warehouse_id, product_id, movement_date DESC, movement_id DESC
+""")
+
+# Ledger of the months detached from inventory_movements, kept by rebuilds
+# as the opening state of the attached ones.
+ENTRIES_BEFORE_PERIOD = text("""
+    SELECT warehouse_id, product_id, movement_date, movement_id, quantity,
+           unit_cost, stock_quantity, fifo_value, average_value
+    FROM inventory_valuation_entries
+    WHERE movement_date < :period_start
+      AND (CAST(:warehouse_id AS integer) IS NULL OR warehouse_id = :warehouse_id)
+      AND (CAST(:product_id AS integer) IS NULL OR product_id = :product_id)
+""")
+
+DELETE_ENTRIES = text("""
+    DELETE FROM inventory_valuation_entries
+    WHERE movement_date >= :period_start
+      AND (CAST(:warehouse_id AS integer) IS NULL OR warehouse_id = :warehouse_id)
+      AND (CAST(:product_id AS integer) IS NULL OR product_id = :product_id)
+""")
+
+DELETE_ALL_LAYERS = text("""
+    DELETE FROM inventory_cost_layers
+    WHERE (CAST(:warehouse_id AS integer) IS NULL OR warehouse_id = :warehouse_id)
+      AND (CAST(:product_id AS integer) IS NULL OR product_id = :product_id)
+""")
+
+ENTRY_DECIMALS = {
+    "quantity": 2,
+    "unit_cost": 6,
+    "fifo_cost": 4,
+    "average_cost": 4,
+    "stock_quantity": 2,
+    "fifo_value": 4,
+    "average_value": 4,
+}
+LAYER_DECIMALS = {"unit_cost": 6, "remaining_quantity": 2}
+# Scale of the NUMERIC(18, 4) values of the ledger.
+VALUE_SCALE = Decimal("0.0001")
+
+
+class ValuationLine(BaseModel):
+    warehouse_id: int
+    product_id: int
+    stock_quantity: Decimal
+    fifo_value: Decimal
+    average_value: Decimal
+
+
+class InventoryValuation(BaseModel):
+    as_of: datetime
+    # None when the values are in the base currency.
+    currency_id: int | None = None
+    rate: float | None = None
+    # Movements up to as_of not valued yet, left out of the values.
+    pending: int
+    fifo_value: Decimal
+    average_value: Decimal
+    lines: list[ValuationLine]
+
+
+class ValuationRun(BaseModel):
+    applied: bool
+    movements: int = 0
+    keys: int = 0
+    # Keys revalued from an earlier date because a movement arrived late.
+    revalued_keys: int = 0
+    # ENTRADA movements without any cost source, valued at the previous cost.
+    unpriced: int = 0
+
+
+class RebuildResult(BaseModel):
+    movements: int
+    keys: int
+    unpriced: int
+    # Keys whose current balance in the ledger differs from the replay.
+    drifted_keys: int
+    max_drift: float
+    applied: bool
+    seconds: float
+
+
+def _frame(result) -> pd.DataFrame:
+    return pd.DataFrame(result.all(), columns=list(result.keys()))
+
+
+def _keys_params(keys: pd.DataFrame) -> dict:
+    return {
+        "warehouse_ids": keys["warehouse_id"].tolist(),
+        "product_ids": keys["product_id"].tolist(),
+        "since": keys["since"].dt.to_pydatetime().tolist(),
+    }
+
+
+def _numeric(frame: pd.DataFrame, columns: list[str]) -> pd.DataFrame:
+    for column in columns:
+        frame[column] = pd.to_numeric(frame[column], errors="coerce").astype(np.float64)
+    return frame
+
+
+def unit_costs(movements: pd.DataFrame, index: RateIndex) -> pd.DataFrame:
+    """Resolve the base currency cost of each ENTRADA, NaN when unknown."""
+    movements = _numeric(
+        movements, ["quantity", "receipt_cost", "shrinkage_cost", "replacement_cost"]
+    )
+    replacement = np.full(len(movements), np.nan)
+    days = movements["movement_date"].to_numpy(dtype="datetime64[D]")
+    groups = movements.groupby("currency_id", dropna=False).indices
+    for currency_id, rows in groups.items():
+        # Products without a currency are priced in the base currency.
+        currency_id = index.base_currency_id if pd.isna(currency_id) else int(currency_id)
+        replacement[rows] = movements["replacement_cost"].to_numpy()[rows] * index.rates(
+            currency_id, days[rows]
+        )
+
+    cost = movements["receipt_cost"].fillna(movements["shrinkage_cost"])
+    cost = cost.fillna(pd.Series(replacement, index=movements.index))
+    movements["unit_cost"] = cost.where(movements["quantity"] > 0)
+    return movements[ORDER + ["quantity", "unit_cost"]]
+
+
+class ValuationService:
+
+    def __init__(self, sess: AsyncSession):
+        self.sess = sess
+
+    async def _movements(self, statement, params: dict) -> pd.DataFrame:
+        movements = _frame(await self.sess.execute(statement, params))
+        return unit_costs(movements, await rate_index())
+
+    async def _copy(self, table: str, frame: pd.DataFrame, decimals: dict[str, int]):
+        if frame.empty:
+            return
+        buffer = io.BytesIO()
+        frame.round(decimals).to_csv(buffer, header=False, index=False)
+        buffer.seek(0)
+        connection = await self.sess.connection()
+        raw = await connection.get_raw_connection()
+        await raw.driver_connection.copy_to_table(
+            table, source=buffer, columns=list(frame.columns), format="csv"
+        )
+
+    async def _write(self, entries: pd.DataFrame, layers: pd.DataFrame):
+        await self._copy(
+            "inventory_valuation_entries", entries[ENTRY_COLUMNS], ENTRY_DECIMALS
+        )
+        await self._copy("inventory_cost_layers", layers[LAYER_COLUMNS], LAYER_DECIMALS)
+
+    async def apply_pending(self, limit: int = VALUATION_BATCH_SIZE) -> ValuationRun:
+        """Value the oldest pending movements and cache the layers they leave.
+
+        Keys continue from their open layers and last entry. A movement dated
+        before the last entry of its key revalues the key from that date on,
+        from the ledger entries before it.
+        """
+        try:
+            locked = await self.sess.scalar(
+                select(func.pg_try_advisory_xact_lock(VALUATION_LOCK_ID))
+            )
+            if not locked:
+                await self.sess.rollback()
+                return ValuationRun(applied=False)
+
+            claimed = _frame(await self.sess.execute(CLAIM_PENDING, {"limit": limit}))
+            if claimed.empty:
+                await self.sess.commit()
+                return ValuationRun(applied=True)
+
+            keys = claimed.groupby(KEY, as_index=False)["movement_date"].min()
+            keys = keys.rename(columns={"movement_date": "since"})
+            keys["since"] = pd.to_datetime(keys["since"])
+            last = _frame(await self.sess.execute(LAST_ENTRIES, _keys_params(keys)))
+            keys = keys.merge(
+                last[KEY + ["movement_date"]], on=KEY, how="left"
+            )
+            late = keys["movement_date"].notna() & (
+                pd.to_datetime(keys["movement_date"]) >= keys["since"]
+            )
+            current, revalued = keys[~late], keys[late]
+
+            # Keys moving forward start from their cached state.
+            on_time = claimed.merge(current[KEY], on=KEY)
+            movements = [
+                await self._movements(
+                    CLAIMED_MOVEMENTS,
+                    {
+                        "movement_ids": on_time["movement_id"].tolist(),
+                        "movement_dates": pd.to_datetime(on_time["movement_date"])
+                        .dt.to_pydatetime()
+                        .tolist(),
+                    },
+                )
+            ]
+            layers = [_frame(await self.sess.execute(OPEN_LAYERS, _keys_params(current)))]
+            balances = [last.merge(current[KEY], on=KEY)]
+
+            # Late keys start over from the ledger before the late movement.
+            if not revalued.empty:
+                params = _keys_params(revalued)
+                partitions = await self._partitions()
+                params["period_start"] = revalued["since"].min().to_pydatetime()
+                params["period_end"] = partitions[-1].end if partitions else datetime.max
+                movements.append(await self._movements(MOVEMENTS_SINCE, params))
+                history = _numeric(
+                    _frame(await self.sess.execute(ENTRIES_BEFORE, params)),
+                    ["quantity", "unit_cost", "stock_quantity", "average_value"],
+                )
+                layers.append(open_layers(history))
+                history = history.sort_values(ORDER)
+                history["unit_cost"] = history["unit_cost"].where(history["quantity"] > 0)
+                balances.append(history.groupby(KEY, as_index=False).last())
+                await self.sess.execute(DELETE_ENTRIES_SINCE, params)
+
+            movements = pd.concat(movements, ignore_index=True)
+            entries, closing = value_movements(
+                movements,
+                _numeric(pd.concat(layers, ignore_index=True), ["unit_cost", "remaining_quantity"]),
+                _numeric(
+                    pd.concat(balances, ignore_index=True),
+                    ["stock_quantity", "average_value", "unit_cost"],
+                ),
+            )
+            await self.sess.execute(DELETE_LAYERS, _keys_params(keys))
+            await self._write(entries, closing)
+            await self.sess.commit()
+        except Exception:
+            await self.sess.rollback()
+            raise
+
+        return ValuationRun(
+            applied=True,
+            movements=len(entries),
+            keys=len(keys),
+            revalued_keys=len(revalued),
+            unpriced=int((~entries["priced"]).sum()),
+        )
+
+    async def as_of(
+        self,
+        as_of: datetime | None = None,
+        warehouse_id: int | None = None,
+        product_id: int | None = None,
+        currency_id: int | None = None,
+    ) -> InventoryValuation:
+        """Stock value at ``as_of``, now by default, by FIFO and weighted
+        average, read from the latest ledger entry of each key."""
+        if as_of is None:
+            as_of = await self.sess.scalar(select(func.localtimestamp()))
+        else:
+            as_of = await to_session_time(self.sess, as_of)
+        params = {"as_of": as_of, "warehouse_id": warehouse_id, "product_id": product_id}
+        result = await self.sess.execute(VALUE_AS_OF, params)
+        lines = [ValuationLine.model_validate(row._mapping) for row in result]
+        pending = await self.sess.scalar(PENDING_AS_OF, params)
+
+        rate = None
+        if currency_id is not None:
+            index = await rate_index()
+            rate = float(index.rates(currency_id, np.array([as_of], dtype="datetime64[D]"))[0])
+            if np.isnan(rate):
+                raise HTTPException(
+                    status_code=status.HTTP_404_NOT_FOUND,
+                    detail="No rate for the currency at that date",
+                )
+            divisor = Decimal(repr(rate))
+            for line in lines:
+                line.fifo_value = (line.fifo_value / divisor).quantize(VALUE_SCALE)
+                line.average_value = (line.average_value / divisor).quantize(VALUE_SCALE)
+
+        return InventoryValuation(
+            as_of=as_of,
+            currency_id=currency_id,
+            rate=rate,
+            pending=pending,
+            fifo_value=sum((line.fifo_value for line in lines), Decimal(0)),
+            average_value=sum((line.average_value for line in lines), Decimal(0)),
+            lines=lines,
+        )
+
+    async def _partitions(self) -> list[MovementPartition]:
+        """Months attached to inventory_movements, oldest first."""
+        return sorted(
+            await InventoryPartitionService(self.sess).list_partitions(),
+            key=lambda partition: partition.start,
+        )
+
+    async def _replay_period(self) -> tuple[datetime, datetime]:
+        """Start and end of the months attached to inventory_movements.
+
+        Ledger entries before the start belong to detached months and are
+        kept. The attached months must follow each other: a month detached
+        between two attached ones cannot be replayed.
+        """
+        partitions = await self._partitions()
+        for previous, following in zip(partitions, partitions[1:]):
+            if previous.end != following.start:
+                raise HTTPException(
+                    status_code=status.HTTP_409_CONFLICT,
+                    detail=(
+                        f"Movements from {previous.end} to {following.start} are "
+                        "detached, the ledger cannot be replayed across them"
+                    ),
+                )
+
+        # Without partitions there is nothing to replay.
+        if not partitions:
+            return datetime.max, datetime.max
+        return partitions[0].start, partitions[-1].end
+
+    async def rebuild(
+        self,
+        warehouse_id: int | None = None,
+        product_id: int | None = None,
+        apply: bool = False,
+    ) -> RebuildResult:
+        """Replay the attached movement history at once and compare it with
+        the ledger, replacing the ledger when ``apply``.
+
+        Keys open the replay with their ledger entries of the months detached
+        from inventory_movements, which are kept as they are.
+        """
+        started = time.perf_counter()
+        params = {"warehouse_id": warehouse_id, "product_id": product_id}
+        try:
+            if apply:
+                await self.sess.execute(
+                    select(func.pg_advisory_xact_lock(VALUATION_LOCK_ID))
+                )
+                await self.sess.execute(CLAIM_KEYS, params)
+
+            params["period_start"], params["period_end"] = await self._replay_period()
+            history = _numeric(
+                _frame(await self.sess.execute(ENTRIES_BEFORE_PERIOD, params)),
+                ["quantity", "unit_cost", "stock_quantity", "fifo_value", "average_value"],
+            )
+            layers = _numeric(open_layers(history), ["unit_cost", "remaining_quantity"])
+            history = history.sort_values(ORDER)
+            history["unit_cost"] = history["unit_cost"].where(history["quantity"] > 0)
+            opening = history.groupby(KEY, as_index=False).last()
+
+            movements = await self._movements(ALL_MOVEMENTS, params)
+            entries, closing = value_movements(movements, layers, opening)
+
+            # Keys without attached movements keep their detached balance.
+            replayed = (
+                pd.concat([opening, entries], ignore_index=True)
+                .groupby(KEY, as_index=False)
+                .last()
+            )
+            ledger = _numeric(
+                _frame(await self.sess.execute(LATEST_ENTRIES, params)),
+                ["stock_quantity", "fifo_value", "average_value"],
+            )
+            compared = replayed.merge(ledger, on=KEY, how="outer", suffixes=("", "_ledger"))
+            drift = np.nan_to_num(
+                np.abs(
+                    compared[["stock_quantity", "fifo_value", "average_value"]].to_numpy()
+                    - compared[
+                        ["stock_quantity_ledger", "fifo_value_ledger", "average_value_ledger"]
+                    ].to_numpy()
+                ),
+                nan=np.inf,
+            ).max(axis=1, initial=0)
+
+            if apply:
+                await self.sess.execute(DELETE_ENTRIES, params)
+                await self.sess.execute(DELETE_ALL_LAYERS, params)
+                await self._write(entries, closing)
+                await self.sess.commit()
+            else:
+                await self.sess.rollback()
+        except Exception:
+            await self.sess.rollback()
+            raise
+
+        finite = drift[np.isfinite(drift)]
+        return RebuildResult(
+            movements=len(entries),
+            keys=len(replayed),
+            unpriced=int((~entries["priced"]).sum()),
+            drifted_keys=int((drift > 0.01).sum()),
+            max_drift=float(finite.max(initial=0)),
+            applied=apply,
+            seconds=round(time.perf_counter() - started, 3),
+        )
+
+
+class InventoryValuator:
+    """Background job valuing the queued movements every ``interval`` seconds."""
+
+    def __init__(self, interval: float = VALUATION_APPLY_INTERVAL):
+        self.interval = interval
+        self._task: asyncio.Task | None = None
+        self.last_run: ValuationRun | None = None
+        self.last_duration = 0.0
+
+    async def run_once(self, batch_size: int = VALUATION_BATCH_SIZE) -> ValuationRun:
+        """Value batches until the queue is drained."""
+        started = time.perf_counter()
+        total = ValuationRun(applied=False)
+        while True:
+            async with connection_manager.get_context_session() as sess:
+                run = await ValuationService(sess).apply_pending(batch_size)
+            if not run.applied:
+                break
+            total.applied = True
+            total.movements += run.movements
+            total.keys += run.keys
+            total.revalued_keys += run.revalued_keys
+            total.unpriced += run.unpriced
+            if run.movements < batch_size:
+                break
+
+        if total.applied:
+            self.last_run = total
+            self.last_duration = time.perf_counter() - started
+            if total.unpriced:
+                logger.warning(
+                    f"{total.unpriced} inventory entries had no cost, "
+                    "valued at the previous cost of their product"
+                )
+
+        return total
+
+    async def _run_periodically(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.run_once()
+            except Exception as ex:  # pylint: disable=broad-exception-caught
+                logger.error(ex)
+
+    async def start(self):
+        if self.interval > 0:
+            self._task = asyncio.create_task(self._run_periodically())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def stats(self) -> dict:
+        return {
+            "interval": self.interval,
+            "last_movements": self.last_run.movements if self.last_run else None,
+            "last_revalued_keys": self.last_run.revalued_keys if self.last_run else None,
+            "last_unpriced": self.last_run.unpriced if self.last_run else None,
+            "last_duration_ms": round(self.last_duration * 1000, 3),
+        }
+
+
+inventory_valuator = InventoryValuator()
@@ -1,4 +1,6 @@
+from ._admission import admission_controller
+from ._connection import connection_manager
 from ._connection import get_context_session as with_session
 from ._connection import get_session as session
 
-__all__ = ["session", "with_session"]
+__all__ = ["admission_controller", "connection_manager", "session", "with_session"]
@@ -0,0 +1,110 @@
+# coding: utf-8
+import os
+import asyncio
+import contextlib
+
+from typing import AsyncIterator
+
+from fastapi import HTTPException, status
+
+from ._connection import connection_manager, get_pool_sizing
+
+_pool_size, _max_overflow = get_pool_sizing()
+
+# By default admit exactly as many requests as the pool can serve so that
+# nobody waits inside SQLAlchemy's queue until pool_timeout.
+DB_ADMISSION_LIMIT = int(os.getenv("DB_ADMISSION_LIMIT") or _pool_size + _max_overflow)
+DB_ADMISSION_QUEUE = int(os.getenv("DB_ADMISSION_QUEUE") or DB_ADMISSION_LIMIT * 2)
+DB_ADMISSION_TIMEOUT = float(os.getenv("DB_ADMISSION_TIMEOUT") or 5)
+DB_RETRY_AFTER = int(os.getenv("DB_RETRY_AFTER") or 1)
+
+
+class AdmissionController:
+    """Bounds the number of concurrent DB-bound requests of a worker.
+
+    Up to ``limit`` requests run at once, up to ``max_queue`` more wait for a
+    slot at most ``timeout`` seconds, everything else is shed with a 503.
+    """
+
+    def __init__(
+        self,
+        limit: int = DB_ADMISSION_LIMIT,
+        max_queue: int = DB_ADMISSION_QUEUE,
+        timeout: float = DB_ADMISSION_TIMEOUT,
+        retry_after: int = DB_RETRY_AFTER,
+    ):
+        self.limit = limit
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self.retry_after = retry_after
+        self._semaphore = asyncio.Semaphore(limit)
+
+        self.active = 0
+        self.waiting = 0
+        self.admitted = 0
+        self.shed_queue_full = 0
+        self.shed_timeout = 0
+
+    def _reject(self) -> HTTPException:
+        return HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Service is busy, please retry",
+            headers={"Retry-After": str(self.retry_after)},
+        )
+
+    @contextlib.asynccontextmanager
+    async def admit(self) -> AsyncIterator[None]:
+        acquired = False
+        try:
+            if not self._semaphore.locked():
+                # A free slot is taken without suspending.
+                await self._semaphore.acquire()
+                acquired = True
+
+            elif self.waiting >= self.max_queue:
+                self.shed_queue_full += 1
+                raise self._reject()
+
+            else:
+                self.waiting += 1
+                try:
+                    async with asyncio.timeout(self.timeout):
+                        await self._semaphore.acquire()
+                        acquired = True
+                except TimeoutError as ex:
+                    self.shed_timeout += 1
+                    raise self._reject() from ex
+                finally:
+                    self.waiting -= 1
+
+            self.active += 1
+            self.admitted += 1
+            try:
+                yield
+            finally:
+                self.active -= 1
+        finally:
+            # Also when cancelled right after the permit was granted.
+            if acquired:
+                self._semaphore.release()
+
+    def stats(self) -> dict:
+        return {
+            "limit": self.limit,
+            "max_queue": self.max_queue,
+            "active": self.active,
+            "queue_depth": self.waiting,
+            "admitted": self.admitted,
+            "shed": self.shed_queue_full + self.shed_timeout,
+            "shed_queue_full": self.shed_queue_full,
+            "shed_timeout": self.shed_timeout,
+        }
+
+
+admission_controller = AdmissionController()
+
+
+async def get_admitted_context_session():
+    async with admission_controller.admit():
+        async with connection_manager.get_context_session() as session:
+            yield session
@@ -1,9 +1,12 @@
 # coding: utf-8
 import os
+import time
 import contextlib
 
 from typing import AsyncIterator
 
+from sqlalchemy import exc
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 from sqlalchemy.ext.asyncio import (
     AsyncSession,
     async_sessionmaker,
@@ -18,6 +21,80 @@ db_port = os.getenv("DB_PORT")
 db_name = os.getenv("DB_NAME")
 database_url = os.getenv("DATABASE_URL")
 
+WORKERS = int(os.getenv("WORKERS") or 1)
+# max_connections configured on the Postgres server and the slots kept free
+# for superuser access, migrations, cron jobs and other services.
+DB_MAX_CONNECTIONS = int(os.getenv("DB_MAX_CONNECTIONS") or 100)
+DB_RESERVED_CONNECTIONS = int(os.getenv("DB_RESERVED_CONNECTIONS") or 10)
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT") or 30)
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE") or 1800)
+
+
+def get_pool_sizing(
+    workers: int = WORKERS,
+    max_connections: int = DB_MAX_CONNECTIONS,
+    reserved: int = DB_RESERVED_CONNECTIONS,
+) -> tuple[int, int]:
+    """Split the Postgres connection budget between the uvicorn workers.
+
+    Returns ``(pool_size, max_overflow)`` for a single worker. ``DB_POOL_SIZE``
+    and ``DB_MAX_OVERFLOW`` override the computed values.
+    """
+    budget = max((max_connections - reserved) // max(workers, 1), 2)
+    pool_size = max(budget * 4 // 5, 1)
+    max_overflow = budget - pool_size
+
+    pool_size = int(os.getenv("DB_POOL_SIZE") or pool_size)
+    max_overflow = int(os.getenv("DB_MAX_OVERFLOW") or max_overflow)
+
+    return pool_size, max_overflow
+
+
+class MonitoredQueuePool(AsyncAdaptedQueuePool):
+    """``AsyncAdaptedQueuePool`` that records how long checkouts wait."""
+
+    checkouts = 0
+    timeouts = 0
+    wait_total = 0.0
+    wait_max = 0.0
+
+    def connect(self):
+        start = time.perf_counter()
+        try:
+            return super().connect()
+        except exc.TimeoutError:
+            self.timeouts += 1
+            raise
+        finally:
+            waited = time.perf_counter() - start
+            self.checkouts += 1
+            self.wait_total += waited
+            self.wait_max = max(self.wait_max, waited)
+
+    def stats(self) -> dict:
+        return {
+            "pool_size": self.size(),
+            "checked_in": self.checkedin(),
+            "checked_out": self.checkedout(),
+            "overflow": max(self.overflow(), 0),
+            "max_overflow": self._max_overflow,
+            "checkouts": self.checkouts,
+            "timeouts": self.timeouts,
+            "wait_avg_ms": (
+                round(self.wait_total / self.checkouts * 1000, 3)
+                if self.checkouts
+                else 0.0
+            ),
+            "wait_max_ms": round(self.wait_max * 1000, 3),
+        }
+
+
+def get_database_url() -> str:
+    # pylint: disable=consider-using-f-string
+    return "postgresql+asyncpg://{}:{}@{}:{}/{}".format(
+        db_user, db_password, db_host, db_port, db_name
+    )
+
 
 class ConnectionManager:
 
@@ -25,41 +102,70 @@ class ConnectionManager:
         self.engines: dict[str, AsyncEngine] = {}
         self._sessionmaker = async_sessionmaker(autoflush=False)
 
-    async def _create_engine(self) -> AsyncEngine:
-
-        # pylint: disable=consider-using-f-string
-        connection_string = "postgresql+asyncpg://{}:{}@{}:{}/{}".format(
-            db_user, db_password, db_host, db_port, db_name
-        )
-        # connection_string = database_url
+    def _create_engine(self, dsn: str) -> AsyncEngine:
+        pool_size, max_overflow = get_pool_sizing()
 
         return create_async_engine(
-            connection_string,
-            pool_recycle=10,
-            pool_size=60,
-            max_overflow=10,
+            dsn,
+            poolclass=MonitoredQueuePool,
+            pool_size=pool_size,
+            max_overflow=max_overflow,
+            pool_timeout=DB_POOL_TIMEOUT,
+            pool_recycle=DB_POOL_RECYCLE,
             pool_use_lifo=True,
             pool_reset_on_return=True,
         )
 
-    async def _get_connection(self):
-        connection = await self._create_engine()
-
-        if connection is None:
-            # pylint: disable=broad-exception-raised
-            raise Exception("Can not get connectiong wiht Database")
-
-        return connection
+    def get_engine(self, dsn: str | None = None) -> AsyncEngine:
+        """Return the process-wide engine for ``dsn``, creating it once."""
+        dsn = dsn or get_database_url()
+
+        engine = self.engines.get(dsn)
+        if engine is None:
+            engine = self._create_engine(dsn)
+            self.engines[dsn] = engine
+
+        return engine
+
+    async def init(self, dsn: str | None = None):
+        """Create the default engine, called from the application lifespan."""
+        self.get_engine(dsn)
+
+    async def close(self):
+        """Dispose every registered engine and its pooled connections."""
+        engines = list(self.engines.values())
+        self.engines.clear()
+
+        for engine in engines:
+            await engine.dispose()
+
+    def pool_stats(self) -> list[dict]:
+        stats = []
+        for engine in self.engines.values():
+            pool = engine.pool
+            stats.append(
+                {
+                    "database": engine.url.render_as_string(hide_password=True),
+                    **(
+                        pool.stats()
+                        if isinstance(pool, MonitoredQueuePool)
+                        else {"status": pool.status()}
+                    ),
+                }
+            )
+
+        return stats
 
     @contextlib.asynccontextmanager
-    async def get_context_session(self) -> AsyncIterator[AsyncSession]:
+    async def get_context_session(
+        self, dsn: str | None = None
+    ) -> AsyncIterator[AsyncSession]:
 
         if self._sessionmaker is None:
             # pylint: disable=broad-exception-raised
             raise Exception("DatabaseSessionManager is not initialized")
 
-        connection = await self._create_engine()
-        session = self._sessionmaker(bind=connection, autocommit=False)
+        session = self._sessionmaker(bind=self.get_engine(dsn), autocommit=False)
 
         try:
             yield session
@@ -69,14 +175,13 @@ class ConnectionManager:
         finally:
             await session.close()
 
-    async def get_session(self) -> AsyncSession:
+    async def get_session(self, dsn: str | None = None) -> AsyncSession:
 
         if self._sessionmaker is None:
             # pylint: disable=broad-exception-raised
             raise Exception("DatabaseSessionManager is not initialized")
 
-        connection = await self._get_connection()
-        session = self._sessionmaker(bind=connection, autocommit=False)
+        session = self._sessionmaker(bind=self.get_engine(dsn), autocommit=False)
 
         return session
 
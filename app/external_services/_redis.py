@@ -1,20 +1,35 @@
 import os
 import json
+import time
+import bisect
+import itertools
 import contextlib
-from typing import AsyncIterator
+from typing import Any, AsyncIterator, Awaitable, Callable, Iterable
 import redis.asyncio as redis
 
 from app.logger import logger
 
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
+
 redis_host = os.getenv("REDIS_HOST")
+REDIS_HEALTH_CHECK_INTERVAL = int(os.getenv("REDIS_HEALTH_CHECK_INTERVAL") or 30)
+REDIS_SCAN_COUNT = int(os.getenv("REDIS_SCAN_COUNT") or 1000)
+REDIS_UNLINK_BATCH = 500
 
 
 class RedisConnection():
 
     def __init__(self):
+        # Idle connections are PINGed by the pool itself before being reused
+        # after health_check_interval seconds, not before every command.
         self.pool = redis.ConnectionPool.from_url(
             f'redis://:{os.getenv("REDIS_PASSWORD")}@{redis_host}:{os.getenv("REDIS_PORT")}/1',
-            encoding="utf8", decode_responses=True
+            encoding="utf8", decode_responses=True,
+            health_check_interval=REDIS_HEALTH_CHECK_INTERVAL,
+            socket_keepalive=True,
         )
 
     @contextlib.asynccontextmanager
@@ -48,62 +63,289 @@ async def get_redis_client():
     return await redis_connection.get_session()
 
 
+# Values are stored as "<version>:<payload>". Plain JSON written before the
+# envelope existed never starts with a letter, so it is still readable.
+ENVELOPE_VERSION = "v1"
+_ENVELOPE_PREFIX = f"{ENVELOPE_VERSION}:"
+
+
+def dumps(value: Any) -> str:
+    if orjson is not None:
+        payload = orjson.dumps(value, option=orjson.OPT_NON_STR_KEYS).decode()
+    else:
+        payload = json.dumps(value, default=str)
+    return _ENVELOPE_PREFIX + payload
+
+
+def loads(raw: str | None) -> Any:
+    if raw is None:
+        return None
+
+    if raw.startswith(_ENVELOPE_PREFIX):
+        raw = raw[len(_ENVELOPE_PREFIX):]
+
+    return orjson.loads(raw) if orjson is not None else json.loads(raw)
+
+
+def tag_key(tag: str) -> str:
+    return f"tag:{tag}"
+
+
+# KEYS[1] is the entry and KEYS[2..] its tag sets, ARGV[1] the value and
+# ARGV[2] the expiration in seconds (0 for none). Tag sets are sorted sets
+# scored by the expiration time of each member: members already expired are
+# pruned on every write and the set expires with its longest lived member.
+# Plain sets written by earlier versions are converted in place.
+SET_TAGGED_SCRIPT = """
+local ttl = tonumber(ARGV[2])
+if ttl > 0 then
+    redis.call('SET', KEYS[1], ARGV[1], 'EX', ttl)
+else
+    redis.call('SET', KEYS[1], ARGV[1])
+end
+local now = tonumber(redis.call('TIME')[1])
+local expires = ttl > 0 and now + ttl or '+inf'
+for i = 2, #KEYS do
+    local tag = KEYS[i]
+    if redis.call('TYPE', tag).ok == 'set' then
+        local members = redis.call('SMEMBERS', tag)
+        redis.call('DEL', tag)
+        for _, member in ipairs(members) do
+            local left = redis.call('TTL', member)
+            if left == -1 then
+                redis.call('ZADD', tag, '+inf', member)
+            elseif left > 0 then
+                redis.call('ZADD', tag, now + left, member)
+            end
+        end
+    end
+    redis.call('ZREMRANGEBYSCORE', tag, '-inf', '(' .. now)
+    redis.call('ZADD', tag, expires, KEYS[1])
+    local last = redis.call('ZRANGE', tag, -1, -1, 'WITHSCORES')
+    if last[2] == 'inf' then
+        redis.call('PERSIST', tag)
+    else
+        redis.call('EXPIREAT', tag, math.ceil(tonumber(last[2])) + 1)
+    end
+end
+return 1
+"""
+
+# Members of the tag sets KEYS, which are dropped in the same step so
+# entries written afterwards register in fresh sets instead of being lost.
+POP_TAGS_SCRIPT = """
+local members = {}
+for i = 1, #KEYS do
+    local kind = redis.call('TYPE', KEYS[i]).ok
+    local found = {}
+    if kind == 'zset' then
+        found = redis.call('ZRANGE', KEYS[i], 0, -1)
+    elseif kind == 'set' then
+        found = redis.call('SMEMBERS', KEYS[i])
+    end
+    for _, member in ipairs(found) do
+        members[#members + 1] = member
+    end
+    redis.call('UNLINK', KEYS[i])
+end
+return members
+"""
+
+
+async def unlink_in_batches(client: redis.Redis, keys: Iterable) -> int:
+    """UNLINK ``keys`` a batch at a time, returning how many existed."""
+    keys = list(keys)
+    removed = 0
+    for start in range(0, len(keys), REDIS_UNLINK_BATCH):
+        removed += await client.unlink(*keys[start:start + REDIS_UNLINK_BATCH])
+    return removed
+
+
+async def invalidate_tags(client: redis.Redis, tags: Iterable[str]) -> int:
+    """Delete every entry indexed under any of ``tags``."""
+    tag_keys = [tag_key(tag) for tag in set(tags)]
+    if not tag_keys:
+        return 0
+
+    members = await client.register_script(POP_TAGS_SCRIPT)(keys=tag_keys)
+    return await unlink_in_batches(client, set(members))
+
+
+class LatencyHistogram:
+    """Cumulative latency histogram of Redis commands, in milliseconds."""
+
+    BUCKETS = (0.5, 1, 2, 5, 10, 25, 50, 100, 250, 500, 1000)
+
+    def __init__(self):
+        self.commands: dict[str, list[int]] = {}
+        self.totals: dict[str, float] = {}
+
+    def record(self, command: str, seconds: float):
+        millis = seconds * 1000
+        counts = self.commands.setdefault(command, [0] * (len(self.BUCKETS) + 1))
+        counts[bisect.bisect_left(self.BUCKETS, millis)] += 1
+        self.totals[command] = self.totals.get(command, 0.0) + millis
+
+    def stats(self) -> dict:
+        stats = {}
+        for command, counts in self.commands.items():
+            cumulative = list(itertools.accumulate(counts))
+            stats[command] = {
+                "count": cumulative[-1],
+                "avg_ms": round(self.totals[command] / cumulative[-1], 3),
+                "buckets": {
+                    **{f"le_{b}": c for b, c in zip(self.BUCKETS, cumulative)},
+                    "le_inf": cumulative[-1],
+                },
+            }
+        return stats
+
+
+latency_histogram = LatencyHistogram()
+
+
 class RedisService:
 
     def __init__(self):
         self.redis = redis_connection
-        self.client = None
+        self.client: redis.Redis | None = None
+        self.set_tagged_script = None
 
     async def _ensure_client(self):
         if self.client is None:
-            async with self.redis.get_context_session() as client:
-                pong = await client.ping()
-                if pong:
-                    self.client = client
-                else:
-                    logger.error("Redis is not connected")
-                    raise ConnectionError("Redis is not connected")
+            self.client = redis.Redis(connection_pool=self.redis.pool)
+
+    @contextlib.asynccontextmanager
+    async def _timed(self, command: str) -> AsyncIterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            latency_histogram.record(command, time.perf_counter() - start)
 
-    async def get_client(self):
+    async def get_client(self) -> redis.Redis:
         await self._ensure_client()
-        pong = await self.client.ping()
+        assert self.client is not None
+        return self.client
 
-        if pong:
-            return self.client
+    async def get_(self, key):
+        client = await self.get_client()
 
-        logger.error("Redis is not connected")
-        return None
+        async with self._timed("get"):
+            result = await client.get(key)
 
-    async def get_(self, key):
-        await self._ensure_client()
-        pong = await self.client.ping()
-        if not pong:
-            logger.error("Redis is not connected")
-            return None
+        return loads(result)
 
-        result = await self.client.get(key)
-        if result is None:
-            return None
+    async def set_(
+        self,
+        key,
+        value,
+        time=360,  # pylint: disable=redefined-outer-name
+        tags: Iterable[str] = (),
+    ):
+        """Set ``key``, indexing it under ``tags`` for ``invalidate_tags``."""
+        client = await self.get_client()
+        tags = list(tags)
 
-        return json.loads(result)
+        if tags:
+            async with self._timed("set_tagged"):
+                return await self._set_tagged(client)(
+                    keys=[key, *map(tag_key, tags)], args=[dumps(value), int(time)]
+                )
 
-    async def set_(self, key, value, time=360):
-        await self._ensure_client()
-        pong = await self.client.ping()
+        async with self._timed("set"):
+            return await client.set(key, dumps(value), ex=int(time))
+
+    def _set_tagged(self, client: redis.Redis):
+        if self.set_tagged_script is None:
+            self.set_tagged_script = client.register_script(SET_TAGGED_SCRIPT)
+        return self.set_tagged_script
+
+    async def mget_(self, keys: Iterable[str]) -> list[Any]:
+        keys = list(keys)
+        if not keys:
+            return []
+
+        client = await self.get_client()
+
+        async with self._timed("mget"):
+            results = await client.mget(keys)
+
+        return [loads(result) for result in results]
 
-        if not pong:
-            logger.error("Redis is not connected")
-            return None
+    async def mset_(
+        self,
+        mapping: dict[str, Any],
+        time=360,  # pylint: disable=redefined-outer-name
+        tags: Iterable[str] = (),
+    ):
+        """Set several keys with the same expiration in one round trip."""
+        if not mapping:
+            return []
 
-        return await self.client.set(key, json.dumps(value), ex=int(time))
+        tag_keys = [tag_key(tag) for tag in tags]
+        client = await self.get_client()
+        script = self._set_tagged(client)
+
+        async with self.pipeline() as pipe:
+            for key, value in mapping.items():
+                if tag_keys:
+                    await script(
+                        keys=[key, *tag_keys], args=[dumps(value), int(time)], client=pipe
+                    )
+                else:
+                    pipe.set(key, dumps(value), ex=int(time))
+            return await pipe.execute()
+
+    @contextlib.asynccontextmanager
+    async def pipeline(self, transaction: bool = False) -> AsyncIterator[Any]:
+        """Batch commands in one round trip; call ``execute`` in the block.
+
+        With ``transaction=True`` the batch is wrapped in MULTI/EXEC.
+        """
+        client = await self.get_client()
+
+        async with self._timed("multi" if transaction else "pipeline"):
+            async with client.pipeline(transaction=transaction) as pipe:
+                yield pipe
+
+    async def transaction(
+        self, func: Callable[[Any], Awaitable[Any]], *watches: str
+    ) -> Any:
+        """Run ``func(pipe)`` under WATCH on ``watches``, retrying on conflicts."""
+        client = await self.get_client()
+
+        async with self._timed("transaction"):
+            return await client.transaction(func, *watches)
 
     async def exist_conn(self):
-        await self._ensure_client()
-        return await self.client.ping()
+        client = await self.get_client()
+        async with self._timed("ping"):
+            return await client.ping()
 
-    async def delete_pattern(self, pattern: str):
-        await self._ensure_client()
-        keys = await self.client.keys(pattern)
+    async def invalidate_tags(self, *tags: str) -> int:
+        """Delete the entries written with any of ``tags``."""
+        client = await self.get_client()
+
+        async with self._timed("invalidate"):
+            return await invalidate_tags(client, tags)
+
+    async def delete_pattern(self, pattern: str) -> int:
+        """Delete keys matching ``pattern``.
+
+        Walks the keyspace with SCAN so Redis is never blocked, but still
+        visits every key: use it only for entries written without tags.
+        """
+        client = await self.get_client()
+        removed = 0
+        batch = []
+
+        async with self._timed("scan_delete"):
+            async for key in client.scan_iter(match=pattern, count=REDIS_SCAN_COUNT):
+                batch.append(key)
+                if len(batch) >= REDIS_UNLINK_BATCH:
+                    removed += await unlink_in_batches(client, batch)
+                    batch = []
+            removed += await unlink_in_batches(client, batch)
 
-        if keys:
-            await self.client.delete(*keys)
+        return removed
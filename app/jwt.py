@@ -1,16 +1,23 @@
 import os
+import time
+import uuid
+import hashlib
 from datetime import datetime, timedelta, timezone
 from jwt import PyJWTError, encode, decode
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from passlib.context import CryptContext
 from pydantic import BaseModel
+from app.lib.authentication.password_hasher import PasswordHasher
+from app.utils.ttl_cache import TTLCache
 
 SECRET_KEY = os.getenv("SECRET_KEY")
 REFRESH_TOKEN_SECRET_KEY = os.getenv("REFRESH_TOKEN_SECRET_KEY")
 ALGORITHM = os.getenv("ALGORITHM")
 ACCESS_TOKEN_EXPIRE_MINUTES = os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES")
 REFRESH_TOKEN_EXPIRE_MINUTES = os.getenv("REFRESH_TOKEN_EXPIRE_MINUTES")
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS") or 12)
+TOKEN_CACHE_SIZE = int(os.getenv("TOKEN_CACHE_SIZE") or 4096)
 
 
 oauth2_scheme = OAuth2PasswordBearer(
@@ -32,6 +39,8 @@ class TokenData(BaseModel):
 
 class RefreshTokenData(BaseModel):
     sub: str
+    jti: str | None = None
+    exp: int | None = None
 
 
 class User(BaseModel):
@@ -45,7 +54,10 @@ class UserInDB(User):
     hashed_password: str
 
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+pwd_context = CryptContext(
+    schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=BCRYPT_ROUNDS
+)
+password_hasher = PasswordHasher(pwd_context)
 
 
 def verify_password(plain_password, hashed_password) -> bool:
@@ -84,23 +96,59 @@ def create_refresh_token(data: dict, expires_delta: timedelta | None = None):
             minutes=int(REFRESH_TOKEN_EXPIRE_MINUTES)
         )
 
-    to_encode.update({"exp": expire})
+    to_encode.update({"exp": expire, "jti": to_encode.get("jti") or uuid.uuid4().hex})
     encoded_jwt = encode(to_encode, REFRESH_TOKEN_SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
 
-async def decode_access_token(token: str) -> TokenData | None:
+class VerifiedToken:
+    __slots__ = ("payload", "token_data")
+
+    def __init__(self, payload: dict):
+        self.payload = payload
+        self.token_data: TokenData | None = None
+
+    def get_token_data(self) -> TokenData:
+        if self.token_data is None:
+            self.token_data = TokenData(
+                sub=self.payload.get("sub"),
+                profile=self.payload.get("profile"),
+                user_id=self.payload.get("user_id"),
+                group_id=self.payload.get("group_id"),
+            )
+        return self.token_data
+
+
+# Access tokens whose signature was already verified, keyed by a hash of the
+# raw token and kept until the token expires.
+token_cache = TTLCache(maxsize=TOKEN_CACHE_SIZE)
+
+
+def verify_access_token(token: str) -> VerifiedToken:
+    """Decode an access token once and reuse the claims until ``exp``.
+
+    Raises ``PyJWTError`` when the token is invalid or expired.
+    """
     assert SECRET_KEY is not None
     assert ALGORITHM is not None
 
+    key = hashlib.sha256(token.encode()).digest()
+    verified = token_cache.get(key)
+    if verified is not None:
+        return verified
+
+    verified = VerifiedToken(decode(token, SECRET_KEY, algorithms=[ALGORITHM]))
+
+    expires_in = verified.payload.get("exp", 0) - time.time()
+    if expires_in > 0:
+        token_cache.set(key, verified, ttl=expires_in)
+
+    return verified
+
+
+async def decode_access_token(token: str) -> TokenData | None:
     try:
-        payload = decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        return TokenData(
-            sub=payload.get("sub"),
-            profile=payload.get("profile"),
-            user_id=payload.get("user_id"),
-            partner_id=payload.get("partner_id"),
-        )
+        return verify_access_token(token).get_token_data()
 
     except PyJWTError as e:
         print(e)
@@ -113,7 +161,11 @@ async def decode_refresh_token(token: str) -> RefreshTokenData | None:
 
     try:
         payload = decode(token, REFRESH_TOKEN_SECRET_KEY, algorithms=[ALGORITHM])
-        return RefreshTokenData(sub=payload.get("sub"))
+        return RefreshTokenData(
+            sub=payload.get("sub"),
+            jti=payload.get("jti"),
+            exp=payload.get("exp"),
+        )
 
     except PyJWTError as e:
         print(e)
@@ -121,23 +173,12 @@ async def decode_refresh_token(token: str) -> RefreshTokenData | None:
 
 
 async def get_current_user(token: str = Depends(oauth2_scheme)) -> TokenData:
-    assert SECRET_KEY is not None
-    assert ALGORITHM is not None
-
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
     )
 
     try:
-
-        payload = decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-
-        return TokenData(
-            sub=payload.get("sub"),
-            profile=payload.get("profile"),
-            user_id=payload.get("user_id"),
-            partner_id=payload.get("partner_id"),
-        )
+        return verify_access_token(token).get_token_data()
 
     except Exception as ex:
         raise credentials_exception from ex
@@ -148,15 +189,12 @@ class GetCurrentUser:
         self.attr = attr
 
     def __call__(self, token: str = Depends(oauth2_scheme)):
-        assert SECRET_KEY is not None
-        assert ALGORITHM is not None
-
         credentials_exception = HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
         )
 
         try:
-            payload = decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+            payload = verify_access_token(token).payload
 
         except Exception as ex:
             raise credentials_exception from ex
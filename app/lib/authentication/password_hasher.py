@@ -0,0 +1,108 @@
+import os
+import time
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable
+
+from passlib.context import CryptContext
+
+PASSWORD_HASH_WORKERS = int(
+    os.getenv("PASSWORD_HASH_WORKERS") or min(4, os.cpu_count() or 1)
+)
+PASSWORD_HASH_QUEUE = int(os.getenv("PASSWORD_HASH_QUEUE") or 64)
+
+
+class PasswordHasherBusy(Exception):
+    """Raised when the hashing queue is full."""
+
+
+class PasswordHasher:
+    """Runs passlib hashing and verification on a bounded thread pool.
+
+    bcrypt releases the GIL while it works, so a few threads keep password
+    checks off the event loop. At most ``workers + max_queue`` operations are
+    in flight, beyond that ``PasswordHasherBusy`` is raised right away.
+    """
+
+    def __init__(
+        self,
+        context: CryptContext,
+        workers: int = PASSWORD_HASH_WORKERS,
+        max_queue: int = PASSWORD_HASH_QUEUE,
+    ):
+        self.context = context
+        self.workers = workers
+        self.max_queue = max_queue
+        self._executor = ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix="password-hasher"
+        )
+
+        self.pending = 0
+        self.completed = 0
+        self.rejected = 0
+        self.wait_total = 0.0
+        self.run_total = 0.0
+        self.run_max = 0.0
+
+    async def _run(self, func: Callable[..., Any], *args) -> Any:
+        if self.pending >= self.workers + self.max_queue:
+            self.rejected += 1
+            raise PasswordHasherBusy("Too many password operations in progress")
+
+        def job():
+            started = time.perf_counter()
+            return func(*args), started, time.perf_counter()
+
+        self.pending += 1
+        queued = time.perf_counter()
+        try:
+            result, started, finished = await asyncio.get_running_loop().run_in_executor(
+                self._executor, job
+            )
+        finally:
+            self.pending -= 1
+
+        self.completed += 1
+        self.wait_total += started - queued
+        self.run_total += finished - started
+        self.run_max = max(self.run_max, finished - started)
+
+        return result
+
+    async def verify(self, password: str, hashed_password: str) -> bool:
+        return await self._run(self.context.verify, password, hashed_password)
+
+    async def verify_and_update(
+        self, password: str, hashed_password: str
+    ) -> tuple[bool, str | None]:
+        """Verify and, when the stored hash is outdated, return a new one."""
+        return await self._run(
+            self.context.verify_and_update, password, hashed_password
+        )
+
+    async def hash(self, password: str) -> str:
+        return await self._run(self.context.hash, password)
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self) -> dict:
+        return {
+            "workers": self.workers,
+            "max_queue": self.max_queue,
+            "active": min(self.pending, self.workers),
+            "queued": max(self.pending - self.workers, 0),
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "wait_avg_ms": (
+                round(self.wait_total / self.completed * 1000, 3)
+                if self.completed
+                else 0.0
+            ),
+            "run_avg_ms": (
+                round(self.run_total / self.completed * 1000, 3)
+                if self.completed
+                else 0.0
+            ),
+            "run_max_ms": round(self.run_max * 1000, 3),
+        }
@@ -0,0 +1,151 @@
+import os
+import time
+import asyncio
+
+from app.logger import logger
+from app.utils.bloom_filter import BloomFilter
+from app.external_services._redis import RedisService
+
+REVOCATION_SYNC_INTERVAL = float(os.getenv("REVOCATION_SYNC_INTERVAL") or 30)
+REVOCATION_BLOOM_CAPACITY = int(os.getenv("REVOCATION_BLOOM_CAPACITY") or 100000)
+REVOKED_JTI_KEY = "auth:revoked_jti"
+REVOKED_JTI_CHANNEL = "auth:revoked_jti"
+
+
+class TokenRevocationList:
+    """Revoked refresh token ids, checked without Redis in the common case.
+
+    Redis keeps a sorted set of revoked ``jti`` scored by the token ``exp``;
+    members whose token already expired are pruned on every sync, which acts
+    as a per-member TTL equal to the remaining lifetime. Every worker keeps a
+    local Bloom filter of that set, rebuilt every ``REVOCATION_SYNC_INTERVAL``
+    seconds and updated through pub/sub when another worker revokes a token.
+    Only ids the filter reports as possibly revoked are confirmed with an
+    O(1) ``ZSCORE``. Until the first sync succeeds every id is confirmed
+    with Redis.
+    """
+
+    def __init__(
+        self,
+        capacity: int = REVOCATION_BLOOM_CAPACITY,
+        key: str = REVOKED_JTI_KEY,
+        channel: str = REVOKED_JTI_CHANNEL,
+    ):
+        self.capacity = capacity
+        self.key = key
+        self.channel = channel
+        self.redis = RedisService()
+        self.bloom = BloomFilter(capacity)
+        self.synced = False
+        self._tasks: list[asyncio.Task] = []
+        self._added_during_sync: set[str] | None = None
+
+        self.checks = 0
+        self.redis_checks = 0
+        self.revoked_hits = 0
+
+    async def revoke(self, jti: str, exp: int):
+        """Revoke a token until its expiration."""
+        if exp <= time.time():
+            return
+
+        self._remember(jti)
+
+        async with self.redis.pipeline() as pipe:
+            pipe.zadd(self.key, {jti: exp})
+            pipe.publish(self.channel, jti)
+            await pipe.execute()
+
+    def _remember(self, jti: str):
+        self.bloom.add(jti)
+        if self._added_during_sync is not None:
+            self._added_during_sync.add(jti)
+
+    async def is_revoked(self, jti: str) -> bool:
+        self.checks += 1
+
+        if self.synced and jti not in self.bloom:
+            return False
+
+        self.redis_checks += 1
+        try:
+            client = await self.redis.get_client()
+            revoked = await client.zscore(self.key, jti) is not None
+        except Exception as ex:  # pylint: disable=broad-exception-caught
+            # Fail closed: the token may have been revoked.
+            logger.error(ex)
+            revoked = True
+
+        if revoked:
+            self.revoked_hits += 1
+
+        return revoked
+
+    async def sync(self):
+        """Prune expired ids and rebuild the local filter from Redis."""
+        now = time.time()
+        # Ids revoked while Redis is being read must survive the swap.
+        self._added_during_sync = set()
+
+        try:
+            async with self.redis.pipeline() as pipe:
+                pipe.zremrangebyscore(self.key, "-inf", now)
+                pipe.zrangebyscore(self.key, now, "+inf")
+                _, revoked = await pipe.execute()
+
+            bloom = BloomFilter(max(self.capacity, len(revoked) * 2))
+            for jti in (*revoked, *self._added_during_sync):
+                bloom.add(jti)
+
+            self.bloom = bloom
+            self.synced = True
+        finally:
+            self._added_during_sync = None
+
+    async def _sync_periodically(self):
+        while True:
+            try:
+                await self.sync()
+            except Exception as ex:  # pylint: disable=broad-exception-caught
+                logger.error(ex)
+            await asyncio.sleep(REVOCATION_SYNC_INTERVAL)
+
+    async def _listen(self):
+        while True:
+            try:
+                client = await self.redis.get_client()
+                async with client.pubsub() as pubsub:
+                    await pubsub.subscribe(self.channel)
+                    async for message in pubsub.listen():
+                        if message["type"] == "message":
+                            self._remember(message["data"])
+            except asyncio.CancelledError:
+                raise
+            except Exception as ex:  # pylint: disable=broad-exception-caught
+                logger.error(ex)
+                await asyncio.sleep(5)
+
+    async def start(self):
+        self._tasks = [
+            asyncio.create_task(self._sync_periodically()),
+            asyncio.create_task(self._listen()),
+        ]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def stats(self) -> dict:
+        return {
+            "synced": self.synced,
+            "revoked_in_filter": self.bloom.count,
+            "checks": self.checks,
+            "redis_checks": self.redis_checks,
+            "revoked_hits": self.revoked_hits,
+            "false_positives": self.redis_checks - self.revoked_hits,
+        }
+
+
+revocation_list = TokenRevocationList()
@@ -0,0 +1,86 @@
+"""Throughput of refresh token revocation checks.
+
+Run with ``python -m app.lib.authentication.token_revocation_benchmark
+[revoked] [checks] [concurrency]`` against the configured Redis. A scratch
+sorted set is filled with ``revoked`` ids and dropped at the end. The same
+stream of checks, ``REVOKED_SHARE`` of them for revoked ids, is answered
+once with a ``ZSCORE`` per check and once through ``TokenRevocationList``,
+whose Bloom filter only sends possible matches to Redis.
+"""
+import sys
+import time
+import uuid
+import random
+import asyncio
+
+from app.lib.authentication.token_revocation import TokenRevocationList
+
+KEY = "auth:revoked_jti:benchmark"
+REVOKED = 100_000
+CHECKS = 50_000
+CONCURRENCY = 64
+REVOKED_SHARE = 0.01
+CHUNK = 10_000
+
+
+async def _fill(client, revoked: list[str]):
+    exp = time.time() + 3600
+    await client.delete(KEY)
+    for start in range(0, len(revoked), CHUNK):
+        await client.zadd(KEY, {jti: exp for jti in revoked[start:start + CHUNK]})
+
+
+async def _run(check, jtis: list[str], concurrency: int) -> tuple[float, int]:
+    """Checks per second and how many reported revoked."""
+    position = 0
+    revoked = 0
+
+    async def worker():
+        nonlocal position, revoked
+        while position < len(jtis):
+            jti = jtis[position]
+            position += 1
+            result = await check(jti)
+            revoked += result
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return len(jtis) / (time.perf_counter() - started), revoked
+
+
+async def main(revoked_count: int, checks: int, concurrency: int):
+    rng = random.Random(0)
+    revocations = TokenRevocationList(capacity=revoked_count, key=KEY, channel=KEY)
+    revoked = [uuid.uuid4().hex for _ in range(revoked_count)]
+    jtis = [
+        rng.choice(revoked) if rng.random() < REVOKED_SHARE else uuid.uuid4().hex
+        for _ in range(checks)
+    ]
+
+    client = await revocations.redis.get_client()
+    await _fill(client, revoked)
+    try:
+        async def zscore(jti: str) -> bool:
+            return await client.zscore(KEY, jti) is not None
+
+        rate, expected = await _run(zscore, jtis, concurrency)
+        print(f"{'zscore':>14}: {rate:>10.0f} checks/s, {expected} revoked")
+
+        await revocations.sync()
+        rate, found = await _run(revocations.is_revoked, jtis, concurrency)
+        stats = revocations.stats()
+        print(
+            f"{'bloom+zscore':>14}: {rate:>10.0f} checks/s, {found} revoked, "
+            f"{stats['redis_checks']} sent to Redis, "
+            f"{stats['false_positives']} false positives"
+        )
+        if found != expected:
+            raise SystemExit("The filtered check disagrees with ZSCORE")
+    finally:
+        await client.delete(KEY)
+
+
+if __name__ == "__main__":
+    args = [int(arg) for arg in sys.argv[1:]]
+    defaults = (REVOKED, CHECKS, CONCURRENCY)
+    asyncio.run(main(*args, *defaults[len(args):]))
@@ -0,0 +1,276 @@
+import os
+import json
+import time
+import asyncio
+from collections import namedtuple
+from types import MappingProxyType
+from typing import Any, Iterable, Mapping, NamedTuple
+
+from sqlalchemy import event, select, text
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app.logger import logger
+from app.core import connection_manager
+from app.models import (
+    Category,
+    Currency,
+    Format,
+    Make,
+    Model,
+    PartnerType,
+    Quality,
+    Rate,
+    ShrinkageReason,
+    StateFlow,
+    Status,
+    UnitMeasure,
+)
+from app.external_services._redis import RedisService
+
+# Seconds between checks of the tables for changes missed by pub/sub.
+DIMENSION_CACHE_REFRESH_INTERVAL = float(
+    os.getenv("DIMENSION_CACHE_REFRESH_INTERVAL") or 60
+)
+DIMENSION_CHANNEL = "dimensions:changed"
+
+
+class Dimension(NamedTuple):
+    model: type
+    label: str
+    code: str | None = None
+
+
+DIMENSIONS: dict[str, Dimension] = {
+    "status": Dimension(Status, "name"),
+    "category": Dimension(Category, "name", "code"),
+    "quality": Dimension(Quality, "name", "code"),
+    "formats": Dimension(Format, "description", "dimensions"),
+    "model": Dimension(Model, "name", "code"),
+    "make": Dimension(Make, "name", "name"),
+    "unit_measure": Dimension(UnitMeasure, "name", "code"),
+    "currency": Dimension(Currency, "name", "code"),
+    "state_flow": Dimension(StateFlow, "name"),
+    "shrinkage_reasons": Dimension(ShrinkageReason, "reason_name", "reason_name"),
+    "partner_type": Dimension(PartnerType, "name", "code"),
+    # A row per currency and day, still small enough to hold and digest whole.
+    "rate": Dimension(Rate, "rate_value"),
+}
+_BY_MODEL = {dimension.model: name for name, dimension in DIMENSIONS.items()}
+
+# One round trip returns a digest of every table, the tables are tiny.
+FINGERPRINTS = text(
+    " UNION ALL ".join(
+        f"SELECT '{name}' AS name, "
+        f"md5(COALESCE(string_agg(t::text, ',' ORDER BY t.id), '')) AS digest "
+        f"FROM {name} t"
+        for name in DIMENSIONS
+    )
+)
+
+
+def code_key(code: Any) -> str:
+    """Lookup form of a dimension code: trimmed and case-insensitive."""
+    return str(code).strip().casefold()
+
+
+class DimensionTable(NamedTuple):
+    rows: Mapping[int, tuple]
+    codes: Mapping[str, int]
+    digest: str | None
+    loaded_at: float
+
+
+_EMPTY = DimensionTable(MappingProxyType({}), MappingProxyType({}), None, 0.0)
+
+
+class DimensionCache:
+    """Per-worker copy of the small lookup tables, read without SQL.
+
+    Each table is held as an immutable ``{id: row}`` map plus a ``{code: id}``
+    map and replaced as a whole when it changes, so readers always see one
+    consistent version. Commits that touch a dimension through the ORM reload
+    it in every worker via pub/sub; a single query of per-table digests every
+    ``DIMENSION_CACHE_REFRESH_INTERVAL`` seconds catches the rest (SQL
+    scripts, Core statements, a missed message).
+    """
+
+    def __init__(self):
+        self.redis = RedisService()
+        self.tables: dict[str, DimensionTable] = {}
+        self._row_types = {
+            name: namedtuple(
+                name, dimension.model.__table__.columns.keys(), rename=True
+            )
+            for name, dimension in DIMENSIONS.items()
+        }
+        self._lock = asyncio.Lock()
+        self._tasks: list[asyncio.Task] = []
+        self._pending: set[asyncio.Task] = set()
+        self.reloads = 0
+
+    def table(self, dimension: str) -> DimensionTable:
+        return self.tables.get(dimension, _EMPTY)
+
+    def get(self, dimension: str, id_: int | None) -> tuple | None:
+        return self.table(dimension).rows.get(id_)
+
+    def label(self, dimension: str, id_: int | None) -> str | None:
+        row = self.get(dimension, id_)
+        return getattr(row, DIMENSIONS[dimension].label) if row is not None else None
+
+    def labels(self, dimension: str, ids: Iterable[int | None]) -> list[str | None]:
+        rows = self.table(dimension).rows
+        label = DIMENSIONS[dimension].label
+        return [
+            getattr(row, label) if (row := rows.get(id_)) is not None else None
+            for id_ in ids
+        ]
+
+    def codes(self, dimension: str) -> Mapping[str, int]:
+        """``{code_key(code): id}`` of a dimension."""
+        return self.table(dimension).codes
+
+    def id_for(self, dimension: str, code: Any) -> int | None:
+        return self.codes(dimension).get(code_key(code))
+
+    async def _load(self, sess: AsyncSession, names: Iterable[str], digests: dict):
+        for name in names:
+            dimension = DIMENSIONS[name]
+            row_type = self._row_types[name]
+            table = dimension.model.__table__
+            result = await sess.execute(select(table).order_by(table.c.id))
+            rows = {row.id: row for row in map(row_type._make, result)}
+            codes = {}
+            if dimension.code is not None:
+                for row in rows.values():
+                    code = getattr(row, dimension.code)
+                    if code is not None:
+                        codes.setdefault(code_key(code), row.id)
+
+            self.tables[name] = DimensionTable(
+                MappingProxyType(rows),
+                MappingProxyType(codes),
+                digests.get(name),
+                time.time(),
+            )
+            self.reloads += 1
+
+    async def refresh(self, names: Iterable[str] | None = None) -> list[str]:
+        """Reload the tables whose digest changed, or ``names`` regardless."""
+        async with self._lock:
+            async with connection_manager.get_context_session() as sess:
+                digests = dict((await sess.execute(FINGERPRINTS)).all())
+                if names is None:
+                    names = [
+                        name
+                        for name, digest in digests.items()
+                        if self.table(name).digest != digest
+                    ]
+                names = [name for name in names if name in DIMENSIONS]
+                await self._load(sess, names, digests)
+
+        return names
+
+    async def ensure_loaded(self):
+        """Load the tables on first use when the startup load failed."""
+        if len(self.tables) < len(DIMENSIONS):
+            await self.refresh()
+
+    async def publish(self, *names: str):
+        """Tell every worker, this one included, to reload ``names``."""
+        try:
+            client = await self.redis.get_client()
+            await client.publish(DIMENSION_CHANNEL, json.dumps(sorted(names)))
+            return
+        except Exception as ex:  # pylint: disable=broad-exception-caught
+            logger.error(ex)
+
+        # Without Redis at least this worker is up to date.
+        try:
+            await self.refresh(names)
+        except Exception as ex:  # pylint: disable=broad-exception-caught
+            logger.error(ex)
+
+    async def _listen(self):
+        while True:
+            try:
+                client = await self.redis.get_client()
+                async with client.pubsub() as pubsub:
+                    await pubsub.subscribe(DIMENSION_CHANNEL)
+                    async for message in pubsub.listen():
+                        if message["type"] == "message":
+                            await self.refresh(json.loads(message["data"]))
+            except asyncio.CancelledError:
+                raise
+            except Exception as ex:  # pylint: disable=broad-exception-caught
+                logger.error(ex)
+                await asyncio.sleep(5)
+
+    async def _refresh_periodically(self):
+        while True:
+            await asyncio.sleep(DIMENSION_CACHE_REFRESH_INTERVAL)
+            try:
+                await self.refresh()
+            except Exception as ex:  # pylint: disable=broad-exception-caught
+                logger.error(ex)
+
+    async def start(self):
+        try:
+            await self.refresh()
+        except Exception as ex:  # pylint: disable=broad-exception-caught
+            logger.error(ex)
+
+        self._tasks = [asyncio.create_task(self._listen())]
+        if DIMENSION_CACHE_REFRESH_INTERVAL > 0:
+            self._tasks.append(asyncio.create_task(self._refresh_periodically()))
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def _collect_dimensions(self, session: Session, _flush_context):
+        names: set[str] = session.info.setdefault("dimensions", set())
+        for obj in (*session.new, *session.dirty, *session.deleted):
+            name = _BY_MODEL.get(type(obj))
+            if name is not None:
+                names.add(name)
+
+    def _publish_committed(self, session: Session):
+        names = session.info.pop("dimensions", None)
+        if not names:
+            return
+
+        task = asyncio.get_running_loop().create_task(self.publish(*names))
+        self._pending.add(task)
+        task.add_done_callback(self._pending.discard)
+
+    @staticmethod
+    def _discard_dimensions(session: Session, _previous_transaction):
+        session.info.pop("dimensions", None)
+
+    def listen_session_events(self):
+        """Reload dimensions changed through an ORM flush once committed.
+
+        Core statements and SQL scripts are picked up by the periodic check,
+        or immediately by calling ``publish`` after committing.
+        """
+        event.listen(Session, "after_flush", self._collect_dimensions)
+        event.listen(Session, "after_commit", self._publish_committed)
+        event.listen(Session, "after_soft_rollback", self._discard_dimensions)
+
+    def stats(self) -> dict:
+        return {
+            "refresh_interval": DIMENSION_CACHE_REFRESH_INTERVAL,
+            "reloads": self.reloads,
+            "tables": {
+                name: {"rows": len(table.rows), "loaded_at": table.loaded_at}
+                for name, table in self.tables.items()
+            },
+        }
+
+
+dimension_cache = DimensionCache()
+dimension_cache.listen_session_events()
@@ -5,24 +5,37 @@ from ._make import Make
 from ._image import Image
 from ._model import Model
 from ._status import Status
+from ._state_flow import StateFlow
 from ._formats import Format
 from ._quality import Quality
 from ._partner import Partner
 from ._product import Product
+from ._product_code_counter import ProductCodeCounter
 from ._category import Category
+from ._category_closure import CategoryClosure
 from ._currency import Currency
 from ._unit_measure import UnitMeasure
 from ._partner_type import PartnerType
 from ._product_image import ProductImage
 from ._inventory_shrinkage import InventoryShrinkage
+from ._inventory_shrinkage_monthly import InventoryShrinkageMonthly
 from ._shrinkage_reasons import ShrinkageReason
 from ._purchese_orders import PurchaseOrder
 from ._purchese_order_detail import PurchaseOrderDetail
+from ._purchase_order_receipt import PurchaseOrderReceipt, PurchaseOrderReceiptLine
 from ._warehouses import Warehouse
 from ._inventory import Inventory
 from ._inventory_movements import InventoryMovement
+from ._inventory_detached_partition import InventoryDetachedPartition
+from ._inventory_snapshot import InventorySnapshot
+from ._inventory_valuation import (
+    InventoryCostLayer,
+    InventoryValuationEntry,
+    InventoryValuationQueue,
+)
 from ._dispatch_orders import DispatchOrder
 from ._dispatch_order_details import DispatchOrderDetail
+from ._stock_reservation import StockReservation
 from ._dispatch_routes import DispatchRoute
 from ._dispatch_route_assignments import DispatchRouteAssignment
 from .auth_user import (
@@ -51,10 +64,13 @@ __all__ = [
     "PermissionsLevel",
     "Partner",
     "Product",
+    "ProductCodeCounter",
     "ProductImage",
     "Category",
+    "CategoryClosure",
     "Image",
     "Status",
+    "StateFlow",
     "PartnerType",
     "UserReports",
     "Currency",
@@ -65,14 +81,23 @@ __all__ = [
     "UnitMeasure",
     "Rate",
     "InventoryShrinkage",
+    "InventoryShrinkageMonthly",
     "ShrinkageReason",
     "PurchaseOrder",
     "PurchaseOrderDetail",
+    "PurchaseOrderReceipt",
+    "PurchaseOrderReceiptLine",
     "Warehouse",
     "Inventory",
     "InventoryMovement",
+    "InventoryDetachedPartition",
+    "InventorySnapshot",
+    "InventoryCostLayer",
+    "InventoryValuationEntry",
+    "InventoryValuationQueue",
     "DispatchOrder",
     "DispatchOrderDetail",
+    "StockReservation",
     "DispatchRoute",
     "DispatchRouteAssignment",
 ]
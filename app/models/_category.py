@@ -8,6 +8,8 @@ from .base import Base
 class Category(Base):
     __tablename__ = "category"
     id = Column(Integer, primary_key=True)
-    code = Column(String(4), nullable=False)
-    name = Column(String(64), unique=True, nullable=False)
+    code = Column(String(32), nullable=True)
+    name = Column(String(100), nullable=True)
+    description = Column(String(200), nullable=True)
+    category_id = Column(Integer, ForeignKey("category.id"), nullable=True)
     status_id = Column(Integer, ForeignKey("status.id"), default=1)
@@ -0,0 +1,27 @@
+from sqlalchemy import Column, Integer, ForeignKey
+
+from .base import Base
+
+
+class CategoryClosure(Base):
+    """Every (ancestor, descendant) pair of the category tree, itself included.
+
+    Maintained by the ``after_category_closure`` trigger in
+    ``sql/database.sql``.
+    """
+
+    __tablename__ = "category_closure"
+
+    ancestor_id = Column(
+        Integer,
+        ForeignKey("category.id", ondelete="CASCADE"),
+        primary_key=True,
+        nullable=False,
+    )
+    descendant_id = Column(
+        Integer,
+        ForeignKey("category.id", ondelete="CASCADE"),
+        primary_key=True,
+        nullable=False,
+    )
+    depth = Column(Integer, nullable=False)
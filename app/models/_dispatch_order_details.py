@@ -10,4 +10,5 @@ class DispatchOrderDetail(Base):
         Integer, ForeignKey("dispatch_orders.id"), nullable=False
     )
     product_id = Column(Integer, ForeignKey("products.id"), nullable=False)
+    warehouse_id = Column(Integer, ForeignKey("warehouses.id"), nullable=False)
     quantity = Column(Numeric(10, 2), nullable=False)
@@ -22,4 +22,8 @@ class Inventory(Base):
     warehouse_id = Column(Integer, ForeignKey("warehouses.id"), nullable=False)
     product_id = Column(Integer, ForeignKey("products.id"), nullable=False)
     stock_quantity = Column(Numeric(10, 2), nullable=False, server_default=text("0"))
+    # Held by active stock reservations, available = stock - reserved.
+    reserved_quantity = Column(
+        Numeric(18, 2), nullable=False, server_default=text("0")
+    )
     last_update = Column(TIMESTAMP, server_default=text("CURRENT_TIMESTAMP"))
@@ -0,0 +1,20 @@
+from sqlalchemy import Column, String, TIMESTAMP, text
+from .base import Base
+
+
+class InventoryDetachedPartition(Base):
+    """Month detached from ``inventory_movements``.
+
+    Its balances live in the pinned snapshots taken when it was detached, so
+    the month is never created again and no movement dated before the end of
+    the last one can be posted.
+    """
+
+    __tablename__ = "inventory_detached_partitions"
+
+    name = Column(String(63), primary_key=True)
+    period_start = Column(TIMESTAMP, nullable=False)
+    period_end = Column(TIMESTAMP, nullable=False)
+    detached_at = Column(
+        TIMESTAMP, nullable=False, server_default=text("CURRENT_TIMESTAMP")
+    )
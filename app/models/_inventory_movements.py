@@ -1,3 +1,6 @@
+from datetime import date, datetime
+from typing import Literal
+
 from sqlalchemy import (
     Column,
     Integer,
@@ -6,6 +9,10 @@ from sqlalchemy import (
     TIMESTAMP,
     ForeignKey,
     CheckConstraint,
+    ColumnElement,
+    Select,
+    and_,
+    select,
     text,
 )
 from .base import Base
@@ -14,12 +21,18 @@ from .base import Base
 class InventoryMovement(Base):
     __tablename__ = "inventory_movements"
 
+    # Partitioned by month on movement_date, which is why it is part of the key.
     id = Column(Integer, primary_key=True, autoincrement=True)
     warehouse_id = Column(Integer, ForeignKey("warehouses.id"), nullable=False)
     product_id = Column(Integer, ForeignKey("products.id"), nullable=False)
     movement_type = Column(String(50), nullable=False)
     quantity = Column(Numeric(10, 2), nullable=False)
-    movement_date = Column(TIMESTAMP, server_default=text("CURRENT_TIMESTAMP"))
+    movement_date = Column(
+        TIMESTAMP,
+        primary_key=True,
+        nullable=False,
+        server_default=text("CURRENT_TIMESTAMP"),
+    )
     source_document = Column(
         String(255)
     )  # Ejemplo: Número de Orden de Compra, Número de Despacho
@@ -30,4 +43,38 @@ class InventoryMovement(Base):
         CheckConstraint(
             "movement_type IN ('ENTRADA', 'SALIDA')", name="chk_movement_type"
         ),
+        {"postgresql_partition_by": "RANGE (movement_date)"},
     )
+
+    @classmethod
+    def in_period(
+        cls,
+        start: date | datetime | ColumnElement,
+        end: date | datetime | ColumnElement,
+        closed: Literal["left", "right", "both"] = "left",
+    ):
+        """``start <= movement_date < end``, lets Postgres prune partitions.
+
+        ``closed`` names the bounds included: ``"right"`` for
+        ``start < movement_date <= end``, ``"both"`` for both of them.
+        """
+        if closed == "right":
+            after = cls.movement_date > start
+        else:
+            after = cls.movement_date >= start
+        if closed == "left":
+            before = cls.movement_date < end
+        else:
+            before = cls.movement_date <= end
+        return and_(after, before)
+
+    @classmethod
+    def select_period(
+        cls, start: date | datetime, end: date | datetime, *columns
+    ) -> Select:
+        """Select ``columns`` (the whole row by default) of movements in a period.
+
+        Reports should start from here: without a date range every monthly
+        partition is scanned.
+        """
+        return select(*(columns or (cls,))).where(cls.in_period(start, end))
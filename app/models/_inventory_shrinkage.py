@@ -5,6 +5,7 @@ from sqlalchemy import (
     Numeric,
     TIMESTAMP,
     ForeignKey,
+    ForeignKeyConstraint,
     text,
 )
 from .base import Base
@@ -14,9 +15,8 @@ class InventoryShrinkage(Base):
     __tablename__ = "inventory_shrinkage"
 
     id = Column(Integer, primary_key=True, autoincrement=True)
-    inventory_movement_id = Column(
-        Integer, ForeignKey("inventory_movements.id"), nullable=False
-    )
+    inventory_movement_id = Column(Integer, nullable=False)
+    inventory_movement_date = Column(TIMESTAMP, nullable=False)
     shrinkage_reason_id = Column(
         Integer, ForeignKey("shrinkage_reasons.id"), nullable=False
     )
@@ -25,3 +25,10 @@ class InventoryShrinkage(Base):
     loss_date = Column(TIMESTAMP, server_default=text("CURRENT_TIMESTAMP"))
     rate_id = Column(Integer, ForeignKey("rate.id"), nullable=False)
     notes = Column(Text)
+
+    __table_args__ = (
+        ForeignKeyConstraint(
+            ["inventory_movement_id", "inventory_movement_date"],
+            ["inventory_movements.id", "inventory_movements.movement_date"],
+        ),
+    )
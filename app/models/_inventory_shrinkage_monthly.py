@@ -0,0 +1,38 @@
+from sqlalchemy import (
+    BigInteger,
+    Column,
+    Date,
+    Integer,
+    Numeric,
+    ForeignKey,
+)
+from .base import Base
+
+
+class InventoryShrinkageMonthly(Base):
+    """Losses of a month per reason, warehouse, product category and rate
+    currency, kept up to date by triggers on ``inventory_shrinkage``.
+
+    ``amount`` is in the currency of the rate recorded with each loss and
+    ``base_amount`` in the base currency, converted with that same rate.
+    """
+
+    __tablename__ = "inventory_shrinkage_monthly"
+
+    month = Column(Date, primary_key=True, nullable=False)
+    shrinkage_reason_id = Column(
+        Integer, ForeignKey("shrinkage_reasons.id"), primary_key=True, nullable=False
+    )
+    warehouse_id = Column(
+        Integer, ForeignKey("warehouses.id"), primary_key=True, nullable=False
+    )
+    category_id = Column(
+        Integer, ForeignKey("category.id"), primary_key=True, nullable=False
+    )
+    # 0 when the rate has no currency.
+    currency_id = Column(Integer, primary_key=True, nullable=False)
+    loss_count = Column(Integer, nullable=False, default=0)
+    quantity_lost = Column(BigInteger, nullable=False, default=0)
+    amount = Column(Numeric(20, 2), nullable=False, default=0)
+    base_amount = Column(Numeric(20, 2), nullable=False, default=0)
+    unpriced_count = Column(Integer, nullable=False, default=0)
@@ -0,0 +1,32 @@
+from sqlalchemy import (
+    Column,
+    Integer,
+    Numeric,
+    Boolean,
+    TIMESTAMP,
+    ForeignKey,
+    text,
+)
+from .base import Base
+
+
+class InventorySnapshot(Base):
+    """Stock balance of a (warehouse, product) as of ``snapshot_at``.
+
+    A row is only written when the balance changed since the previous
+    snapshot of the same key, the latest row at or before a date plus the
+    movements after it gives the balance at that date. ``pinned`` rows are
+    taken when a month of movements is detached and are never compacted.
+    """
+
+    __tablename__ = "inventory_snapshots"
+
+    warehouse_id = Column(
+        Integer, ForeignKey("warehouses.id"), primary_key=True, nullable=False
+    )
+    product_id = Column(
+        Integer, ForeignKey("products.id"), primary_key=True, nullable=False
+    )
+    snapshot_at = Column(TIMESTAMP, primary_key=True, nullable=False)
+    stock_quantity = Column(Numeric(18, 2), nullable=False)
+    pinned = Column(Boolean, nullable=False, server_default=text("false"))
@@ -0,0 +1,54 @@
+from sqlalchemy import (
+    Column,
+    Integer,
+    Numeric,
+    TIMESTAMP,
+)
+from .base import Base
+
+
+class InventoryValuationEntry(Base):
+    """Cost of a movement and valued balance of its key right after it.
+
+    Values are in the base currency, by FIFO and by weighted average. The
+    latest entry at or before a date is the valuation at that date.
+    """
+
+    __tablename__ = "inventory_valuation_entries"
+
+    warehouse_id = Column(Integer, primary_key=True, nullable=False)
+    product_id = Column(Integer, primary_key=True, nullable=False)
+    movement_date = Column(TIMESTAMP, primary_key=True, nullable=False)
+    movement_id = Column(Integer, primary_key=True, nullable=False)
+    # Signed, negative for SALIDA.
+    quantity = Column(Numeric(18, 2), nullable=False)
+    unit_cost = Column(Numeric(18, 6), nullable=False)
+    fifo_cost = Column(Numeric(18, 4), nullable=False)
+    average_cost = Column(Numeric(18, 4), nullable=False)
+    stock_quantity = Column(Numeric(18, 2), nullable=False)
+    fifo_value = Column(Numeric(18, 4), nullable=False)
+    average_value = Column(Numeric(18, 4), nullable=False)
+
+
+class InventoryCostLayer(Base):
+    """FIFO layer of a key with stock left, one per ENTRADA."""
+
+    __tablename__ = "inventory_cost_layers"
+
+    warehouse_id = Column(Integer, primary_key=True, nullable=False)
+    product_id = Column(Integer, primary_key=True, nullable=False)
+    movement_date = Column(TIMESTAMP, primary_key=True, nullable=False)
+    movement_id = Column(Integer, primary_key=True, nullable=False)
+    unit_cost = Column(Numeric(18, 6), nullable=False)
+    remaining_quantity = Column(Numeric(18, 2), nullable=False)
+
+
+class InventoryValuationQueue(Base):
+    """Movements inserted and not valued yet, filled by a trigger."""
+
+    __tablename__ = "inventory_valuation_queue"
+
+    movement_date = Column(TIMESTAMP, primary_key=True, nullable=False)
+    movement_id = Column(Integer, primary_key=True, nullable=False)
+    warehouse_id = Column(Integer, nullable=False)
+    product_id = Column(Integer, nullable=False)
@@ -0,0 +1,21 @@
+from sqlalchemy import Column, Integer, ForeignKey
+
+from .base import Base
+
+
+class ProductCodeCounter(Base):
+    """Last ``products.numeric_seq`` handed out per (category, quality).
+
+    Maintained by ``reservar_codigos_producto`` and the products insert
+    trigger in ``sql/database.sql``.
+    """
+
+    __tablename__ = "product_code_counters"
+
+    category_id = Column(
+        Integer, ForeignKey("category.id"), primary_key=True, nullable=False
+    )
+    quality_id = Column(
+        Integer, ForeignKey("quality.id"), primary_key=True, nullable=False
+    )
+    last_value = Column(Integer, nullable=False, default=0)
@@ -0,0 +1,41 @@
+from sqlalchemy import (
+    Column,
+    Integer,
+    Numeric,
+    String,
+    TIMESTAMP,
+    ForeignKey,
+    UniqueConstraint,
+    text,
+)
+from .base import Base
+
+
+class PurchaseOrderReceipt(Base):
+    __tablename__ = "purchase_order_receipts"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    purchase_order_id = Column(
+        Integer, ForeignKey("purchase_orders.id"), nullable=False
+    )
+    # Identifies the receipt, a repeated one is not posted again.
+    source_document = Column(String(255), unique=True, nullable=False)
+    warehouse_id = Column(Integer, ForeignKey("warehouses.id"), nullable=False)
+    received_by_user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    received_at = Column(
+        TIMESTAMP, nullable=False, server_default=text("LOCALTIMESTAMP")
+    )
+
+
+class PurchaseOrderReceiptLine(Base):
+    __tablename__ = "purchase_order_receipt_lines"
+    __table_args__ = (UniqueConstraint("receipt_id", "purchase_order_detail_id"),)
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    receipt_id = Column(
+        Integer, ForeignKey("purchase_order_receipts.id"), nullable=False
+    )
+    purchase_order_detail_id = Column(
+        Integer, ForeignKey("purchase_order_details.id"), nullable=False
+    )
+    quantity = Column(Numeric(10, 2), nullable=False)
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, Numeric, ForeignKey
+from sqlalchemy import Column, Integer, Numeric, ForeignKey, text
 from .base import Base
 
 
@@ -13,3 +13,6 @@ class PurchaseOrderDetail(Base):
     quantity = Column(Numeric(10, 2), nullable=False)
     unit_price = Column(Numeric(10, 2), nullable=False)
     subtotal = Column(Numeric(12, 2), nullable=False)
+    received_quantity = Column(
+        Numeric(10, 2), nullable=False, server_default=text("0")
+    )
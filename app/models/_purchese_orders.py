@@ -25,5 +25,11 @@ class PurchaseOrder(Base):
         Integer, ForeignKey("state_flow.id"), nullable=False, server_default=text("3")
     )
     rate_id = Column(Integer, ForeignKey("rate.id"))
-    total_amount = Column(Numeric(18, 2))
+    total_amount = Column(Numeric(18, 2), nullable=False, server_default=text("0"))
     notes = Column(Text)
+    # Aggregates of the detail lines, kept up to date by database triggers.
+    line_count = Column(Integer, nullable=False, server_default=text("0"))
+    ordered_quantity = Column(Numeric(18, 2), nullable=False, server_default=text("0"))
+    received_quantity = Column(
+        Numeric(18, 2), nullable=False, server_default=text("0")
+    )
@@ -0,0 +1,42 @@
+from sqlalchemy import (
+    Column,
+    Integer,
+    Numeric,
+    String,
+    TIMESTAMP,
+    ForeignKey,
+    ForeignKeyConstraint,
+    UniqueConstraint,
+    text,
+)
+from .base import Base
+
+
+class StockReservation(Base):
+    """Stock held for a dispatch order in one warehouse.
+
+    While ``status`` is ACTIVA its quantity is part of
+    ``inventory.reserved_quantity``.
+    """
+
+    __tablename__ = "stock_reservations"
+    __table_args__ = (
+        UniqueConstraint("dispatch_order_id", "warehouse_id", "product_id"),
+        ForeignKeyConstraint(
+            ["warehouse_id", "product_id"],
+            ["inventory.warehouse_id", "inventory.product_id"],
+        ),
+    )
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    dispatch_order_id = Column(
+        Integer, ForeignKey("dispatch_orders.id"), nullable=False
+    )
+    warehouse_id = Column(Integer, nullable=False)
+    product_id = Column(Integer, nullable=False)
+    quantity = Column(Numeric(18, 2), nullable=False)
+    status = Column(String(16), nullable=False, server_default=text("'ACTIVA'"))
+    created_at = Column(
+        TIMESTAMP, nullable=False, server_default=text("CURRENT_TIMESTAMP")
+    )
+    closed_at = Column(TIMESTAMP)
@@ -0,0 +1,63 @@
+from typing import Optional
+
+from fastapi_cache.backends.redis import RedisBackend
+
+from app.external_services._redis import (
+    REDIS_SCAN_COUNT,
+    SET_TAGGED_SCRIPT,
+    invalidate_tags,
+    tag_key,
+)
+
+
+def namespace_tag(namespace: str) -> str:
+    return f"ns:{namespace.rstrip(':')}"
+
+
+def namespace_tags(key: str) -> list[str]:
+    """Tags of every enclosing namespace of ``key`` below the cache prefix."""
+    parts = key.split(":")[:-1]
+    return [
+        namespace_tag(":".join(parts[:depth]))
+        for depth in range(2, len(parts) + 1)
+        if parts[depth - 1]
+    ]
+
+
+class TaggedRedisBackend(RedisBackend):
+    """fastapi-cache backend that indexes every entry under its namespace.
+
+    Keys built by ``key_builder`` look like ``<prefix>:<namespace>:<hash>``,
+    each one is added to the ``tag:ns:<prefix>:<namespace>`` set when it is
+    written, so ``FastAPICache.clear(namespace=...)`` deletes exactly those
+    keys instead of running ``KEYS`` over the whole database. The prefix
+    alone has no tag, which would index every cached key; clearing it
+    invalidates the tags of all its namespaces.
+    """
+
+    def __init__(self, redis):
+        super().__init__(redis)
+        self.set_tagged = redis.register_script(SET_TAGGED_SCRIPT)
+
+    async def set(self, key: str, value: bytes, expire: Optional[int] = None) -> None:
+        await self.set_tagged(
+            keys=[key, *map(tag_key, namespace_tags(key))], args=[value, expire or 0]
+        )
+
+    async def clear(self, namespace: Optional[str] = None, key: Optional[str] = None) -> int:
+        if namespace:
+            tag = namespace_tag(namespace)
+            if ":" in tag[len("ns:"):]:
+                return await invalidate_tags(self.redis, [tag])
+            prefix = tag_key("")
+            tags = [
+                # This client does not decode responses.
+                name.decode()[len(prefix):]
+                async for name in self.redis.scan_iter(
+                    match=f"{tag_key(tag)}:*", count=REDIS_SCAN_COUNT
+                )
+            ]
+            return await invalidate_tags(self.redis, tags)
+        if key:
+            return await self.redis.delete(key)
+        return 0
@@ -0,0 +1,36 @@
+from datetime import datetime
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+# TIMESTAMP columns hold the local time of the database session, the clock of
+# LOCALTIMESTAMP and of the column defaults: offset-aware values are turned
+# into it by the database itself.
+TO_SESSION_TIME = text("""
+    SELECT CAST(v AS timestamp)
+    FROM unnest(CAST(:values AS timestamptz[])) WITH ORDINALITY AS t(v, n)
+    ORDER BY n
+""")
+
+
+async def to_session_times(
+    sess: AsyncSession, values: list[datetime | None]
+) -> list[datetime | None]:
+    """``values`` as naive local times of the database session.
+
+    Naive values are taken as already local and kept, offset-aware ones are
+    converted in a single query.
+    """
+    aware = [i for i, value in enumerate(values) if value and value.tzinfo is not None]
+    if not aware:
+        return values
+
+    converted = await sess.scalars(TO_SESSION_TIME, {"values": [values[i] for i in aware]})
+    values = list(values)
+    for i, value in zip(aware, converted):
+        values[i] = value
+    return values
+
+
+async def to_session_time(sess: AsyncSession, value: datetime) -> datetime:
+    return (await to_session_times(sess, [value]))[0]
@@ -1,22 +1,216 @@
+import enum
+import uuid
 import hashlib
-from typing import Any, Callable, Dict, Optional, Tuple
-from fastapi import Request, Response
-
-
-def key_builder(  # pylint: disable=too-many-arguments
-    func: Callable[..., Any],
-    namespace: str = "",
-    *,
-    request: Optional[Request] = None,  # pylint: disable=unused-argument
-    response: Optional[Response] = None,   # pylint: disable=unused-argument
-    args: Tuple[Any, ...],
-    kwargs: Dict[str, Any],
-) -> str:
-    if kwargs.get('sess'):
-        del kwargs["sess"]
-
-    cache_key = hashlib.md5(  # noqa: S324
-        f"{func.__module__}:{func.__name__}:{args}:{kwargs}".encode()
-    ).hexdigest()
-
-    return f"{namespace}:{cache_key}"
+import datetime
+from decimal import Decimal
+from typing import Any, Callable, Dict, Literal, Optional, Tuple
+
+import redis.asyncio as redis
+from fastapi import BackgroundTasks, Request, Response
+from pydantic import BaseModel
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app.jwt import TokenData
+from app.logger import logger
+
+# Values injected by FastAPI dependencies: they never change the response of
+# a cached endpoint and their repr differs on every request.
+INJECTED_TYPES: tuple[type, ...] = (
+    AsyncSession,
+    Session,
+    redis.Redis,
+    Request,
+    Response,
+    BackgroundTasks,
+    TokenData,
+)
+
+KeyScope = Literal["user", "group"]
+
+_injected: dict[type, bool] = {}
+
+
+def _is_injected(value: Any) -> bool:
+    kind = type(value)
+    injected = _injected.get(kind)
+    if injected is None:
+        injected = _injected[kind] = issubclass(kind, INJECTED_TYPES)
+    return injected
+
+
+def _encode_str(value: str, out: bytearray):
+    data = value.encode()
+    out += b"s%d:" % len(data)
+    out += data
+
+
+def _encode_bytes(value: bytes, out: bytearray):
+    out += b"b%d:" % len(value)
+    out += value
+
+
+def _encode_sequence(value, out: bytearray):
+    out += b"L%d:" % len(value)
+    for item in value:
+        _encode(item, out)
+
+
+def _encode_set(value, out: bytearray):
+    items = sorted(_encoded(item) for item in value)
+    out += b"S%d:" % len(items)
+    out += b"".join(items)
+
+
+def _encode_repr(value: Any, out: bytearray):
+    out += b"r"
+    _encode_str(repr(value), out)
+
+
+def _encode_dict(value: dict, out: bytearray):
+    out += b"D"
+    _encode_mapping(value, out)
+
+
+_model_fields: dict[type, tuple[bytes, list[tuple[bytes, str]]]] = {}
+
+
+def _encode_model(value: BaseModel, out: bytearray):
+    kind = type(value)
+    fields = _model_fields.get(kind)
+    if fields is None:
+        fields = _model_fields[kind] = (
+            b"M" + _encoded(kind.__qualname__) + b"%d:" % len(kind.model_fields),
+            sorted((_encoded(name), name) for name in kind.model_fields),
+        )
+
+    header, names = fields
+    out += header
+    for encoded_name, name in names:
+        out += encoded_name
+        _encode(getattr(value, name), out)
+
+
+# Every value is prefixed with its type and strings with their length, so
+# 1, "1" and True never collide and neither do ["a,b"] and ["a", "b"].
+_ENCODERS: dict[type, Callable[[Any, bytearray], None]] = {
+    type(None): lambda value, out: out.extend(b"N"),
+    bool: lambda value, out: out.extend(b"T" if value else b"F"),
+    int: lambda value, out: out.extend(b"i%d;" % value),
+    float: lambda value, out: out.extend(b"f%s;" % value.hex().encode()),
+    Decimal: lambda value, out: out.extend(b"d%s;" % str(value.normalize()).encode()),
+    str: _encode_str,
+    bytes: _encode_bytes,
+    datetime.date: lambda value, out: out.extend(b"t%s;" % value.isoformat().encode()),
+    datetime.datetime: lambda value, out: out.extend(b"t%s;" % value.isoformat().encode()),
+    datetime.time: lambda value, out: out.extend(b"t%s;" % value.isoformat().encode()),
+    uuid.UUID: lambda value, out: out.extend(b"u" + value.bytes),
+    list: _encode_sequence,
+    tuple: _encode_sequence,
+    set: _encode_set,
+    frozenset: _encode_set,
+    dict: _encode_dict,
+}
+
+
+def _encoder_for(kind: type) -> Callable[[Any, bytearray], None]:
+    """Find the encoder of a subclass (enums, models, ...) and remember it."""
+    if issubclass(kind, enum.Enum):
+        def encoder(value, out):
+            out += b"E"
+            _encode(value.value, out)
+    elif issubclass(kind, BaseModel):
+        encoder = _encode_model
+    else:
+        encoder = next(
+            (
+                _ENCODERS[base]
+                for base in kind.__mro__[1:]
+                if base in _ENCODERS and base is not object
+            ),
+            None,
+        )
+        if encoder is None:
+            # Keys still work, but only hit when the repr is stable.
+            logger.warning(
+                "Building cache keys from the repr of %s, add it to "
+                "INJECTED_TYPES if it is a dependency",
+                kind.__qualname__,
+            )
+            encoder = _encode_repr
+
+    _ENCODERS[kind] = encoder
+    return encoder
+
+
+def _encode(value: Any, out: bytearray):
+    """Append a typed, order independent encoding of ``value`` to ``out``."""
+    encoder = _ENCODERS.get(type(value))
+    if encoder is None:
+        encoder = _encoder_for(type(value))
+    encoder(value, out)
+
+
+def _encoded(value: Any) -> bytes:
+    out = bytearray()
+    _encode(value, out)
+    return bytes(out)
+
+
+def _encode_mapping(mapping: dict, out: bytearray):
+    items = sorted(
+        (_encoded(key), value)
+        for key, value in mapping.items()
+        if not _is_injected(value)
+    )
+    out += b"%d:" % len(items)
+    for key, value in items:
+        out += key
+        _encode(value, out)
+
+
+def _current_user(args: Tuple[Any, ...], kwargs: Dict[str, Any]) -> TokenData:
+    for value in (*args, *kwargs.values()):
+        if isinstance(value, TokenData):
+            return value
+    raise TypeError("A scoped cache key needs an endpoint that depends on CurrentUser")
+
+
+def build_key_builder(scope: Optional[KeyScope] = None):
+    """Key builder for ``@cache``, optionally scoped to the current user or group.
+
+    Dependency-injected values are left out of the key, a scoped builder only
+    takes the ``user_id`` or ``group_id`` of the ``CurrentUser`` dependency.
+    Scoped keys are ``<namespace>:<scope>:<id>:<digest>`` so one user's or
+    group's entries can be cleared through their namespace.
+    """
+
+    def key_builder(  # pylint: disable=too-many-arguments
+        func: Callable[..., Any],
+        namespace: str = "",
+        *,
+        request: Optional[Request] = None,  # pylint: disable=unused-argument
+        response: Optional[Response] = None,   # pylint: disable=unused-argument
+        args: Tuple[Any, ...],
+        kwargs: Dict[str, Any],
+    ) -> str:
+        out = bytearray()
+        _encode_str(f"{func.__module__}:{func.__qualname__}", out)
+        _encode([arg for arg in args if not _is_injected(arg)], out)
+        _encode_mapping(kwargs, out)
+
+        cache_key = hashlib.blake2b(out, digest_size=16).hexdigest()
+
+        if scope == "user":
+            namespace = f"{namespace}:user:{_current_user(args, kwargs).user_id}"
+        elif scope == "group":
+            namespace = f"{namespace}:group:{_current_user(args, kwargs).group_id}"
+
+        return f"{namespace}:{cache_key}"
+
+    return key_builder
+
+
+key_builder = build_key_builder()
+user_key_builder = build_key_builder("user")
+group_key_builder = build_key_builder("group")
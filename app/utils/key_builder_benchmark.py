@@ -0,0 +1,114 @@
+"""Hit rate and cost of the cache key builders on a simulated workload.
+
+Run with ``python -m app.utils.key_builder_benchmark``. Every simulated
+request builds its arguments the way FastAPI does, fresh objects each time,
+and a key counts as a hit when it was already produced by an earlier request.
+"""
+import time
+import random
+import hashlib
+from typing import Any, Callable
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.jwt import TokenData
+from app.schemas import PaginatedPerPageRequest
+from app.utils.key_builder import key_builder, user_key_builder
+
+REQUESTS = 20000
+DISTINCT_QUERIES = 500
+
+
+def legacy_key_builder(  # pylint: disable=too-many-arguments
+    func,
+    namespace="",
+    *,
+    request=None,  # pylint: disable=unused-argument
+    response=None,  # pylint: disable=unused-argument
+    args,
+    kwargs,
+):
+    if kwargs.get('sess'):
+        del kwargs["sess"]
+
+    cache_key = hashlib.md5(  # noqa: S324
+        f"{func.__module__}:{func.__name__}:{args}:{kwargs}".encode()
+    ).hexdigest()
+
+    return f"{namespace}:{cache_key}"
+
+
+async def list_products(**_):
+    """Stand-in for a cached endpoint."""
+
+
+def _queries(rng: random.Random) -> list[dict[str, Any]]:
+    return [
+        {
+            "page": rng.randint(1, 5),
+            "per_page": rng.choice((25, 50, 100)),
+            "sorting": rng.choice((None, "name:asc", "code:desc")),
+            "filters": {
+                "warehouse_id": rng.randint(1, 10),
+                "category_id": rng.randint(1, 20),
+            },
+            "user_id": rng.randint(1, 50),
+        }
+        for _ in range(DISTINCT_QUERIES)
+    ]
+
+
+def _request_kwargs(query: dict[str, Any], rng: random.Random) -> dict[str, Any]:
+    filters = list(query["filters"].items())
+    rng.shuffle(filters)
+
+    return {
+        "pagination": PaginatedPerPageRequest(
+            page=query["page"], per_page=query["per_page"], sorting=query["sorting"]
+        ),
+        "filters": dict(filters),
+        "sess": AsyncSession(),
+        "current_user": TokenData(
+            sub=f"user{query['user_id']}", profile=1, group_id=1, user_id=query["user_id"]
+        ),
+    }
+
+
+def run(builder: Callable[..., str], seed: int = 0) -> dict[str, float]:
+    rng = random.Random(seed)
+    queries = _queries(rng)
+    # Popular queries are requested far more often than the rest.
+    weights = [1 / (rank + 1) for rank in range(len(queries))]
+
+    seen: set[str] = set()
+    hits = 0
+    elapsed = 0.0
+
+    for query in rng.choices(queries, weights, k=REQUESTS):
+        kwargs = _request_kwargs(query, rng)
+
+        started = time.perf_counter()
+        key = builder(list_products, "fastapi-cache:products", args=(), kwargs=kwargs)
+        elapsed += time.perf_counter() - started
+
+        hits += key in seen
+        seen.add(key)
+
+    return {
+        "hit_rate": round(hits / REQUESTS, 4),
+        "distinct_keys": len(seen),
+        "us_per_key": round(elapsed / REQUESTS * 1e6, 2),
+    }
+
+
+def main():
+    for name, builder in (
+        ("legacy", legacy_key_builder),
+        ("key_builder", key_builder),
+        ("user_key_builder", user_key_builder),
+    ):
+        print(f"{name:>18}: {run(builder)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,26 +1,241 @@
+import os
+import json
+import time
+import uuid
+import asyncio
+from datetime import datetime
+
 from fastapi import Request
 from sqlalchemy import insert
-from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.exc import DBAPIError, OperationalError, SQLAlchemyError
+from app.logger import logger
 from app.models._error_logs import ErrorLogs
-from app.core import session
+from app.core import connection_manager
+
+ERROR_LOG_QUEUE_SIZE = int(os.getenv("ERROR_LOG_QUEUE_SIZE") or 1000)
+ERROR_LOG_BATCH_SIZE = int(os.getenv("ERROR_LOG_BATCH_SIZE") or 100)
+ERROR_LOG_FLUSH_INTERVAL = float(os.getenv("ERROR_LOG_FLUSH_INTERVAL") or 1)
+ERROR_LOG_RETRY_INTERVAL = float(os.getenv("ERROR_LOG_RETRY_INTERVAL") or 30)
+ERROR_LOG_SPOOL_FILE = os.getenv("ERROR_LOG_SPOOL_FILE") or "error_logs.spool"
+
+
+def _rejects_row(ex: Exception) -> bool:
+    # The database refused the statement itself, it will not take it later.
+    return (
+        isinstance(ex, DBAPIError)
+        and not ex.connection_invalidated
+        and not isinstance(ex, OperationalError)
+    )
+
+
+class ErrorLogWriter:
+    """Writes ``error_logs`` rows in batches from a background task.
+
+    Rows are queued in memory and inserted with one multi-row ``INSERT`` per
+    batch. When the database is unavailable, or the queue is full, rows are
+    appended to a local spool file and replayed once inserts succeed again.
+    Spooled lines that cannot be parsed, and rows the database refuses on
+    replay, are moved to ``.corrupt`` and ``.rejected`` files next to it.
+    """
+
+    def __init__(
+        self,
+        queue_size: int = ERROR_LOG_QUEUE_SIZE,
+        batch_size: int = ERROR_LOG_BATCH_SIZE,
+        flush_interval: float = ERROR_LOG_FLUSH_INTERVAL,
+        spool_file: str = ERROR_LOG_SPOOL_FILE,
+    ):
+        self.queue_size = queue_size
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.spool_file = spool_file
+        self._queue: asyncio.Queue[dict] | None = None
+        self._task: asyncio.Task | None = None
+        self._stopping = False
+        self._retry_at = 0.0
+
+    async def start(self):
+        self._queue = asyncio.Queue(maxsize=self.queue_size)
+        self._stopping = False
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is None:
+            return
+
+        # The flusher notices within one flush interval; it is not cancelled
+        # so that an in-flight batch is never lost.
+        self._stopping = True
+        await self._task
+        self._task = None
+
+        await self._flush(self._drain())
+
+    def enqueue(self, row: dict):
+        if self._queue is None:
+            self._spill([row])
+            return
+
+        try:
+            self._queue.put_nowait(row)
+        except asyncio.QueueFull:
+            self._spill([row])
+
+    def _drain(self) -> list[dict]:
+        rows = []
+        while self._queue is not None and not self._queue.empty():
+            rows.append(self._queue.get_nowait())
+        return rows
+
+    async def _run(self):
+        assert self._queue is not None
+
+        while not self._stopping:
+            try:
+                rows = [
+                    await asyncio.wait_for(self._queue.get(), self.flush_interval)
+                ]
+            except asyncio.TimeoutError:
+                rows = []
+
+            while rows and len(rows) < self.batch_size and not self._queue.empty():
+                rows.append(self._queue.get_nowait())
+
+            try:
+                if rows:
+                    await self._flush(rows)
+                elif time.monotonic() >= self._retry_at:
+                    await self._replay_spool()
+            except Exception as ex:  # pylint: disable=broad-exception-caught
+                logger.error("Error log writer failed: %s", ex)
+
+    async def _insert(self, rows: list[dict]):
+        async with connection_manager.get_context_session() as sess:
+            await sess.execute(insert(ErrorLogs), rows)
+            await sess.commit()
+
+    async def _flush(self, rows: list[dict]):
+        if not rows:
+            return
+
+        if time.monotonic() < self._retry_at:
+            self._spill(rows)
+            return
+
+        try:
+            await self._insert(rows)
+        except asyncio.CancelledError:
+            self._spill(rows)
+            raise
+        except Exception as ex:  # pylint: disable=broad-exception-caught
+            logger.error("Unable to write error logs, spooling them: %s", ex)
+            self._retry_at = time.monotonic() + ERROR_LOG_RETRY_INTERVAL
+            self._spill(rows)
+
+    def _spill(self, rows: list[dict]) -> bool:
+        try:
+            with open(self.spool_file, "a", encoding="utf-8") as spool:
+                for row in rows:
+                    spool.write(json.dumps(row, default=str) + "\n")
+        except OSError as ex:
+            logger.error("Unable to spool error logs: %s", ex)
+            return False
+        return True
+
+    def _read_spool(self, path: str) -> list[dict]:
+        rows, corrupt = [], []
+        with open(path, encoding="utf-8") as spool:
+            for line in spool:
+                if not line.strip():
+                    continue
+                try:
+                    row = json.loads(line)
+                    row["created_at"] = datetime.fromisoformat(row["created_at"])
+                except (ValueError, TypeError, KeyError) as ex:
+                    logger.error("Skipping corrupt spooled error log: %s", ex)
+                    corrupt.append(line)
+                    continue
+                rows.append(row)
+
+        if corrupt:
+            self._quarantine("corrupt", corrupt)
+        return rows
+
+    def _quarantine(self, kind: str, lines: list[str]):
+        # Kept aside for inspection instead of being replayed forever.
+        try:
+            with open(f"{self.spool_file}.{kind}", "a", encoding="utf-8") as spool:
+                spool.writelines(lines)
+        except OSError as ex:
+            logger.error("Unable to quarantine %s error logs: %s", kind, ex)
+
+    async def _insert_each(self, rows: list[dict]):
+        """Insert ``rows`` one at a time, quarantining those refused, and
+        yield after each of them."""
+        for row in rows:
+            try:
+                await self._insert([row])
+            except Exception as ex:  # pylint: disable=broad-exception-caught
+                if not _rejects_row(ex):
+                    raise
+                logger.error("Quarantining spooled error log %s: %s", row.get("id"), ex)
+                self._quarantine("rejected", [json.dumps(row, default=str) + "\n"])
+            yield
+
+    async def _replay_spool(self):
+        # A leftover replay file from an interrupted run goes first.
+        replaying = f"{self.spool_file}.replay"
+        if not os.path.exists(replaying):
+            if not os.path.exists(self.spool_file):
+                return
+            os.replace(self.spool_file, replaying)
+
+        rows = self._read_spool(replaying)
+        done = 0
+        try:
+            while done < len(rows):
+                batch = rows[done:done + self.batch_size]
+                try:
+                    await self._insert(batch)
+                    done += len(batch)
+                except Exception as ex:  # pylint: disable=broad-exception-caught
+                    if not _rejects_row(ex):
+                        raise
+                    # A single bad row fails its whole batch.
+                    async for _ in self._insert_each(batch):
+                        done += 1
+        except asyncio.CancelledError:
+            self._requeue(replaying, rows[done:])
+            raise
+        except Exception as ex:  # pylint: disable=broad-exception-caught
+            logger.error("Unable to replay spooled error logs: %s", ex)
+            self._retry_at = time.monotonic() + ERROR_LOG_RETRY_INTERVAL
+
+        self._requeue(replaying, rows[done:])
+
+    def _requeue(self, replaying: str, rows: list[dict]):
+        # The file goes only once every row is inserted or spooled again.
+        if not rows or self._spill(rows):
+            os.remove(replaying)
+
+
+error_log_writer = ErrorLogWriter()
 
 
 async def save_sql_error_log(request: Request, port: str, exc: SQLAlchemyError) -> str:
+    """Queue an error log row and return its ticket without waiting on the DB."""
+
+    tick = uuid.uuid4().hex
+
+    error_log_writer.enqueue(
+        {
+            "id": tick,
+            "created_at": datetime.now(),
+            "code": exc.code if exc.code else "SQLALCHEMY",
+            "message": str(exc),
+            "request": str(request.url),
+            "db": port,
+        }
+    )
 
-    sess = await session()
-
-    async with sess:
-        error_log_stmt = (
-            insert(ErrorLogs)
-            .values(
-                code=exc.code if exc.code else "SQLALCHEMY",
-                message=str(exc),
-                request=str(request.url),
-                db=port,
-            )
-            .returning(ErrorLogs.id)
-        )
-
-        tick = (await sess.execute(error_log_stmt)).scalar_one()
-        await sess.commit()
     return tick
@@ -45,6 +45,71 @@ ALTER TABLE category
 ALTER TABLE category
     ADD CONSTRAINT fk_category_category FOREIGN KEY (category_id) REFERENCES category (id);
 
+-- Clausura de la jerarquía de categorías: una fila por cada par
+-- (ancestro, descendiente), incluida la propia categoría con depth 0. Los
+-- descendientes de una categoría se obtienen con una búsqueda por índice en
+-- lugar de una consulta recursiva.
+CREATE TABLE category_closure (
+    ancestor_id INTEGER NOT NULL REFERENCES category (id) ON DELETE CASCADE,
+    descendant_id INTEGER NOT NULL REFERENCES category (id) ON DELETE CASCADE,
+    depth INTEGER NOT NULL, -- Niveles entre ancestro y descendiente
+    PRIMARY KEY (ancestor_id, descendant_id)
+);
+
+CREATE INDEX idx_category_closure_descendant ON category_closure (descendant_id, ancestor_id);
+
+-- Mantiene category_closure al crear una categoría o cambiarla de padre
+CREATE OR REPLACE FUNCTION trigger_category_closure()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        INSERT INTO category_closure (ancestor_id, descendant_id, depth)
+        SELECT NEW.id, NEW.id, 0
+        UNION ALL
+        SELECT ancestor_id, NEW.id, depth + 1
+        FROM category_closure
+        WHERE descendant_id = NEW.category_id;
+        RETURN NEW;
+    END IF;
+
+    IF NEW.category_id IS NOT DISTINCT FROM OLD.category_id THEN
+        RETURN NEW;
+    END IF;
+
+    -- Una categoría no puede colgar de sí misma ni de un descendiente
+    IF EXISTS (
+        SELECT 1 FROM category_closure
+        WHERE ancestor_id = NEW.id AND descendant_id = NEW.category_id
+    ) THEN
+        RAISE EXCEPTION 'La categoría % no puede ser hija de su descendiente %',
+            NEW.id, NEW.category_id;
+    END IF;
+
+    -- Separar el subárbol de sus ancestros anteriores
+    DELETE FROM category_closure c
+    USING category_closure sub, category_closure sup
+    WHERE sub.ancestor_id = NEW.id
+      AND sup.descendant_id = NEW.id
+      AND sup.ancestor_id <> NEW.id
+      AND c.ancestor_id = sup.ancestor_id
+      AND c.descendant_id = sub.descendant_id;
+
+    -- Colgarlo de los ancestros del nuevo padre
+    INSERT INTO category_closure (ancestor_id, descendant_id, depth)
+    SELECT sup.ancestor_id, sub.descendant_id, sup.depth + sub.depth + 1
+    FROM category_closure sup
+    JOIN category_closure sub ON sub.ancestor_id = NEW.id
+    WHERE sup.descendant_id = NEW.category_id;
+
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER after_category_closure
+    AFTER INSERT OR UPDATE OF category_id ON category
+    FOR EACH ROW
+    EXECUTE FUNCTION trigger_category_closure();
+
 -- Tabla Calidades: Define los niveles de calidad de los productos
 CREATE TABLE quality (
     id SERIAL PRIMARY KEY,
@@ -100,15 +165,45 @@ CREATE TABLE products (
     mt2_pallet DECIMAL(10, 2), -- Metros cuadrados por paleta
     mt2_box DECIMAL(10, 2), -- Metros cuadrados por caja
     currency_id INTEGER REFERENCES currency (id), -- FK a moneda (BS/USD)
+    replacement_cost DECIMAL(10, 2), -- Costo de reposición en la moneda del producto
     created_at DATE DEFAULT CURRENT_DATE, -- Fecha de creación del producto
     status_id INTEGER REFERENCES status (id) DEFAULT 1 -- Estado del producto (habilitado/deshabilitado)
 
 );
 
+-- Contadores de secuencia de productos por categoría y calidad. Reemplaza el
+-- MAX(numeric_seq) del trigger: cada inserción bloquea solo la fila de su
+-- par (categoría, calidad) en lugar de recorrer products, y dos inserciones
+-- concurrentes nunca obtienen el mismo número.
+CREATE TABLE product_code_counters (
+    category_id INTEGER NOT NULL REFERENCES category (id),
+    quality_id INTEGER NOT NULL REFERENCES quality (id),
+    last_value INTEGER NOT NULL DEFAULT 0, -- Último número asignado
+    PRIMARY KEY (category_id, quality_id)
+);
+
+-- Reserva un bloque de p_cantidad números consecutivos y devuelve el primero.
+-- La fila del contador queda bloqueada hasta el fin de la transacción, si
+-- ésta se revierte el bloque vuelve a estar disponible.
+CREATE OR REPLACE FUNCTION reservar_codigos_producto(
+    p_category_id INTEGER,
+    p_quality_id INTEGER,
+    p_cantidad INTEGER DEFAULT 1
+) RETURNS INTEGER AS $$
+    INSERT INTO product_code_counters AS c (category_id, quality_id, last_value)
+    VALUES (p_category_id, p_quality_id, p_cantidad)
+    ON CONFLICT (category_id, quality_id) DO UPDATE
+    SET last_value = c.last_value + EXCLUDED.last_value
+    RETURNING last_value - p_cantidad + 1;
+$$ LANGUAGE sql;
+
+-- Productos de un subárbol de categorías: category_id = ANY(descendientes)
+CREATE INDEX idx_products_category ON products (category_id);
+
 -- Trigger para generar código de producto automáticamente
 CREATE OR REPLACE FUNCTION generar_codigo_producto(
-    p_categoria VARCHAR(4),    -- CEPI o CEPA
-    p_calidad VARCHAR(1),      -- 1, 2 o 3
+    p_categoria VARCHAR,       -- Código de la categoría
+    p_calidad VARCHAR,         -- 1, 2 o 3
     p_secuencia INTEGER        -- Número secuencial
 ) RETURNS VARCHAR(20) AS $$
 BEGIN
@@ -121,19 +216,10 @@ $$ LANGUAGE plpgsql;
 CREATE OR REPLACE FUNCTION trigger_generar_codigo_producto()
 RETURNS TRIGGER AS $$
 DECLARE
-    v_categoria_codigo VARCHAR(4);
-    v_calidad_codigo VARCHAR(1);
-    v_ultimo_numero INTEGER;
+    v_categoria_codigo category.code%TYPE;
+    v_calidad_codigo quality.code%TYPE;
+    v_secuencia TEXT;
 BEGIN
-    -- Si ya se proporcionó un código, respetarlo
-    IF NEW.code IS NOT NULL AND NEW.code != '' THEN
-        -- Si se proporcionó código pero no número de secuencia, extraer el número del código
-        IF NEW.numeric_seq IS NULL THEN
-            NEW.numeric_seq := SUBSTRING(NEW.code FROM 6)::INTEGER;
-        END IF;
-        RETURN NEW;
-    END IF;
-
     -- Obtener el código de categoría
     SELECT code INTO v_categoria_codigo
     FROM category
@@ -144,25 +230,45 @@ BEGIN
     FROM    quality
     WHERE id = NEW.quality_id;
 
-    -- Si no se proporcionó número de secuencia, obtener el último número para esta categoría y calidad
+    -- Si se proporcionó código pero no número de secuencia, el número solo se
+    -- toma cuando el código es el que generar_codigo_producto daría para esta
+    -- categoría y calidad, y entonces adelanta el contador como un número
+    -- proporcionado. Cualquier otro código (p. ej. de un proveedor) se
+    -- respeta con numeric_seq NULL y no toca el contador.
+    IF NEW.code IS NOT NULL AND NEW.code != '' AND NEW.numeric_seq IS NULL THEN
+        v_secuencia := SUBSTRING(
+            NEW.code FROM char_length(v_categoria_codigo || v_calidad_codigo) + 1
+        );
+        IF v_secuencia ~ '^\d{1,9}$' AND NEW.code = generar_codigo_producto(
+            v_categoria_codigo, v_calidad_codigo, v_secuencia::INTEGER
+        ) THEN
+            NEW.numeric_seq := v_secuencia::INTEGER;
+        ELSE
+            RETURN NEW;
+        END IF;
+    END IF;
+
     IF NEW.numeric_seq IS NULL THEN
-        SELECT COALESCE(MAX(numeric_seq), 0) INTO v_ultimo_numero
-        FROM products
-        WHERE category_id = NEW.category_id
-        AND quality_id = NEW.quality_id;
-
-        -- Incrementar el número de secuencia
-        v_ultimo_numero := v_ultimo_numero + 1;
-        
-        -- Asignar el nuevo número de secuencia
-        NEW.numeric_seq := v_ultimo_numero;
+        -- Tomar el siguiente número del contador de esta categoría y calidad
+        NEW.numeric_seq := reservar_codigos_producto(NEW.category_id, NEW.quality_id);
     ELSE
-        -- Usar el número de secuencia proporcionado
-        v_ultimo_numero := NEW.numeric_seq;
+        -- Número proporcionado (o reservado en bloque): adelantar el contador
+        -- si hace falta para que no se vuelva a asignar. Si ya está por
+        -- delante la fila no se modifica.
+        INSERT INTO product_code_counters AS c (category_id, quality_id, last_value)
+        VALUES (NEW.category_id, NEW.quality_id, NEW.numeric_seq)
+        ON CONFLICT (category_id, quality_id) DO UPDATE
+        SET last_value = EXCLUDED.last_value
+        WHERE c.last_value < EXCLUDED.last_value;
+    END IF;
+
+    -- Si ya se proporcionó un código, respetarlo
+    IF NEW.code IS NOT NULL AND NEW.code != '' THEN
+        RETURN NEW;
     END IF;
 
     -- Generar y asignar el código de producto
-    NEW.code := generar_codigo_producto(v_categoria_codigo, v_calidad_codigo, v_ultimo_numero);
+    NEW.code := generar_codigo_producto(v_categoria_codigo, v_calidad_codigo, NEW.numeric_seq);
 
     RETURN NEW;
 END;
@@ -218,6 +324,19 @@ VALUES
     ('NINA-BLU', 'Niña Blusas', 'Blusas para niña', (SELECT id FROM category WHERE code = 'NIÑA')),
     ('NINA-VES', 'Niña Vestidos', 'Vestidos para niña', (SELECT id FROM category WHERE code = 'NIÑA'));
 
+-- Completar category_closure con las categorías existentes (necesario solo al
+-- migrar una base creada antes del trigger)
+INSERT INTO category_closure (ancestor_id, descendant_id, depth)
+WITH RECURSIVE tree AS (
+    SELECT id AS ancestor_id, id AS descendant_id, 0 AS depth FROM category
+    UNION ALL
+    SELECT t.ancestor_id, c.id, t.depth + 1
+    FROM tree t
+    JOIN category c ON c.category_id = t.descendant_id
+)
+SELECT ancestor_id, descendant_id, depth FROM tree
+ON CONFLICT (ancestor_id, descendant_id) DO NOTHING;
+
 INSERT INTO
     quality (code, name)
 VALUES ('1', '1ERA'),
@@ -338,6 +457,16 @@ VALUES
  (SELECT id FROM formats WHERE dimensions = 'M'), (SELECT id FROM model WHERE code = 'BLU'), (SELECT id FROM make WHERE name = 'H&M'),
  'Blusa Casual Dama Talla M', (SELECT id FROM unit_measure WHERE code = 'TALLA'), FALSE, FALSE, 1, NULL, NULL, NULL, NULL, (SELECT id FROM currency WHERE code = 'USD'));
 
+-- Sincronizar los contadores con los productos existentes (necesario solo al
+-- migrar una base creada antes de product_code_counters)
+INSERT INTO product_code_counters AS c (category_id, quality_id, last_value)
+SELECT category_id, quality_id, MAX(numeric_seq)
+FROM products
+WHERE numeric_seq IS NOT NULL
+GROUP BY category_id, quality_id
+ON CONFLICT (category_id, quality_id) DO UPDATE
+SET last_value = GREATEST(c.last_value, EXCLUDED.last_value);
+
 
 
 -- SQL para crear la tabla partner_type
@@ -404,6 +533,28 @@ CREATE TABLE rate (
     rate_value NUMERIC(10, 2) NOT NULL DEFAULT 0
 );
 
+-- Tasa vigente a una fecha: la última de la moneda en o antes de esa fecha
+CREATE INDEX idx_rate_currency_date ON rate (currency_id, rate_date DESC, id DESC);
+
+-- Valor de una unidad de la moneda de una tasa en la moneda base: 1 para la
+-- moneda base y NULL (sin precio) si la tasa no es positiva, como las filas
+-- que quedan con el valor por defecto 0. La moneda base es la del parámetro
+-- inventory.base_currency, 'BS' si no está definido, y debe coincidir con
+-- RATE_BASE_CURRENCY (ALTER DATABASE ... SET inventory.base_currency = ...).
+CREATE OR REPLACE FUNCTION tasa_moneda_base(moneda INTEGER, valor NUMERIC)
+RETURNS NUMERIC AS $$
+    SELECT CASE
+        WHEN EXISTS (
+            SELECT 1 FROM currency c
+            WHERE c.id = moneda
+              AND c.code = COALESCE(
+                  NULLIF(current_setting('inventory.base_currency', true), ''), 'BS'
+              )
+        ) THEN 1
+        WHEN valor > 0 THEN valor
+    END
+$$ LANGUAGE sql STABLE;
+
 CREATE TABLE user_groups (
     id SERIAL PRIMARY KEY,
     version INTEGER NOT NULL DEFAULT 0,
@@ -597,10 +748,16 @@ CREATE TABLE purchase_orders (
     created_by_user_id INTEGER NOT NULL REFERENCES users(id),
     state_flow INTEGER NOT NULL DEFAULT 3 REFERENCES state_flow(id), -- Pendiente por defecto
     rate_id INTEGER references rate(id),
-    total_amount DECIMAL(18, 2),
-    notes TEXT
+    total_amount DECIMAL(18, 2) NOT NULL DEFAULT 0,
+    notes TEXT,
+    -- Agregados de purchase_order_details mantenidos por trigger_agregados_orden_compra
+    line_count INTEGER NOT NULL DEFAULT 0,
+    ordered_quantity DECIMAL(18, 2) NOT NULL DEFAULT 0,
+    received_quantity DECIMAL(18, 2) NOT NULL DEFAULT 0
 );
 
+CREATE INDEX idx_purchase_orders_date ON purchase_orders (order_date DESC, id DESC);
+
 --INSERT INTO purchase_orders (order_number, partner_id, delivery_date, created_by_user_id, total_amount) VALUES
 --('OC-2025-001', (SELECT id FROM partners WHERE name = 'Ladrillos del Sur CA'), '2025-04-20', (SELECT id FROM users WHERE idem = 'V-44332211'), 5600.00),
 --('OC-2025-002', (SELECT id FROM partners WHERE name = 'Insumos Cerámicos SA'), '2025-04-25', (SELECT id FROM users WHERE idem = 'V-44332211'), 1500.50);
@@ -612,9 +769,87 @@ CREATE TABLE purchase_order_details (
     product_id INTEGER NOT NULL REFERENCES products(id),
     quantity DECIMAL(10, 2) NOT NULL,
     unit_price DECIMAL(10, 2) NOT NULL,
-    subtotal DECIMAL(12, 2) NOT NULL
+    subtotal DECIMAL(12, 2) NOT NULL,
+    received_quantity DECIMAL(10, 2) NOT NULL DEFAULT 0 CHECK (received_quantity >= 0) -- Cantidad ya recibida
 );
 
+CREATE INDEX idx_purchase_order_details_order ON purchase_order_details (purchase_order_id);
+
+-- Mantiene los agregados de purchase_orders sumando la diferencia de las filas
+-- de detalle afectadas por cada sentencia (filas nuevas menos anteriores), con
+-- una sola actualización por orden aunque la sentencia toque muchas líneas.
+CREATE OR REPLACE FUNCTION trigger_agregados_orden_compra()
+RETURNS TRIGGER AS $$
+DECLARE
+    nuevas_filas CONSTANT TEXT :=
+        'SELECT purchase_order_id, subtotal, 1, quantity, received_quantity FROM nuevas';
+    filas_anteriores CONSTANT TEXT :=
+        'SELECT purchase_order_id, -subtotal, -1, -quantity, -received_quantity FROM anteriores';
+    filas TEXT;
+BEGIN
+    filas := CASE TG_OP
+        WHEN 'INSERT' THEN nuevas_filas
+        WHEN 'DELETE' THEN filas_anteriores
+        ELSE nuevas_filas || ' UNION ALL ' || filas_anteriores
+    END;
+
+    EXECUTE format($sql$
+        UPDATE purchase_orders o
+        SET total_amount = o.total_amount + d.total_amount,
+            line_count = o.line_count + d.line_count,
+            ordered_quantity = o.ordered_quantity + d.ordered_quantity,
+            received_quantity = o.received_quantity + d.received_quantity
+        FROM (
+            SELECT purchase_order_id,
+                   SUM(subtotal) AS total_amount,
+                   SUM(lines)::INTEGER AS line_count,
+                   SUM(quantity) AS ordered_quantity,
+                   SUM(received_quantity) AS received_quantity
+            FROM (%s) AS x(purchase_order_id, subtotal, lines, quantity, received_quantity)
+            GROUP BY purchase_order_id
+            HAVING SUM(subtotal) <> 0 OR SUM(lines) <> 0
+                OR SUM(quantity) <> 0 OR SUM(received_quantity) <> 0
+        ) d
+        WHERE o.id = d.purchase_order_id
+    $sql$, filas);
+
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER after_insert_purchase_order_details
+AFTER INSERT ON purchase_order_details
+REFERENCING NEW TABLE AS nuevas
+FOR EACH STATEMENT EXECUTE FUNCTION trigger_agregados_orden_compra();
+
+CREATE TRIGGER after_update_purchase_order_details
+AFTER UPDATE ON purchase_order_details
+REFERENCING OLD TABLE AS anteriores NEW TABLE AS nuevas
+FOR EACH STATEMENT EXECUTE FUNCTION trigger_agregados_orden_compra();
+
+CREATE TRIGGER after_delete_purchase_order_details
+AFTER DELETE ON purchase_order_details
+REFERENCING OLD TABLE AS anteriores
+FOR EACH STATEMENT EXECUTE FUNCTION trigger_agregados_orden_compra();
+
+-- Calcular los agregados de las órdenes existentes (necesario solo al migrar
+-- una base creada antes de line_count, ordered_quantity y received_quantity)
+UPDATE purchase_orders o
+SET line_count = d.line_count,
+    ordered_quantity = d.ordered_quantity,
+    received_quantity = d.received_quantity
+FROM (
+    SELECT purchase_order_id,
+           count(*) AS line_count,
+           SUM(quantity) AS ordered_quantity,
+           SUM(received_quantity) AS received_quantity
+    FROM purchase_order_details
+    GROUP BY purchase_order_id
+) d
+WHERE o.id = d.purchase_order_id
+  AND (o.line_count, o.ordered_quantity, o.received_quantity)
+      IS DISTINCT FROM (d.line_count, d.ordered_quantity, d.received_quantity);
+
 -- Tabla de Almacenes (Warehouses)
 CREATE TABLE warehouses (
     id SERIAL PRIMARY KEY,
@@ -631,6 +866,29 @@ INSERT INTO warehouses (name, code, address) VALUES
 ('Warehouse New York', 'ALM-NY', '123 5th Ave, New York, NY, USA'),
 ('Warehouse Miami', 'ALM-MIA', '456 Ocean Dr, Miami, FL, USA');
 
+-- Recepciones de órdenes de compra. source_document identifica la recepción
+-- (guía, nota de entrega): repetir una recepción ya registrada no vuelve a
+-- mover el inventario.
+CREATE TABLE purchase_order_receipts (
+    id SERIAL PRIMARY KEY,
+    purchase_order_id INTEGER NOT NULL REFERENCES purchase_orders(id),
+    source_document VARCHAR(255) NOT NULL UNIQUE,
+    warehouse_id INTEGER NOT NULL REFERENCES warehouses(id),
+    received_by_user_id INTEGER NOT NULL REFERENCES users(id),
+    received_at TIMESTAMP NOT NULL DEFAULT LOCALTIMESTAMP
+);
+
+CREATE INDEX idx_purchase_order_receipts_order ON purchase_order_receipts (purchase_order_id);
+
+-- Cantidades recibidas por línea de la orden en cada recepción
+CREATE TABLE purchase_order_receipt_lines (
+    id SERIAL PRIMARY KEY,
+    receipt_id INTEGER NOT NULL REFERENCES purchase_order_receipts(id),
+    purchase_order_detail_id INTEGER NOT NULL REFERENCES purchase_order_details(id),
+    quantity DECIMAL(10, 2) NOT NULL CHECK (quantity > 0),
+    UNIQUE (receipt_id, purchase_order_detail_id)
+);
+
 
 -- Tabla de Inventario (Stock)
 CREATE TABLE inventory (
@@ -638,6 +896,8 @@ CREATE TABLE inventory (
     warehouse_id INTEGER NOT NULL REFERENCES warehouses(id),
     product_id INTEGER NOT NULL REFERENCES products(id),
     stock_quantity DECIMAL(18, 2) NOT NULL DEFAULT 0,
+    -- Comprometido por reservas activas, disponible = stock_quantity - reserved_quantity
+    reserved_quantity DECIMAL(18, 2) NOT NULL DEFAULT 0 CHECK (reserved_quantity >= 0),
     last_update TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     UNIQUE (warehouse_id, product_id)
 );
@@ -649,18 +909,152 @@ INSERT INTO inventory (warehouse_id, product_id, stock_quantity) VALUES
 ((SELECT id FROM warehouses WHERE code = 'ALM-MIA'), (SELECT id FROM products WHERE id = 4), 200.00);
 
 -- Tabla de Movimientos de Inventario (ejemplos de entradas por compras)
+-- Particionada por mes en movement_date: las consultas que filtran por fecha
+-- solo leen las particiones del rango. La clave primaria debe incluir la
+-- columna de partición.
 CREATE TABLE inventory_movements (
-    id SERIAL PRIMARY KEY,
+    id SERIAL,
     warehouse_id INTEGER NOT NULL REFERENCES warehouses(id),
     product_id INTEGER NOT NULL REFERENCES products(id),
     movement_type VARCHAR(50) NOT NULL CHECK (movement_type IN ('ENTRADA', 'SALIDA')),
     quantity DECIMAL(10, 2) NOT NULL,
-    movement_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    movement_date TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
     source_document VARCHAR(255), -- Ej: Número de Orden de Compra, Número de Despacho
     unit_measure_id INTEGER NOT NULL REFERENCES unit_measure(id),
-    notes TEXT
+    notes TEXT,
+    PRIMARY KEY (id, movement_date)
+) PARTITION BY RANGE (movement_date);
+
+-- Índices creados en cada partición.
+-- Reposición de saldos por producto y fecha (consultas "as of" e instantáneas)
+CREATE INDEX idx_inventory_movements_key_date
+    ON inventory_movements (warehouse_id, product_id, movement_date);
+-- Reportes por producto en todos los almacenes
+CREATE INDEX idx_inventory_movements_product_date
+    ON inventory_movements (product_id, movement_date);
+
+-- Meses separados de inventory_movements con DETACH PARTITION. Sus saldos
+-- quedan en instantáneas fijas (pinned) al final del mes: no se vuelven a
+-- crear ni se aceptan movimientos con fecha anterior al fin del último.
+CREATE TABLE inventory_detached_partitions (
+    name VARCHAR(63) PRIMARY KEY,
+    period_start TIMESTAMP NOT NULL,
+    period_end TIMESTAMP NOT NULL,
+    detached_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Crea las particiones mensuales que falten entre dos fechas. Cada una se crea
+-- como tabla suelta y se adjunta con ATTACH PARTITION, que solo toma SHARE
+-- UPDATE EXCLUSIVE sobre inventory_movements y no bloquea lecturas ni
+-- escrituras. No hay partición DEFAULT para poder usar DETACH CONCURRENTLY.
+CREATE OR REPLACE FUNCTION ensure_inventory_movement_partitions(
+    from_date DATE DEFAULT CURRENT_DATE,
+    to_date DATE DEFAULT (CURRENT_DATE + INTERVAL '3 months')::date
+) RETURNS INTEGER AS $$
+DECLARE
+    month_start DATE := date_trunc('month', from_date)::date;
+    month_end DATE;
+    partition_name TEXT;
+    created INTEGER := 0;
+BEGIN
+    WHILE month_start <= to_date LOOP
+        month_end := (month_start + INTERVAL '1 month')::date;
+        partition_name := format(
+            'inventory_movements_y%sm%s',
+            to_char(month_start, 'YYYY'), to_char(month_start, 'MM')
+        );
+
+        -- Los meses separados, archivados o no, no se vuelven a crear.
+        IF to_regclass(partition_name) IS NULL AND NOT EXISTS (
+            SELECT 1 FROM inventory_detached_partitions d WHERE d.name = partition_name
+        ) THEN
+            EXECUTE format(
+                'CREATE TABLE %I (LIKE inventory_movements INCLUDING DEFAULTS INCLUDING CONSTRAINTS)',
+                partition_name
+            );
+            -- Con el CHECK equivalente, ATTACH no necesita recorrer la tabla.
+            EXECUTE format(
+                'ALTER TABLE %I ADD CONSTRAINT %I CHECK (movement_date >= %L AND movement_date < %L)',
+                partition_name, partition_name || '_range', month_start, month_end
+            );
+            EXECUTE format(
+                'ALTER TABLE inventory_movements ATTACH PARTITION %I FOR VALUES FROM (%L) TO (%L)',
+                partition_name, month_start, month_end
+            );
+            EXECUTE format(
+                'ALTER TABLE %I DROP CONSTRAINT %I',
+                partition_name, partition_name || '_range'
+            );
+            created := created + 1;
+        END IF;
+
+        month_start := month_end;
+    END LOOP;
+
+    RETURN created;
+END;
+$$ LANGUAGE plpgsql;
+
+SELECT ensure_inventory_movement_partitions(
+    (CURRENT_DATE - INTERVAL '12 months')::date,
+    (CURRENT_DATE + INTERVAL '3 months')::date
+);
+
+-- Valoración de inventario (PROMEDIO PONDERADO y PEPS/FIFO) en la moneda base.
+-- Cada movimiento insertado queda en inventory_valuation_queue y se valora
+-- después por lotes, así registrar movimientos no paga el cálculo de costos.
+
+-- Costo y saldo valorado de cada almacén y producto después de cada
+-- movimiento. Las consultas a una fecha leen la última fila anterior.
+CREATE TABLE inventory_valuation_entries (
+    warehouse_id INTEGER NOT NULL,
+    product_id INTEGER NOT NULL,
+    movement_date TIMESTAMP NOT NULL,
+    movement_id INTEGER NOT NULL,
+    quantity DECIMAL(18, 2) NOT NULL, -- Con signo, negativa en las salidas
+    unit_cost DECIMAL(18, 6) NOT NULL, -- Costo unitario de las entradas
+    fifo_cost DECIMAL(18, 4) NOT NULL, -- Valor del movimiento por PEPS
+    average_cost DECIMAL(18, 4) NOT NULL, -- Valor del movimiento por promedio
+    stock_quantity DECIMAL(18, 2) NOT NULL,
+    fifo_value DECIMAL(18, 4) NOT NULL,
+    average_value DECIMAL(18, 4) NOT NULL,
+    PRIMARY KEY (warehouse_id, product_id, movement_date, movement_id)
+);
+
+-- Capas PEPS con existencia de cada almacén y producto
+CREATE TABLE inventory_cost_layers (
+    warehouse_id INTEGER NOT NULL,
+    product_id INTEGER NOT NULL,
+    movement_date TIMESTAMP NOT NULL,
+    movement_id INTEGER NOT NULL,
+    unit_cost DECIMAL(18, 6) NOT NULL,
+    remaining_quantity DECIMAL(18, 2) NOT NULL,
+    PRIMARY KEY (warehouse_id, product_id, movement_date, movement_id)
 );
 
+-- Movimientos registrados y todavía no valorados, se toman por fecha
+CREATE TABLE inventory_valuation_queue (
+    movement_date TIMESTAMP NOT NULL,
+    movement_id INTEGER NOT NULL,
+    warehouse_id INTEGER NOT NULL,
+    product_id INTEGER NOT NULL,
+    PRIMARY KEY (movement_date, movement_id)
+);
+
+CREATE OR REPLACE FUNCTION trigger_encolar_valoracion()
+RETURNS TRIGGER AS $$
+BEGIN
+    INSERT INTO inventory_valuation_queue (movement_date, movement_id, warehouse_id, product_id)
+    SELECT movement_date, id, warehouse_id, product_id FROM nuevos;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER after_insert_inventory_movements
+AFTER INSERT ON inventory_movements
+REFERENCING NEW TABLE AS nuevos
+FOR EACH STATEMENT EXECUTE FUNCTION trigger_encolar_valoracion();
+
 INSERT INTO inventory_movements (warehouse_id, product_id, movement_type, quantity, source_document, unit_measure_id) VALUES
 ((SELECT id FROM warehouses WHERE code = 'ALM-PRI'), (SELECT id FROM products WHERE id = 1), 'ENTRADA', 5000.00, 'OC-2025-001', 2),
 ((SELECT id FROM warehouses WHERE code = 'ALM-PRI'), (SELECT id FROM products WHERE id = 3), 'ENTRADA', 20.00, 'OC-2025-001', 2),
@@ -668,6 +1062,19 @@ INSERT INTO inventory_movements (warehouse_id, product_id, movement_type, quanti
 ((SELECT id FROM warehouses WHERE code = 'ALM-PRI'), (SELECT id FROM products WHERE id = 5), 'ENTRADA', 50.00, 'OC-2025-002', 2);
 
 
+-- Instantáneas de saldo por almacén y producto. Solo se guarda una fila
+-- cuando el saldo cambió desde la instantánea anterior de la misma clave.
+CREATE TABLE inventory_snapshots (
+    warehouse_id INTEGER NOT NULL REFERENCES warehouses(id),
+    product_id INTEGER NOT NULL REFERENCES products(id),
+    snapshot_at TIMESTAMP NOT NULL,
+    stock_quantity DECIMAL(18, 2) NOT NULL,
+    -- Tomada al separar una partición: reemplaza sus movimientos y no se compacta
+    pinned BOOLEAN NOT NULL DEFAULT false,
+    PRIMARY KEY (warehouse_id, product_id, snapshot_at)
+);
+
+
 -- Tabla de Órdenes de Despacho (Salida de Almacén) - Para el módulo de logística
 CREATE TABLE dispatch_orders (
     id SERIAL PRIMARY KEY,
@@ -678,6 +1085,37 @@ CREATE TABLE dispatch_orders (
     notes TEXT
 );
 
+-- Tabla de Detalle de Órdenes de Despacho
+CREATE TABLE dispatch_order_details (
+    id SERIAL PRIMARY KEY,
+    dispatch_order_id INTEGER NOT NULL REFERENCES dispatch_orders(id),
+    product_id INTEGER NOT NULL REFERENCES products(id),
+    warehouse_id INTEGER NOT NULL REFERENCES warehouses(id), -- Almacén de salida
+    quantity DECIMAL(10, 2) NOT NULL CHECK (quantity > 0)
+);
+
+CREATE INDEX idx_dispatch_order_details_order ON dispatch_order_details (dispatch_order_id);
+
+-- Reservas de stock de las órdenes de despacho, una por almacén y producto de
+-- la orden. Mientras está ACTIVA su cantidad está sumada en
+-- inventory.reserved_quantity.
+CREATE TABLE stock_reservations (
+    id SERIAL PRIMARY KEY,
+    dispatch_order_id INTEGER NOT NULL REFERENCES dispatch_orders(id),
+    warehouse_id INTEGER NOT NULL,
+    product_id INTEGER NOT NULL,
+    quantity DECIMAL(18, 2) NOT NULL CHECK (quantity > 0),
+    status VARCHAR(16) NOT NULL DEFAULT 'ACTIVA'
+        CHECK (status IN ('ACTIVA', 'LIBERADA', 'CONSUMIDA')),
+    created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    closed_at TIMESTAMP,
+    UNIQUE (dispatch_order_id, warehouse_id, product_id),
+    FOREIGN KEY (warehouse_id, product_id) REFERENCES inventory (warehouse_id, product_id)
+);
+
+CREATE INDEX idx_stock_reservations_active
+    ON stock_reservations (warehouse_id, product_id) WHERE status = 'ACTIVA';
+
 -- Tabla de Rutas de Despacho (opcional, para logística)
 CREATE TABLE dispatch_routes (
     id SERIAL PRIMARY KEY,
@@ -693,6 +1131,12 @@ CREATE TABLE dispatch_route_assignments (
     assigned_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
 );
 
+-- La ruta vigente de una orden es su última asignación.
+CREATE INDEX idx_dispatch_route_assignments_order
+    ON dispatch_route_assignments (dispatch_order_id, assigned_at DESC, id DESC);
+
+CREATE INDEX idx_dispatch_orders_date ON dispatch_orders (dispatch_date);
+
 
 CREATE TABLE error_logs (
     id VARCHAR PRIMARY KEY,
@@ -714,17 +1158,171 @@ CREATE TABLE shrinkage_reasons (
 CREATE TABLE inventory_shrinkage (
     id SERIAL PRIMARY KEY,
     inventory_movement_id integer NOT NULL,
+    inventory_movement_date TIMESTAMP NOT NULL, -- clave de partición del movimiento
     shrinkage_reason_id integer NOT NULL,
     quantity_lost integer NOT NULL,
     price numeric(18,2),
     loss_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     rate_id integer not null,
     notes TEXT,
-    FOREIGN KEY (inventory_movement_id) REFERENCES inventory_movements(id),
+    FOREIGN KEY (inventory_movement_id, inventory_movement_date)
+        REFERENCES inventory_movements(id, movement_date),
     FOREIGN KEY (shrinkage_reason_id) REFERENCES shrinkage_reasons(id),
     foreign key (rate_id) references rate(id)  
 );
 
+-- Merma registrada sobre cada movimiento
+CREATE INDEX idx_inventory_shrinkage_movement
+    ON inventory_shrinkage (inventory_movement_id, inventory_movement_date);
+
+-- Detalle de mermas de un periodo (consulta bajo demanda desde los tableros),
+-- por la misma fecha con la que se agrupan en el resumen mensual
+CREATE INDEX idx_inventory_shrinkage_loss_date
+    ON inventory_shrinkage ((COALESCE(loss_date, inventory_movement_date)));
+
+-- Resumen mensual de mermas por motivo, almacén, categoría del producto y
+-- moneda de la tasa. Los tableros leen esta tabla en lugar de las mermas.
+-- amount está en la moneda de la tasa de cada merma y base_amount en la
+-- moneda base, convertido con esa misma tasa (ver tasa_moneda_base).
+CREATE TABLE inventory_shrinkage_monthly (
+    month DATE NOT NULL, -- Primer día del mes de loss_date
+    shrinkage_reason_id INTEGER NOT NULL REFERENCES shrinkage_reasons(id),
+    warehouse_id INTEGER NOT NULL REFERENCES warehouses(id),
+    category_id INTEGER NOT NULL REFERENCES category(id),
+    currency_id INTEGER NOT NULL, -- Moneda de la tasa, 0 si la tasa no tiene moneda
+    loss_count INTEGER NOT NULL DEFAULT 0,
+    quantity_lost BIGINT NOT NULL DEFAULT 0,
+    amount DECIMAL(20, 2) NOT NULL DEFAULT 0,
+    base_amount DECIMAL(20, 2) NOT NULL DEFAULT 0,
+    unpriced_count INTEGER NOT NULL DEFAULT 0, -- Mermas sin precio o sin tasa válida
+    PRIMARY KEY (month, shrinkage_reason_id, warehouse_id, category_id, currency_id)
+);
+
+-- Filas de inventory_shrinkage agrupadas como el resumen mensual.
+-- (%s) es la consulta de mermas con su signo (+1 / -1) en la columna signo.
+CREATE OR REPLACE FUNCTION resumen_mermas_sql(filas TEXT)
+RETURNS TEXT AS $$
+BEGIN
+    RETURN format($sql$
+        SELECT date_trunc('month', COALESCE(s.loss_date, s.inventory_movement_date))::date,
+               s.shrinkage_reason_id, m.warehouse_id, p.category_id,
+               COALESCE(r.currency_id, 0),
+               SUM(s.signo)::INTEGER,
+               SUM(s.signo * s.quantity_lost),
+               COALESCE(SUM(s.signo * s.quantity_lost * s.price), 0),
+               COALESCE(SUM(s.signo * s.quantity_lost * s.price * t.valor), 0),
+               COALESCE(
+                   SUM(s.signo) FILTER (WHERE s.price IS NULL OR t.valor IS NULL), 0
+               )::INTEGER
+        FROM (%s) s
+        JOIN inventory_movements m
+          ON m.id = s.inventory_movement_id AND m.movement_date = s.inventory_movement_date
+        JOIN products p ON p.id = m.product_id
+        JOIN rate r ON r.id = s.rate_id
+        CROSS JOIN LATERAL (SELECT tasa_moneda_base(r.currency_id, r.rate_value) AS valor) t
+        GROUP BY 1, 2, 3, 4, 5
+    $sql$, filas);
+END;
+$$ LANGUAGE plpgsql IMMUTABLE;
+
+-- Mantiene el resumen sumando la diferencia de las mermas afectadas por cada
+-- sentencia (filas nuevas menos anteriores), en orden de clave para que dos
+-- sentencias concurrentes no se bloqueen mutuamente.
+CREATE OR REPLACE FUNCTION trigger_resumen_mermas()
+RETURNS TRIGGER AS $$
+DECLARE
+    nuevas_filas CONSTANT TEXT := 'SELECT n.*, 1 AS signo FROM nuevas n';
+    filas_anteriores CONSTANT TEXT := 'SELECT a.*, -1 AS signo FROM anteriores a';
+    filas TEXT;
+BEGIN
+    filas := CASE TG_OP
+        WHEN 'INSERT' THEN nuevas_filas
+        WHEN 'DELETE' THEN filas_anteriores
+        ELSE nuevas_filas || ' UNION ALL ' || filas_anteriores
+    END;
+
+    EXECUTE format($sql$
+        INSERT INTO inventory_shrinkage_monthly AS t (
+            month, shrinkage_reason_id, warehouse_id, category_id, currency_id,
+            loss_count, quantity_lost, amount, base_amount, unpriced_count
+        )
+        SELECT * FROM (%s) d (
+            month, shrinkage_reason_id, warehouse_id, category_id, currency_id,
+            loss_count, quantity_lost, amount, base_amount, unpriced_count
+        )
+        WHERE loss_count <> 0 OR quantity_lost <> 0 OR amount <> 0
+           OR base_amount <> 0 OR unpriced_count <> 0
+        ORDER BY 1, 2, 3, 4, 5
+        ON CONFLICT (month, shrinkage_reason_id, warehouse_id, category_id, currency_id)
+        DO UPDATE SET
+            loss_count = t.loss_count + EXCLUDED.loss_count,
+            quantity_lost = t.quantity_lost + EXCLUDED.quantity_lost,
+            amount = t.amount + EXCLUDED.amount,
+            base_amount = t.base_amount + EXCLUDED.base_amount,
+            unpriced_count = t.unpriced_count + EXCLUDED.unpriced_count
+    $sql$, resumen_mermas_sql(filas));
+
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER after_insert_inventory_shrinkage
+AFTER INSERT ON inventory_shrinkage
+REFERENCING NEW TABLE AS nuevas
+FOR EACH STATEMENT EXECUTE FUNCTION trigger_resumen_mermas();
+
+CREATE TRIGGER after_update_inventory_shrinkage
+AFTER UPDATE ON inventory_shrinkage
+REFERENCING OLD TABLE AS anteriores NEW TABLE AS nuevas
+FOR EACH STATEMENT EXECUTE FUNCTION trigger_resumen_mermas();
+
+CREATE TRIGGER after_delete_inventory_shrinkage
+AFTER DELETE ON inventory_shrinkage
+REFERENCING OLD TABLE AS anteriores
+FOR EACH STATEMENT EXECUTE FUNCTION trigger_resumen_mermas();
+
+-- Recalcula el resumen desde el mes de desde hasta el mes de hasta (excluido)
+-- a partir de las mermas, para cargas iniciales o si cambió la categoría de
+-- productos. Bloquea las escrituras de mermas mientras tanto y devuelve las
+-- filas escritas.
+CREATE OR REPLACE FUNCTION reconstruir_resumen_mermas(desde DATE, hasta DATE)
+RETURNS INTEGER AS $$
+DECLARE
+    desde_mes CONSTANT DATE := date_trunc('month', desde)::date;
+    hasta_mes CONSTANT DATE := date_trunc('month', hasta)::date;
+    escritas INTEGER;
+BEGIN
+    LOCK TABLE inventory_shrinkage IN SHARE MODE;
+
+    DELETE FROM inventory_shrinkage_monthly WHERE month >= desde_mes AND month < hasta_mes;
+
+    EXECUTE format($sql$
+        INSERT INTO inventory_shrinkage_monthly (
+            month, shrinkage_reason_id, warehouse_id, category_id, currency_id,
+            loss_count, quantity_lost, amount, base_amount, unpriced_count
+        )
+        SELECT * FROM (%s) d (
+            month, shrinkage_reason_id, warehouse_id, category_id, currency_id,
+            loss_count, quantity_lost, amount, base_amount, unpriced_count
+        )
+    $sql$, resumen_mermas_sql(format(
+        'SELECT x.*, 1 AS signo FROM inventory_shrinkage x
+         WHERE COALESCE(x.loss_date, x.inventory_movement_date) >= %L
+           AND COALESCE(x.loss_date, x.inventory_movement_date) < %L',
+        desde_mes, hasta_mes
+    )));
+    GET DIAGNOSTICS escritas = ROW_COUNT;
+
+    RETURN escritas;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Recalcular los meses ya resumidos (necesario solo al migrar una base cuyo
+-- resumen convertía la moneda base y las tasas sin valor con rate_value)
+SELECT reconstruir_resumen_mermas(min(month), (max(month) + INTERVAL '1 month')::date)
+FROM inventory_shrinkage_monthly
+HAVING count(*) > 0;
+
 -- Posibles valores para la tabla shrinkage_reasons
 INSERT INTO shrinkage_reasons (reason_name, description) VALUES
 ('Roto', 'Producto dañado o quebrado durante el manejo o almacenamiento.'),